@@ -0,0 +1,421 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+The Python API, for tools that merge HDRs without going through the
+command-line or the GUI.
+
+    import api
+
+    batch = api.HDRBatch(files, 3, defcurve=True, autoRename=True,
+                         onProgress=lambda done, total: ...)
+    for future in batch.submit():
+        future.add_done_callback(publish)  # runs as soon as that HDR exists
+    results = batch.wait()
+
+Every HDRBatch runs on a MergeExecutor: one long-lived scheduler that keeps
+a fixed number of merges going. By default, all batches of a process share
+the same executor (see get_executor), so two batches submitted at once split
+the cores instead of fighting over them.
+
+Callbacks are called from the executor's thread. They should be quick (or
+hand their work to another thread), because no merge starts while they run.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+MergeFuture: The handle of a single merge that was submitted.
+MergeExecutor: Runs submitted merges on a shared, long-lived scheduler.
+HDRBatch: Plans the merges of a batch and submits them to an executor.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+get_executor: Gets the executor shared by every batch of this process.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+api.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import logging
+import threading
+import multiprocessing
+
+# IMPORT LOCAL LIBRARIES
+import retry
+import engine
+import planner
+import scheduler
+import batchpolicies
+
+
+LOGGER = logging.getLogger(__name__)
+_SHARED_EXECUTOR = None
+_SHARED_LOCK = threading.Lock()
+
+
+class MergeFuture(object):
+
+    """The handle of a single merge that was submitted.
+
+    It works like concurrent.futures.Future: the result (a
+    <scheduler.JobResult>) can be waited for, polled or given to callbacks.
+
+    """
+
+    def __init__(self, job, executor):
+        """Creates an unfinished handle.
+
+        Args:
+            job (<engine.MergeJob>): The merge
+            executor (<MergeExecutor>): The executor that runs it
+
+        """
+        super(MergeFuture, self).__init__()
+        self.job = job
+        self._executor = executor
+        self._result = None
+        self._started = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._doneEvent = threading.Event()
+    # end __init__
+
+    def running(self):
+        """bool: If the merge has started and not finished yet."""
+        return self._started and not self.done()
+    # end running
+
+    def done(self):
+        """bool: If the merge finished, failed or was cancelled."""
+        return self._doneEvent.is_set()
+    # end done
+
+    def cancelled(self):
+        """bool: If the merge was cancelled."""
+        return self.done() and self._result.cancelled
+    # end cancelled
+
+    def cancel(self):
+        """Cancels the merge. A running merge is killed.
+
+        Returns:
+            bool: False if it had already finished
+
+        """
+        if self.done():
+            return False
+        self._executor.cancel(self)
+        return True
+    # end cancel
+
+    def result(self, timeout=None):
+        """Waits for the merge to finish.
+
+        Args:
+            timeout (float): The most seconds to wait. None waits forever
+
+        Raises:
+            RuntimeError: If the merge didn't finish within timeout
+
+        Returns:
+            <scheduler.JobResult>: The merge's result. Check its succeeded
+                                   (or status) attribute
+
+        """
+        if not self._doneEvent.wait(timeout):
+            raise RuntimeError("Merge: {out} didn't finish in {time}s".format(
+                out=self.job.output, time=timeout))
+        return self._result
+    # end result
+
+    def add_done_callback(self, function):
+        """Calls a function with this future once it's done.
+
+        Args:
+            function (callable): Called with the future. If the merge is
+                                 already done, it's called right away
+
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(function)
+                return
+        function(self)
+    # end add_done_callback
+
+    def _set_started(self):
+        """Marks the merge as running."""
+        self._started = True
+    # end _set_started
+
+    def _set_result(self, result):
+        """Stores the result and calls every callback."""
+        with self._lock:
+            self._result = result
+            self._doneEvent.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for function in callbacks:
+            try:
+                function(self)
+            except Exception:
+                LOGGER.exception("A done callback of: %s failed",
+                                 self.job.output)
+    # end _set_result
+
+    def __repr__(self):
+        """Object statement of current class."""
+        if self.done():
+            state = self._result.status
+        else:
+            state = "running" if self._started else "pending"
+        return '<{name}(output={output!r}, {state}) object at '\
+               '{hexI}>'.format(name=self.__class__.__name__,
+                                output=self.job.output, state=state,
+                                hexI=hex(id(self)))
+    # end __repr__
+# end MergeFuture
+
+
+class MergeExecutor(object):
+
+    """Runs submitted merges on a shared, long-lived scheduler."""
+
+    def __init__(self, maxWorkers=None, **schedulerOptions):
+        """Starts the scheduler's thread.
+
+        Args:
+            maxWorkers (int): The number of merges that run at once. Default
+                              is the number of cores
+            **schedulerOptions: Passed to scheduler.Scheduler (ex: timeout,
+                                logFolder, observers). By default merges
+                                are kept within the machine's memory and
+                                retried like on the command-line
+
+        """
+        super(MergeExecutor, self).__init__()
+        self.maxWorkers = maxWorkers or multiprocessing.cpu_count()
+        schedulerOptions.setdefault(
+            "policies", batchpolicies.make_policies({}))
+        schedulerOptions.setdefault("retryPolicy", retry.RetryPolicy())
+        self._futures = {}  # id(job): future
+        self._lock = threading.Lock()
+        self._scheduler = scheduler.Scheduler(maxWorkers=self.maxWorkers,
+                                              onStart=self._job_started,
+                                              onFinish=self._job_finished,
+                                              **schedulerOptions)
+        self._thread = threading.Thread(target=self._scheduler.run,
+                                        kwargs={"follow": True})
+        self._thread.daemon = True
+        self._thread.start()
+    # end __init__
+
+    def submit(self, job):
+        """Queues a merge.
+
+        Args:
+            job (<engine.MergeJob>): The merge to run
+
+        Raises:
+            RuntimeError: If the executor was shut down
+
+        Returns:
+            <MergeFuture>: The merge's handle
+
+        """
+        if not self._thread.is_alive():
+            raise RuntimeError("The executor was shut down")
+        future = MergeFuture(job, self)
+        with self._lock:
+            self._futures[id(job)] = future
+        self._scheduler.submit(job)
+        return future
+    # end submit
+
+    def cancel(self, future):
+        """Cancels a submitted merge. See MergeFuture.cancel."""
+        self._scheduler.cancel_job(future.job)
+    # end cancel
+
+    def shutdown(self, wait=True, cancel=False):
+        """Stops the executor once its merges are done.
+
+        Args:
+            wait (bool): If True, return only once every merge is done
+            cancel (bool): If True, kill the running merges and cancel the
+                           queued ones instead of finishing them
+
+        """
+        if cancel:
+            self._scheduler.cancel()
+        self._scheduler.close()
+        if wait:
+            self._thread.join()
+    # end shutdown
+
+    def _job_started(self, job):
+        """Marks a future as running."""
+        with self._lock:
+            future = self._futures.get(id(job))
+        if future is not None:
+            future._set_started()
+    # end _job_started
+
+    def _job_finished(self, result):
+        """Resolves a future."""
+        with self._lock:
+            future = self._futures.pop(id(result.job), None)
+        if future is not None:
+            future._set_result(result)
+    # end _job_finished
+
+    def __enter__(self):
+        """Returns the executor, for use in a with statement."""
+        return self
+    # end __enter__
+
+    def __exit__(self, *args):
+        """Waits for every merge, then stops the executor."""
+        self.shutdown()
+    # end __exit__
+# end MergeExecutor
+
+
+def get_executor():
+    """Gets the executor shared by every batch of this process.
+
+    It's made the first time it's needed, with one merge per core.
+
+    Returns:
+        <MergeExecutor>: The shared executor
+
+    """
+    global _SHARED_EXECUTOR
+    with _SHARED_LOCK:
+        if _SHARED_EXECUTOR is None:
+            _SHARED_EXECUTOR = MergeExecutor()
+        return _SHARED_EXECUTOR
+# end get_executor
+
+
+class HDRBatch(object):
+
+    """Plans the merges of a batch and submits them to an executor."""
+
+    def __init__(self, inputs, seqInt, executor=None, onProgress=None,
+                 onComplete=None, order="lpt", **options):
+        """Plans the merges. Nothing runs until self.submit.
+
+        Args:
+            inputs (list): The bracket files, or a list of sequences (lists
+                           of files) that are each split into HDRs
+            seqInt (int): The number of brackets per HDR
+            executor (<MergeExecutor>): Where to run the merges. Default is
+                                        the shared executor
+            onProgress (callable): Called with (finished, total) every time
+                                   a merge of this batch is done
+            onComplete (callable): Called with the list of every result once
+                                   the whole batch is done
+            order (str): The order to start the merges in. See
+                         planner.make_plan
+            **options: The merge options of engine.plan_batch (ex:
+                       defcurve, ci, fno, ec, autoRename, outputFolder,
+                       onCollision)
+
+        Raises:
+            ValueError: If the options are not valid
+
+        """
+        super(HDRBatch, self).__init__()
+        sequences = inputs
+        if not inputs or not all(isinstance(x, (list, tuple)) for x in inputs):
+            sequences = [inputs]
+        jobs = engine.plan_batch(sequences, seqInt, **options)
+
+        self.executor = executor
+        self.onProgress = onProgress
+        self.onComplete = onComplete
+        workers = executor.maxWorkers if executor is not None else \
+            multiprocessing.cpu_count()
+        self.plan = planner.make_plan(jobs, workers, strategy=order)
+        self.futures = []
+        self._finished = 0
+        self._lock = threading.Lock()
+        self._doneEvent = threading.Event()
+    # end __init__
+
+    @property
+    def jobs(self):
+        """list of <engine.MergeJob>: The merges, in the order they start."""
+        return self.plan.jobs
+    # end jobs
+
+    def submit(self):
+        """Queues every merge of the batch.
+
+        Returns:
+            list of <MergeFuture>: One handle per HDR, in the order they start
+
+        """
+        if self.futures:
+            return self.futures
+        self.executor = self.executor or get_executor()
+        if not self.plan.jobs:
+            self._doneEvent.set()
+            if self.onComplete is not None:
+                self.onComplete([])
+            return self.futures
+
+        for job in self.plan.jobs:
+            self.futures.append(self.executor.submit(job))
+        for future in self.futures:
+            future.add_done_callback(self._merge_done)
+        return self.futures
+    # end submit
+
+    def _merge_done(self, future):
+        """Counts a finished merge and calls the batch's callbacks."""
+        with self._lock:
+            self._finished += 1
+            finished = self._finished
+        if self.onProgress is not None:
+            self.onProgress(finished, len(self.futures))
+        if finished == len(self.futures):
+            self._doneEvent.set()
+            if self.onComplete is not None:
+                self.onComplete([x.result() for x in self.futures])
+    # end _merge_done
+
+    def cancel(self):
+        """Cancels every merge of the batch that isn't done yet."""
+        for future in self.futures:
+            future.cancel()
+    # end cancel
+
+    def wait(self, timeout=None):
+        """Submits the batch (if needed) and waits for it to finish.
+
+        Args:
+            timeout (float): The most seconds to wait. None waits forever
+
+        Raises:
+            RuntimeError: If the batch didn't finish within timeout
+
+        Returns:
+            list of <scheduler.JobResult>: The result of every merge, in the
+                                           order they started
+
+        """
+        self.submit()
+        if not self._doneEvent.wait(timeout):
+            raise RuntimeError("The batch didn't finish in {time}s".format(
+                time=timeout))
+        return [x.result() for x in self.futures]
+    # end wait
+# end HDRBatch
+
+
+if __name__ == "__main__":
+    print(__doc__)
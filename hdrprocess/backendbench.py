@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Benchmarks the merge backends (see engine.BACKENDS) on the same brackets.
+
+Every backend merges the brackets into a .pfm a few times. The script prints
+each backend's median time and peak memory and, if NumPy is installed, how
+far the HDRs of the backends are from each other. The HDRs are scaled to
+the same median brightness first, since the backends don't agree on the
+absolute scale.
+
+    python backendbench.py [-r RUNS] [-f FLAGS] bracket1.jpg bracket2.jpg ...
+
+FLAGS are mkhdri flags, like "-defcurve -ec" (the default). A backend that
+can't run on this machine (ex: mkhdri without Wine) is reported and skipped.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+time_backend: Times the merges of one backend.
+compare_outputs: Measures how far two HDRs are from each other.
+main: Benchmarks every backend.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+backendbench.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+# IMPORT LOCAL LIBRARIES
+import engine
+import numpymerge
+
+
+def _run(argv):
+    """Runs a command and gets its exit code and peak memory in bytes (None
+    where os.wait4 doesn't exist)."""
+    with open(os.devnull, "wb") as devnull:
+        process = subprocess.Popen(argv, stdout=devnull, stderr=devnull)
+        if not hasattr(os, "wait4"):
+            return (process.wait(), None)
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = 0  # the pid is reaped, Popen mustn't wait
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is KiB
+    if os.WIFSIGNALED(status):
+        return (-os.WTERMSIG(status), usage.ru_maxrss * scale)
+    return (os.WEXITSTATUS(status), usage.ru_maxrss * scale)
+# end _run
+
+
+def time_backend(backend, inputs, flags, output, runs=3):
+    """Times the merges of one backend.
+
+    Args:
+        backend (str): One of engine.BACKENDS
+        inputs (list of strs): The brackets
+        flags (list of strs): The merge flags, like ["-defcurve", "-ec"]
+        output (str): The HDR to write
+        runs (int): The number of merges to take the median of
+
+    Returns:
+        dict: "seconds" (the median), "peakBytes" (the largest), "returncode"
+              (of the last merge) and "error" (why it couldn't run, or None)
+
+    """
+    executable, leading = engine.backend_command(backend)
+    job = engine.MergeJob(executable, leading + flags, output, inputs)
+    times = []
+    peaks = []
+    returncode = None
+    for _ in range(max(1, runs)):
+        start = time.time()
+        try:
+            returncode, peak = _run(job.argv)
+        except OSError as err:
+            return {"seconds": None, "peakBytes": None, "returncode": None,
+                    "error": str(err)}
+        times.append(time.time() - start)
+        peaks.append(peak or 0)
+        if returncode != 0:
+            break
+    return {"seconds": sorted(times)[len(times) // 2],
+            "peakBytes": max(peaks) or None, "returncode": returncode,
+            "error": None if returncode == 0 else
+            "exited with code {0}".format(returncode)}
+# end time_backend
+
+
+def _read_pfm(path):
+    """Reads a color .pfm file as a (rows, columns, 3) float array."""
+    np = numpymerge.np
+    with open(path, "rb") as f:
+        kind = f.readline().strip()
+        width, height = [int(x) for x in f.readline().split()]
+        scale = float(f.readline())
+        data = np.frombuffer(f.read(), dtype="<f4" if scale < 0 else ">f4")
+    channels = 3 if kind == b"PF" else 1
+    pixels = data[:width * height * channels].reshape(height, width, channels)
+    return pixels[::-1].astype(np.float32)
+# end _read_pfm
+
+
+def compare_outputs(first, second):
+    """Measures how far two HDRs are from each other.
+
+    Args:
+        first (str): A .pfm HDR
+        second (str): Another .pfm HDR, of the same brackets
+
+    Returns:
+        dict: The median and 95th percentile of the relative difference per
+              pixel, after the second HDR is scaled to the median brightness
+              of the first
+
+    """
+    np = numpymerge.np
+    a = _read_pfm(first)
+    b = _read_pfm(second)
+    valid = (a > 1e-6) & (b > 1e-6)
+    b = b * float(np.median(a[valid] / b[valid]))
+    difference = np.abs(a - b)[valid] / a[valid]
+    return {"median": float(np.median(difference)),
+            "p95": float(np.percentile(difference, 95))}
+# end compare_outputs
+
+
+def main(argv=None):
+    """Benchmarks every backend.
+
+    Args:
+        argv (list of strs): The command-line arguments. See the module's
+                             description
+
+    Returns:
+        int: 0 if every backend that could run succeeded, 1 otherwise
+
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the HDR merge backends on the same brackets')
+    parser.add_argument('-r', '--runs', type=int, default=3, dest='runs',
+                        help='The number of merges per backend')
+    parser.add_argument('-f', '--flags', default='-defcurve -ec',
+                        dest='flags', help='The merge flags')
+    parser.add_argument('inputs', nargs='+', help='The brackets')
+    args = parser.parse_args(argv)
+
+    folder = tempfile.mkdtemp(prefix="hdrbench_")
+    try:
+        outputs = {}
+        failed = False
+        for backend in engine.BACKENDS:
+            output = os.path.join(folder, backend + ".pfm")
+            result = time_backend(backend, args.inputs, args.flags.split(),
+                                  output, runs=args.runs)
+            if result["seconds"] is None:
+                print("{name}: could not run ({err})".format(
+                    name=backend, err=result["error"]))
+                continue
+            failed = failed or result["returncode"] != 0
+            peak = result["peakBytes"]
+            print("{name}: {sec:.2f}s, peak {mem}{err}".format(
+                name=backend, sec=result["seconds"],
+                mem="{0:.0f}MB".format(peak / 1024.0 ** 2) if peak else "n/a",
+                err=", " + result["error"] if result["error"] else ""))
+            if result["returncode"] == 0:
+                outputs[backend] = output
+
+        if numpymerge.np is not None and len(outputs) == len(engine.BACKENDS):
+            difference = compare_outputs(outputs["mkhdri"], outputs["numpy"])
+            print("Relative difference: {median:.2%} median, {p95:.2%} "
+                  "95th percentile".format(**difference))
+        return int(failed)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+# end main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
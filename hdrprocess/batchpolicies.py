@@ -0,0 +1,86 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Builds the scheduler admission policies of a batch from its options. Used
+by both the command-line and the GUI.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+make_policies: Creates the scheduler admission policies for a batch's options.
+use_device_limits: Checks if a batch's options limit the jobs per device.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+batchpolicies.py
+
+"""
+
+# IMPORT LOCAL LIBRARIES
+import history
+import concurrency
+import devices
+import memorybudget
+
+
+def make_policies(options, costModel=None):
+    """Creates the scheduler admission policies for a batch's options.
+
+    Args:
+        options (dict): The batch's options. Reads "memoryBudget" (a size
+                        string for memorybudget.parse_size, default "auto"),
+                        "calibrateMemory" (bool), "threads" (an int or
+                        "auto" for adaptive concurrency), "deviceReaders"/
+                        "deviceWriters" (ints) and "deviceLimits" (a list of
+                        "PATH=N" strings)
+        costModel (<history.CostModel>): If given, its memory predictions
+                                         are used by the memory budget
+
+    Returns:
+        list: The policies to give to scheduler.Scheduler
+
+    """
+    policies = []
+    budgetBytes = memorybudget.parse_size(options.get('memoryBudget', 'auto'))
+    if budgetBytes is not None:
+        estimator = None
+        if costModel is not None:
+            estimator = history.ModelMemoryEstimator(costModel)
+        policies.append(memorybudget.MemoryBudget(
+            budgetBytes, estimator=estimator,
+            calibrate=options.get('calibrateMemory', False)))
+
+    if use_device_limits(options):
+        overrides = dict(devices.parse_device_limit(x)
+                         for x in options.get('deviceLimits') or [])
+        policies.append(devices.DeviceLimit(
+            maxReaders=options.get('deviceReaders'),
+            maxWriters=options.get('deviceWriters'),
+            overrides=overrides))
+
+    threads = options.get('threads')
+    if threads == concurrency.AUTO:
+        policies.append(concurrency.AdaptiveConcurrency(
+            concurrency.max_workers(threads)))
+    return policies
+# end make_policies
+
+
+def use_device_limits(options):
+    """Checks if a batch's options limit the jobs per storage device.
+
+    Args:
+        options (dict): The batch's options
+
+    Returns:
+        bool: True if any device limit was given
+
+    """
+    return any(options.get(x) for x in ('deviceReaders', 'deviceWriters',
+                                        'deviceLimits'))
+# end use_device_limits
+
+
+if __name__ == "__main__":
+    print(__doc__)
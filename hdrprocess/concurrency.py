@@ -0,0 +1,220 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Finds the number of concurrent merges that merges the most brackets per
+minute, while the batch runs (--threads auto).
+
+Brackets on a NAS saturate the network long before the CPU is busy, while
+brackets on a local SSD are CPU-bound, so no single --threads value suits
+both. AdaptiveConcurrency adjusts the limit in the style of TCP congestion
+control (AIMD): after every measuring window it adds one merge while the
+throughput keeps up, and cuts the limit by a factor when it sees
+congestion:
+
+    - memory is running out, or a merge was killed by a signal (ex: the
+      OOM killer): the limit is halved
+    - the throughput dropped compared to the previous window: the limit is
+      multiplied by `decrease`
+    - the throughput stalled and the CPUs mostly wait on I/O: one merge is
+      removed, since more readers won't go any faster
+
+A window lasts until as many merges have finished as the limit allows at
+once (at least 2).
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+AdaptiveConcurrency: A scheduler admission policy with a self-tuning limit.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+max_workers: Gets the number of worker slots for a --threads value.
+parse_threads: Converts a --threads value to a number or AUTO.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+concurrency.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import time
+import logging
+import multiprocessing
+
+# IMPORT LOCAL LIBRARIES
+import sysinfo
+
+
+LOGGER = logging.getLogger(__name__)
+AUTO = "auto"
+
+
+def parse_threads(text):
+    """Converts a --threads value to a number or AUTO.
+
+    Args:
+        text (str or int): A positive number or "auto"
+
+    Returns:
+        int or str: The number of threads, or AUTO
+
+    """
+    if str(text).strip().lower() == AUTO:
+        return AUTO
+    return int(text)
+# end parse_threads
+
+
+def max_workers(threads):
+    """Gets the number of worker slots for a --threads value.
+
+    Args:
+        threads (int or str): A number of threads, or AUTO
+
+    Returns:
+        int: The number of threads, or the number of cores for AUTO
+
+    """
+    if threads == AUTO:
+        return multiprocessing.cpu_count()
+    return threads
+# end max_workers
+
+
+class AdaptiveConcurrency(object):
+
+    """A scheduler admission policy with a self-tuning limit.
+
+    The scheduler's maxWorkers is the upper bound. This policy holds jobs
+    back once self.limit of them are running.
+
+    """
+
+    def __init__(self, maximum, initial=2, minimum=1, decrease=0.75,
+                 tolerance=0.1, iowaitLimit=0.25, memoryReserve=0.1):
+        """Sets the bounds of the controller.
+
+        Args:
+            maximum (int): The highest limit allowed
+            initial (int): The limit to start with
+            minimum (int): The lowest limit allowed
+            decrease (float): The factor that the limit is multiplied with
+                              when the throughput drops
+            tolerance (float): Throughput changes smaller than this fraction
+                               count as noise
+            iowaitLimit (float): The share of CPU time spent in iowait above
+                                 which the storage counts as saturated
+            memoryReserve (float): The share of physical memory that must
+                                   stay available
+
+        """
+        super(AdaptiveConcurrency, self).__init__()
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = max(self.minimum, min(initial, self.maximum))
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.iowaitLimit = iowaitLimit
+        self.memoryReserve = memoryReserve
+        self.changes = []  # (time, limit, brackets/minute) after each window
+        self._running = 0
+        self._totalMemory = sysinfo.total_memory()
+        self._baseline = None
+        self._start_window()
+    # end __init__
+
+    def _start_window(self):
+        """Resets the counters of the measuring window."""
+        self._windowStart = time.time()
+        self._windowCpu = sysinfo.cpu_times()
+        self._windowBrackets = 0
+        self._windowJobs = 0
+        self._killed = False
+    # end _start_window
+
+    def can_start(self, job):
+        """Checks if fewer than self.limit jobs are running."""
+        return self._running < self.limit
+    # end can_start
+
+    def job_started(self, job):
+        """Counts the job as running."""
+        if self._running == 0 and self._windowJobs == 0:
+            self._start_window()  # don't count the idle time before a batch
+        self._running += 1
+    # end job_started
+
+    def job_finished(self, result):
+        """Counts the finished job and adjusts the limit after each window.
+
+        Args:
+            result (<scheduler.JobResult>): The finished job
+
+        """
+        self._running = max(0, self._running - 1)
+        self._windowJobs += 1
+        if result.succeeded:
+            self._windowBrackets += len(result.job.inputs)
+        elif result.returncode is not None and result.returncode < 0 and \
+                not result.timedOut and not result.cancelled:
+            self._killed = True
+
+        if self._killed or self._windowJobs >= max(2, self.limit):
+            self._adjust()
+    # end job_finished
+
+    def _iowait(self):
+        """Gets the share of CPU time spent in iowait during the window."""
+        now = sysinfo.cpu_times()
+        if now is None or self._windowCpu is None:
+            return 0.0
+        total = now[0] - self._windowCpu[0]
+        return (now[1] - self._windowCpu[1]) / float(total) if total else 0.0
+    # end _iowait
+
+    def _memory_low(self):
+        """Checks if less than the reserved share of memory is available."""
+        available = sysinfo.available_memory()
+        if available is None or not self._totalMemory:
+            return False
+        return available < self._totalMemory * self.memoryReserve
+    # end _memory_low
+
+    def _adjust(self):
+        """Measures the window that just ended and moves the limit."""
+        elapsed = max(time.time() - self._windowStart, 1e-6)
+        throughput = self._windowBrackets / elapsed * 60.0
+        iowait = self._iowait()
+        previous = self.limit
+
+        if self._killed or self._memory_low():
+            self.limit = int(self.limit * 0.5)
+            reason = "memory pressure"
+        elif self._baseline is not None and \
+                throughput < self._baseline * (1.0 - self.tolerance):
+            self.limit = int(self.limit * self.decrease)
+            reason = "throughput dropped"
+        elif self._baseline is not None and iowait > self.iowaitLimit and \
+                throughput < self._baseline * (1.0 + self.tolerance):
+            self.limit -= 1
+            reason = "storage saturated"
+        else:
+            self.limit += 1
+            reason = "probing"
+        self.limit = max(self.minimum, min(self.limit, self.maximum))
+
+        if self.limit != previous:
+            LOGGER.info("Concurrency %s -> %s (%s, %.1f brackets/minute, "
+                        "%.0f%% iowait)", previous, self.limit, reason,
+                        throughput, iowait * 100)
+        self.changes.append((time.time(), self.limit, throughput))
+        self._baseline = throughput
+        self._start_window()
+    # end _adjust
+# end AdaptiveConcurrency
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,224 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Limits the number of merges that read from (or write to) the same storage
+device at once.
+
+Many mkhdri processes reading from one NAS volume make it seek between
+files and slow every one of them down, while the CPU could be busy merging
+brackets from another device. Jobs are grouped by the st_dev of their
+brackets and of their output folder. DeviceLimit holds a job back while its
+devices are busy, and because it is "reorderable" the scheduler may start a
+job from another device in its place. The planner also interleaves the jobs
+of different devices (see planner.make_plan's groupBy).
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+DeviceLimit: A scheduler admission policy that limits jobs per device.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+device_id: Gets the st_dev of the device that a path is (or would be) on.
+job_source_device: Gets the device that a job's first bracket is on.
+mount_point: Gets the mount point of the file system that a path is on.
+parse_device_limit: Converts "PATH=N" to a (device, N) pair.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+devices.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import logging
+import collections
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+def device_id(path):
+    """Gets the st_dev of the device that a path is (or would be) on.
+
+    Paths that don't exist yet (like an output) use their closest existing
+    parent folder.
+
+    Args:
+        path (str): The file or folder
+
+    Returns:
+        int or NoneType: The device number or None if no parent exists
+
+    """
+    path = os.path.abspath(path)
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+# end device_id
+
+
+def mount_point(path):
+    """Gets the mount point of the file system that a path is on.
+
+    Args:
+        path (str): The file or folder
+
+    Returns:
+        str: The mount point (ex: "/mnt/nas" or "C:\\")
+
+    """
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+# end mount_point
+
+
+def job_source_device(job):
+    """Gets the device that a job's first bracket is on.
+
+    Args:
+        job (<engine.MergeJob>): The job
+
+    Returns:
+        int or NoneType: The device number
+
+    """
+    if not job.inputs:
+        return None
+    return device_id(job.inputs[0])
+# end job_source_device
+
+
+def parse_device_limit(text):
+    """Converts "PATH=N" to a (device, N) pair.
+
+    Args:
+        text (str): A path on the device and its reader limit
+
+    Returns:
+        tuple: The device number and the limit
+
+    """
+    path, separator, count = text.rpartition("=")
+    if not separator or not path:
+        raise ValueError("Device limit: {t!r} must look like "
+                         "/mnt/nas=2".format(t=text))
+    return (device_id(path), int(count))
+# end parse_device_limit
+
+
+class DeviceLimit(object):
+
+    """A scheduler admission policy that limits jobs per device.
+
+    A job reads from every device that its brackets are on and writes to
+    the device of its output folder.
+
+    """
+
+    # when this policy holds a job back, jobs behind it may start instead
+    reorderable = True
+
+    def __init__(self, maxReaders=2, maxWriters=None, overrides=None):
+        """Sets the limits.
+
+        Args:
+            maxReaders (int or NoneType): The number of jobs that may read
+                                          from one device at once. None is
+                                          no limit
+            maxWriters (int or NoneType): The number of jobs that may write
+                                          to one device at once. None is no
+                                          limit
+            overrides (dict): Device numbers mapped to their own reader
+                              limit (see parse_device_limit)
+
+        """
+        super(DeviceLimit, self).__init__()
+        self.maxReaders = maxReaders
+        self.maxWriters = maxWriters
+        self.overrides = dict(overrides or {})
+        self._reading = collections.Counter()
+        self._writing = collections.Counter()
+        self._devices = {}
+    # end __init__
+
+    def job_devices(self, job):
+        """Gets (and caches) the devices that a job reads and writes.
+
+        Args:
+            job (<engine.MergeJob>): The job
+
+        Returns:
+            tuple: The set of source devices and the output's device
+
+        """
+        key = id(job)
+        if key not in self._devices:
+            sources = set(device_id(path) for path in job.inputs)
+            sources.discard(None)
+            self._devices[key] = (sources, device_id(job.output))
+        return self._devices[key]
+    # end job_devices
+
+    def _reader_limit(self, device):
+        """Gets the reader limit of a device."""
+        return self.overrides.get(device, self.maxReaders)
+    # end _reader_limit
+
+    def can_start(self, job):
+        """Checks if every device of the job has a free reader/writer slot.
+
+        Args:
+            job (<engine.MergeJob>): The job that the scheduler wants to start
+
+        Returns:
+            bool: True if the job may start now
+
+        """
+        sources, destination = self.job_devices(job)
+        for device in sources:
+            limit = self._reader_limit(device)
+            if limit is not None and self._reading[device] >= limit:
+                return False
+        if self.maxWriters is not None and destination is not None:
+            return self._writing[destination] < self.maxWriters
+        return True
+    # end can_start
+
+    def job_started(self, job):
+        """Takes a reader slot on every source device and a writer slot."""
+        sources, destination = self.job_devices(job)
+        for device in sources:
+            self._reading[device] += 1
+        self._writing[destination] += 1
+    # end job_started
+
+    def job_finished(self, result):
+        """Frees the job's reader/writer slots.
+
+        Args:
+            result (<scheduler.JobResult>): The finished job
+
+        """
+        sources, destination = self._devices.pop(id(result.job))
+        for device in sources:
+            self._reading[device] -= 1
+        self._writing[destination] -= 1
+    # end job_finished
+# end DeviceLimit
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -5,12 +5,19 @@
 +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 Parses commands and preps specified data before it is executed by mkhdr
 
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+MergeJob: A single mkhdri invocation, kept as an argv list instead of a string
+
 Methods
 +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 all_same:
 filter_out_by_value:
 path_leaf:
 parse_cmd:
+backend_command: Gets the executable and leading arguments of a backend
+job_backend: Gets the backend that a job runs, if it runs one
+plan_batch: Creates the merge jobs of every sequence of a batch in one pass
 hdr_batch_process:
 
 
@@ -34,7 +41,105 @@ from functools import partial
 
 
 MAIN_CMD = os.path.dirname(os.path.realpath(__file__))
-MAIN_CMD = os.path.normpath(os.path.join(MAIN_CMD, "../dependencies/mkhdri.exe"))
+MAIN_CMD = os.path.normpath(os.path.join(MAIN_CMD, "dependencies/mkhdri.exe"))
+NUMPY_MERGE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                           "numpymerge.py")
+
+# the programs that a batch can merge with. "numpy" runs numpymerge.py with
+# this interpreter and supports fewer flags and output types (see below)
+BACKENDS = ("mkhdri", "numpy")
+NUMPY_UNSUPPORTED = ("a", "gr", "eo")
+NUMPY_OUTPUT_TYPES = (".hdr", ".pfm", ".tif", ".tiff", ".exr")
+
+
+class MergeJob(object):
+
+    """A single mkhdri invocation, kept as an argv list instead of a string.
+
+    Jobs are exec'd directly (no shell), so paths with spaces, quotes or $
+    need no escaping. They can also be turned into plain dicts, which lets
+    them be saved or handed to other executors.
+
+    """
+
+    def __init__(self, executable, arguments, output, inputs):
+        """Stores the pieces of the command.
+
+        Args:
+            executable (str): The path to the merge program
+            arguments (list of strs): The merge flags, like "-a" or "-fno:2.8"
+            output (str): The full path to the HDR that the job creates
+            inputs (list of strs): The bracket images to merge
+
+        """
+        super(MergeJob, self).__init__()
+        self.executable = executable
+        self.arguments = list(arguments)
+        self.output = output
+        self.inputs = list(inputs)
+    # end __init__
+
+    @property
+    def argv(self):
+        """list of strs: The full command, ready for subprocess.Popen."""
+        return [self.executable] + self.arguments + \
+               ['-out:{}'.format(self.output)] + self.inputs
+    # end argv
+
+    @property
+    def readFiles(self):
+        """list of strs: Every file the job reads: its inputs and -ci: curve."""
+        return self.inputs + [x.split(":", 1)[1] for x in self.arguments
+                              if x.startswith("-ci:")]
+    # end readFiles
+
+    def to_dict(self):
+        """dict: The job as a JSON-serializable dictionary."""
+        return {"executable": self.executable,
+                "arguments": self.arguments,
+                "output": self.output,
+                "inputs": self.inputs}
+    # end to_dict
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates a job from the output of MergeJob.to_dict.
+
+        Args:
+            data (dict): The serialized job
+
+        Returns:
+            <MergeJob>: The recreated job
+
+        """
+        return cls(data["executable"], data["arguments"], data["output"],
+                   data["inputs"])
+    # end from_dict
+
+    def __eq__(self, other):
+        """Jobs are equal if they would run the exact same command."""
+        return isinstance(other, MergeJob) and self.argv == other.argv
+    # end __eq__
+
+    def __ne__(self, other):
+        """The opposite of __eq__ (Python 2 doesn't infer it)."""
+        return not self.__eq__(other)
+    # end __ne__
+
+    def __hash__(self):
+        """Hashes the job by its command."""
+        return hash(tuple(self.argv))
+    # end __hash__
+
+    def __repr__(self):
+        """Object statement of current class."""
+        return '<{name}(output={output!r}, inputs={count}) object at '\
+               '{hexI}>'.format(name=self.__class__.__name__,
+                                output=self.output,
+                                count=len(self.inputs),
+                                hexI=hex(id(self)))
+    # end __repr__
+# end MergeJob
 
 
 def all_same(items):
@@ -97,7 +202,7 @@ def parse_cmd(string_h):
     options = {k.replace("-", ""): True if v.startswith('-') else v
            for k, v in zip(args, args[1:]+["--"]) if k.startswith('-')}
 
-    for key, value in options.iteritems():
+    for key, value in options.items():
         try:
             options[key] = int(options[key])
         except ValueError:
@@ -112,166 +217,297 @@ def parse_cmd(string_h):
     if 'si' in options:
         options['seqInt'] = options['si']
         options.pop('si')
-    if 'testModule' not in options:
-        options['testModule'] = testModule
-
     return options
 # end parse_cmd
 
 
-def hdr_batch_process(inputs, seqInt, *args, **kwargs):
-    """The hdr batch process utility's main function.
+COLLISION_POLICIES = ("error", "skip", "overwrite", "rename")
+
+
+def backend_command(backend):
+    """Gets the executable and leading arguments of a merge backend.
 
     Args:
-        inputs (list of strs): List of files and/or folders to process
-        seqInt (int): The number of brackets expected per HDR output
+        backend (str): One of BACKENDS
 
     Returns:
-        int: Success/Failure of the HDR batch process. 0 = Success
+        tuple of str and list of strs: The executable and the arguments that
+                                       come before the merge flags
 
     """
-    cmd = MAIN_CMD
-    startTime = time.time()
+    if backend == "numpy":
+        return (sys.executable, [NUMPY_MERGE])
+    return (MAIN_CMD, [])
+# end backend_command
 
-    if inputs is None:
-        sys.exit("No input files/folders specified")
-    inputFiles = inputs  # lazy
 
-    if 'fileType' not in kwargs:
-        fileType = '.cr2'  # default value for my personal RAW file format
-    else:
-        fileType = kwargs['fileType']
+def job_backend(job):
+    """Gets the backend that a job runs, if it runs one.
 
-    if seqInt is None:
-        # ::HDR BATCH PROCESS TO DO:: Make the sequence interval an auto detect
-        sys.exit("No hdr bracket sequence interval number specified")
+    Args:
+        job (<MergeJob>): The job to check
+
+    Returns:
+        str or NoneType: The job's backend, or None if it runs another
+                         program
+
+    """
+    for backend in BACKENDS:
+        executable, leading = backend_command(backend)
+        if job.executable == executable and \
+                job.arguments[:len(leading)] == leading:
+            return backend
+    return None
+# end job_backend
+
+
+def _merge_arguments(seqInt, kwargs):
+    """Checks the batch options and converts them to mkhdri flags.
+
+    Args:
+        seqInt (int): The number of brackets expected per HDR output
+        kwargs (dict): The options given to plan_batch
+
+    Raises:
+        ValueError: If an option is not valid
 
-    if inputFiles == []:
-        sys.exit("No input files found from the specified files/folders")
+    Returns:
+        list of strs: The flags shared by every merge of the batch
+
+    """
+    arguments = []
 
-    if kwargs is None:
-        sys.exit("No arguments passed to process images")
+    if seqInt is None:
+        # ::HDR BATCH PROCESS TO DO:: Make the sequence interval an auto detect
+        raise ValueError("No hdr bracket sequence interval number specified")
 
-    if not kwargs.get('autoRename', False) and 'inputFileNames' not in kwargs:
-        sys.exit("No method to rename files specified")
+    if not kwargs.get('autoRename', False) and \
+            not kwargs.get('inputFileNames', None):
+        raise ValueError("No method to rename files specified")
 
-    if 'ci' not in kwargs and kwargs.get('eo', False) and 'defcurve' not in kwargs:
-        sys.exit("No method for defining the camera curve specified")
+    if not kwargs.get('ci', None) and kwargs.get('eo', False) and \
+            not kwargs.get('defcurve', False):
+        raise ValueError("No method for defining the camera curve specified")
 
     if kwargs.get('ci', None) is not None and not os.path.isfile(kwargs.get('ci', None)):
             path = os.path.abspath(kwargs['ci'])
-            sys.exit("Directory: {dir} for the specified curve file, {crv} does not exist".format(dir=path[0], crv=path))
+            raise ValueError("Directory: {dir} for the specified curve file, {crv} does not exist".format(dir=path[0], crv=path))
 
     if kwargs.get('outputFolder', None) is not None and \
-           os.path.isdir(kwargs['outputFolder']):
+           not os.path.isdir(kwargs['outputFolder']):
             message = 'Output directory: {dir} does not exist. Please check '\
                       'your spelling'.format(dir=kwargs['outputFolder'])
-            sys.exit(message)
+            raise ValueError(message)
+
+    if kwargs.get('onCollision', 'error') not in COLLISION_POLICIES:
+        raise ValueError('Collision policy: {p!r} is not valid. Options were, '
+                         '{opts}'.format(p=kwargs['onCollision'],
+                                         opts=list(COLLISION_POLICIES)))
+
+    backend = kwargs.get('backend') or 'mkhdri'
+    if backend not in BACKENDS:
+        raise ValueError('Backend: {b!r} is not valid. Options were, '
+                         '{opts}'.format(b=backend, opts=list(BACKENDS)))
+    if backend == 'numpy':
+        unsupported = [x for x in NUMPY_UNSUPPORTED if kwargs.get(x, False)]
+        if unsupported:
+            raise ValueError('The numpy backend does not support: {flags}. '
+                             'Use the mkhdri backend'.format(flags=", ".join(
+                                 '-' + x for x in unsupported)))
+        outputType = (kwargs.get('outputType') or '.hdr').lower()
+        if outputType not in NUMPY_OUTPUT_TYPES:
+            raise ValueError('The numpy backend can not write {ext} files. '
+                             'Options were, {opts}'.format(
+                                 ext=outputType,
+                                 opts=list(NUMPY_OUTPUT_TYPES)))
 
     # (At this point) All necessary config settings have been found
     # start compiling the requested arguments
-    if kwargs['fno'] is not None:
-        cmd = cmd + ' -fno:{}'.format(kwargs['fno'])
+    if kwargs.get('fno', None) is not None:
+        arguments.append('-fno:{}'.format(kwargs['fno']))
 
     exposureArgs = ['ec', 'a', 'gr', 'cb', 'f32', 'da']
-    for i in enumerate(exposureArgs):
-        if kwargs.get(i, False):
-            cmd = cmds + " -{}".format(i)
-
-    if kwargs.get('inputFileNames', None) is not None:
-        # get the list of names for the files
-        with open(kwargs['inputFileNames'], "rt") as f:
-            data = f.read()
-
-        fileNameList = data.replace('-', "_")
-        fileNameList = fileNameList.split(',')
-        fileNameList = [x.lstrip(' \t\r\n') for x in fileNameList]
-        fileNameList = [x.rstrip(' \t\r\n') for x in fileNameList]
-        fileNameList = [x for x in fileNameList if x != '']
-        fileNameList = [x+'.hdr' for x in fileNameList if '.' not in x]  # ext
-    # AUTHOR NOTE: I need to make some kind of conditional so that there can only be one or the other. Or something
+    for arg in exposureArgs:
+        if kwargs.get(arg, False):
+            arguments.append('-{}'.format(arg))
 
     if kwargs.get('eo', False):
-        cmd = cmd + ' -eo'
-    elif 'ci' in kwargs and 'defcurve' in kwargs:
+        arguments.append('-eo')
+    elif kwargs.get('ci', None) and kwargs.get('defcurve', False):
         logging.info("The curve input file will be read, "\
                      "instead of the define curve")
-        # kwargs['ci']
-        cmd = cmd + ' -ci:{}'.format(kwargs['ci'])
-    elif 'ci' in kwargs and 'defcurve' not in kwargs:
-        # kwargs['ci']
-        cmd = cmd + ' -ci:{}'.format(kwargs['ci'])
-    elif 'defcurve' in kwargs:
-        # kwargs['defcurve']
-        cmd = cmd + ' -defcurve'
+        arguments.append('-ci:{}'.format(kwargs['ci']))
+    elif kwargs.get('ci', None):
+        arguments.append('-ci:{}'.format(kwargs['ci']))
+    elif kwargs.get('defcurve', False):
+        arguments.append('-defcurve')
     else:
         message = "No curve estimation or curve file provided. Script doesn't"\
                   " know how to interpret the hdr without it. Please specify "\
                   "a curve option"
-        sys.exit(message)
+        raise ValueError(message)
 
-    # Make a new list, grouped by nth-->nth+1 element, n is seqInt
-    inputFiles = [inputFiles[x:x+seqInt]
-                  for x in range(0, len(inputFiles), seqInt)]
+    if kwargs.get('tileBudget'):
+        if backend != 'numpy':
+            raise ValueError("A tile budget needs the numpy backend. mkhdri "
+                             "always loads whole brackets")
+        arguments.append('-tile:{}'.format(int(kwargs['tileBudget'])))
+    return arguments
+# end _merge_arguments
 
-    if 'inputFileNames' in kwargs and len(inputFiles) != len(fileNameList):
-        sys.exit("The provided file name list does does not match "
-                 "the number of image files found")
 
-    checkFileNames = []  # check if duplicate name and file path generated
-    commandList = []
-    for i, group in enumerate(inputFiles):
-        if 'outputFolder' not in kwargs and i == 0:
-            outputFolder = os.path.dirname(group[0])
+def _read_file_names(path):
+    """Reads the comma-separated output names of --input-names.
 
-        if 'inputFileNames' in kwargs:
+    Args:
+        path (str): The text file of names
+
+    Returns:
+        list of strs: The names, with ".hdr" added to names without extension
+
+    """
+    with open(path, "rt") as f:
+        data = f.read()
+
+    fileNameList = data.replace('-', "_")
+    fileNameList = fileNameList.split(',')
+    fileNameList = [x.strip(' \t\r\n') for x in fileNameList]
+    fileNameList = [x for x in fileNameList if x != '']
+    return [x+'.hdr' for x in fileNameList if '.' not in x]  # ext
+# end _read_file_names
+
+
+def _rename_output(outputName, seen):
+    """Adds the first free "_N" suffix to an output name."""
+    base, ext = os.path.splitext(outputName)
+    number = 1
+    while True:
+        candidate = "{base}_{num}{ext}".format(base=base, num=number, ext=ext)
+        if os.path.normcase(os.path.abspath(candidate)) not in seen:
+            return candidate
+        number += 1
+# end _rename_output
+
+
+def plan_batch(sequences, seqInt, **kwargs):
+    """Creates the merge jobs of every sequence of a batch in one pass.
+
+    The options are checked (and the --input-names file is read) once for
+    the whole batch. Output names are compared in a hash set, so finding
+    collisions costs O(1) per job.
+
+    Args:
+        sequences (list of lists of strs): The bracket files of each sequence.
+                                           Each one is split into groups of
+                                           seqInt brackets
+        seqInt (int): The number of brackets expected per HDR output
+        backend (str): The program that merges the brackets, "mkhdri" (the
+                       default) or "numpy". See BACKENDS
+        tileBudget (int): The most bytes that each strip of a tiled merge
+                          may use. Needs the numpy backend. None (the
+                          default) merges whole brackets
+        onCollision (str): What to do when two jobs would write the same
+                           file. "error" (the default) stops the batch,
+                           "skip" keeps the first job, "overwrite" keeps the
+                           last job and "rename" adds "_1", "_2"... to the
+                           later outputs
+
+    Raises:
+        ValueError: If an option is not valid or no jobs could be made
+
+    Returns:
+        list of <MergeJob>: One job for every HDR that should be created
+
+    """
+    if sequences is None:
+        raise ValueError("No input files/folders specified")
+
+    arguments = _merge_arguments(seqInt, kwargs)
+    executable, leading = backend_command(kwargs.get('backend') or 'mkhdri')
+    arguments = leading + arguments
+
+    groups = [sequence[x:x+seqInt] for sequence in sequences
+              for x in range(0, len(sequence), seqInt)]
+    if not groups:
+        raise ValueError("No input files found from the specified "
+                         "files/folders")
+
+    fileNameList = None
+    if kwargs.get('inputFileNames', None) is not None:
+        fileNameList = _read_file_names(kwargs['inputFileNames'])
+        if len(groups) != len(fileNameList):
+            raise ValueError("The provided file name list does does not match "
+                             "the number of image files found")
+
+    onCollision = kwargs.get('onCollision', 'error')
+    extension = kwargs.get("outputType", None) or ".hdr"
+    folderExists = {}
+    seen = {}  # normalized output path: index in jobList
+    collisions = []
+    jobList = []
+    for i, group in enumerate(groups):
+        outputFolder = kwargs.get('outputFolder') or os.path.dirname(group[0])
+
+        if fileNameList is not None:
             outputName = os.path.join(outputFolder, fileNameList[i])
-        elif kwargs.get("autoRename", False):
-            outputName = os.path.splitext(path_leaf(group[0]))[0]
-            if kwargs.get("outputType", None) is not None:
-                outputName += kwargs["outputType"]
-            else:
-                outputName += "hdr"
-            outputName = os.path.join(outputFolder, outputName)
-
-        if outputName in checkFileNames:
-            try:
-                userCheck
-            except NameError:
-                userCheck = raw_input("Filename: {f} was already found.\nDo "
-                                      "you want to override the previous "
-                                      "file? y/N/yes_all")
-            else:
-                if userCheck != "yes_all":
-                    userCheck = raw_input("Filename: {f} was already found."
-                                          "\nDo you want to override the "
-                                          "previous file? y/N/yes_all")
-                if userCheck == 'y':
-                    continue
-                elif userCheck == 'yes_all':
-                    logging.info("Auto-override has been set. Continuing")
-                elif userCheck == 'n':
-                    message = "Please rename file {f} "\
-                              "before continuing".format(f=outputName)
-                    sys.exit(message)
-
-        if os.path.isdir(os.path.dirname(outputFolder)):
-            finalCmd = cmd + ' -out:{}'.format('"' + outputName + '"')
-            group = ['"' + x + '"' for x in group]
-            filesToProcess = ' ' + ' '.join(group)
-            finalCmd = finalCmd + filesToProcess
-            commandList.append(finalCmd)
         else:
+            outputName = os.path.join(outputFolder, os.path.splitext(
+                path_leaf(group[0]))[0] + extension)
+
+        if outputFolder not in folderExists:
+            folderExists[outputFolder] = os.path.isdir(outputFolder)
+        if not folderExists[outputFolder]:
             message = "Folder: {f} does not exist. Could not create "\
                       "file, \"{name}\"".format(f=outputFolder,
                                                 name=outputName)
             logging.error(message)
+            continue
+
+        key = os.path.normcase(os.path.abspath(outputName))
+        if key in seen:
+            if onCollision == "error":
+                collisions.append(outputName)
+                continue
+            elif onCollision == "skip":
+                logging.info("Skipping a second merge into: %s", outputName)
+                continue
+            elif onCollision == "overwrite":
+                logging.info("A later merge replaces the one into: %s",
+                             outputName)
+                jobList[seen[key]] = None
+            else:
+                outputName = _rename_output(outputName, seen)
+                key = os.path.normcase(os.path.abspath(outputName))
+                logging.info("Renamed a colliding output to: %s", outputName)
 
-    if testModule:
-        return commandList  # used for testing
+        seen[key] = len(jobList)
+        jobList.append(MergeJob(executable, arguments, outputName, group))
+
+    if collisions:
+        raise ValueError("More than one merge would write to: {files}. Rename "
+                         "the outputs or choose another collision "
+                         "policy".format(files=", ".join(collisions)))
+    return [x for x in jobList if x is not None]
+# end plan_batch
+
+
+def hdr_batch_process(inputs, seqInt, *args, **kwargs):
+    """The hdr batch process utility's main function.
 
-    # Reference: https://stackoverflow.com/questions/14533458
-    return commandList
+    Args:
+        inputs (list of strs): List of files and/or folders to process
+        seqInt (int): The number of brackets expected per HDR output
+
+    Raises:
+        ValueError: If an option is not valid or no jobs could be made
+
+    Returns:
+        list of <MergeJob>: One job for every HDR that should be created
+
+    """
+    if inputs is None:
+        raise ValueError("No input files/folders specified")
+    return plan_batch([inputs], seqInt, **kwargs)
 # end hdr_batch_process
 
 
@@ -0,0 +1,548 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Spreads one batch over many machines through a queue in an sqlite file.
+
+"hdrprocess submit" puts the jobs of a batch in the queue and any number of
+"hdrprocess worker" processes (on any machine that can open the file) take
+them out. A worker leases a job for a short time and renews the lease with
+a heartbeat while the merge runs. If the worker dies, its lease runs out and
+the next worker that asks for a job gets the expired one back. A job whose
+lease ran out maxAttempts times (ex: it crashes every worker that runs it)
+is marked failed instead. A worker that is stopped with Ctrl+C kills its
+merges and puts them back in the queue right away.
+
+The queue file should be on storage that every machine sees. sqlite's file
+locks are reliable on local disks and SMB shares, but not on every NFS
+setup. Several workers on one machine, all pointing at a local file, is the
+easiest way to try it out.
+
+The queue keeps each job's backend (see engine.BACKENDS) and merge flags,
+not the submitter's command. Every worker finds the backend on its own
+machine, so the submitter and the workers can have hdrprocess installed
+in different places.
+
+Job states: "queued" -> "leased" -> "done" or "failed". Queued and leased
+jobs can also be "cancelled"; a worker whose job is cancelled loses its
+lease on the next heartbeat and kills the merge.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+JobQueue: A persistent, multi-process queue of merge jobs.
+FarmWorker: Takes jobs from a JobQueue and runs them until it is empty.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+farm.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+import contextlib
+
+# IMPORT LOCAL LIBRARIES
+import engine
+import scheduler
+
+
+LOGGER = logging.getLogger(__name__)
+STATES = ("queued", "leased", "done", "failed", "cancelled")
+
+
+def _encode_job(job):
+    """Gets a job as the JSON text that the queue keeps.
+
+    Args:
+        job (<engine.MergeJob>): The job to encode
+
+    Raises:
+        ValueError: If the job doesn't run a merge backend
+
+    Returns:
+        str: The job's backend, merge flags, output and inputs
+
+    """
+    backend = engine.job_backend(job)
+    if backend is None:
+        raise ValueError("Job: {out} runs: {exe}. Only the merge backends "
+                         "can be queued".format(out=job.output,
+                                                exe=job.executable))
+    _, leading = engine.backend_command(backend)
+    return json.dumps({"backend": backend,
+                       "arguments": job.arguments[len(leading):],
+                       "output": job.output,
+                       "inputs": job.inputs})
+# end _encode_job
+
+
+def _decode_job(text):
+    """Recreates a job from _encode_job's text, with this machine's backend.
+
+    Args:
+        text (str): The encoded job
+
+    Returns:
+        <engine.MergeJob>: The job
+
+    """
+    data = json.loads(text)
+    executable, leading = engine.backend_command(data["backend"])
+    return engine.MergeJob(executable, leading + data["arguments"],
+                           data["output"], data["inputs"])
+# end _decode_job
+
+
+class JobQueue(object):
+
+    """A persistent, multi-process queue of merge jobs.
+
+    Every call opens its own connection, so one JobQueue can be shared by
+    threads and every process can have its own.
+
+    """
+
+    def __init__(self, path, leaseSeconds=60.0, maxAttempts=3):
+        """Opens (and creates, if needed) the queue file.
+
+        Args:
+            path (str): The sqlite file
+            leaseSeconds (float): How long a lease lasts without a heartbeat
+            maxAttempts (int): The number of leases that a job may lose
+                               before it is marked failed
+
+        """
+        super(JobQueue, self).__init__()
+        self.path = path
+        self.leaseSeconds = leaseSeconds
+        self.maxAttempts = maxAttempts
+        with self._transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                       "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                       "batch TEXT NOT NULL, "
+                       "job TEXT NOT NULL, "
+                       "state TEXT NOT NULL DEFAULT 'queued', "
+                       "priority INTEGER NOT NULL DEFAULT 0, "
+                       "worker TEXT, "
+                       "leaseExpires REAL, "
+                       "attempts INTEGER NOT NULL DEFAULT 0, "
+                       "returncode INTEGER, "
+                       "submitted REAL, "
+                       "finished REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_state "
+                       "ON jobs (state, priority, id)")
+    # end __init__
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Opens a connection and holds the write lock until the block ends."""
+        db = sqlite3.connect(self.path, timeout=60.0,
+                             isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+    # end _transaction
+
+    @contextlib.contextmanager
+    def _reader(self):
+        """Opens a connection for queries. Nothing is locked for writing."""
+        db = sqlite3.connect(self.path, timeout=60.0,
+                             isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+    # end _reader
+
+    def submit(self, jobs, batch=None, priority=0):
+        """Adds jobs to the queue.
+
+        Args:
+            jobs (list of <engine.MergeJob>): The jobs to add
+            batch (str): A name for the batch. A random one is made if None
+            priority (int): Higher priorities are leased first
+
+        Raises:
+            ValueError: If a job doesn't run a merge backend
+
+        Returns:
+            str: The batch name
+
+        """
+        batch = batch or uuid.uuid4().hex[:12]
+        now = time.time()
+        rows = [(batch, _encode_job(job), priority, now) for job in jobs]
+        with self._transaction() as db:
+            db.executemany("INSERT INTO jobs (batch, job, priority, submitted) "
+                           "VALUES (?, ?, ?, ?)", rows)
+        return batch
+    # end submit
+
+    def lease(self, worker):
+        """Takes the next job out of the queue.
+
+        Expired leases are put back in the queue first, or marked failed
+        if their job already had self.maxAttempts leases.
+
+        Args:
+            worker (str): The name of the worker taking the job
+
+        Returns:
+            tuple or NoneType: The job's id and <engine.MergeJob>, or None
+                               if nothing is queued
+
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("UPDATE jobs SET state = 'failed', finished = ?, "
+                       "leaseExpires = NULL WHERE state = 'leased' AND "
+                       "leaseExpires < ? AND attempts >= ?",
+                       (now, now, self.maxAttempts))
+            db.execute("UPDATE jobs SET state = 'queued', worker = NULL "
+                       "WHERE state = 'leased' AND leaseExpires < ?", (now,))
+            row = db.execute("SELECT id, job FROM jobs WHERE state = 'queued' "
+                             "ORDER BY priority DESC, id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET state = 'leased', worker = ?, "
+                       "leaseExpires = ?, attempts = attempts + 1 "
+                       "WHERE id = ?",
+                       (worker, now + self.leaseSeconds, row[0]))
+        return (row[0], _decode_job(row[1]))
+    # end lease
+
+    def heartbeat(self, jobId, worker):
+        """Renews a lease.
+
+        Args:
+            jobId (int): The leased job
+            worker (str): The worker holding the lease
+
+        Returns:
+            bool: False if the lease was lost (it expired and was given to
+                  someone else, or the job was cancelled)
+
+        """
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE jobs SET leaseExpires = ? "
+                                "WHERE id = ? AND worker = ? AND "
+                                "state = 'leased'",
+                                (time.time() + self.leaseSeconds, jobId,
+                                 worker))
+            return cursor.rowcount == 1
+    # end heartbeat
+
+    def complete(self, jobId, worker, returncode):
+        """Records the end of a leased job.
+
+        Args:
+            jobId (int): The leased job
+            worker (str): The worker holding the lease
+            returncode (int or NoneType): The merge's exit code
+
+        Returns:
+            bool: False if the worker didn't hold the lease anymore
+
+        """
+        state = "done" if returncode == 0 else "failed"
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE jobs SET state = ?, returncode = ?, "
+                                "finished = ?, leaseExpires = NULL "
+                                "WHERE id = ? AND worker = ? AND "
+                                "state = 'leased'",
+                                (state, returncode, time.time(), jobId,
+                                 worker))
+            return cursor.rowcount == 1
+    # end complete
+
+    def release(self, jobId, worker):
+        """Puts a leased job back in the queue (ex: its worker is stopping).
+
+        Args:
+            jobId (int): The leased job
+            worker (str): The worker holding the lease
+
+        Returns:
+            bool: False if the worker didn't hold the lease anymore
+
+        """
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE jobs SET state = 'queued', "
+                                "worker = NULL, leaseExpires = NULL "
+                                "WHERE id = ? AND worker = ? AND "
+                                "state = 'leased'", (jobId, worker))
+            return cursor.rowcount == 1
+    # end release
+
+    def cancel(self, batch):
+        """Cancels every unfinished job of a batch.
+
+        Args:
+            batch (str): The batch name
+
+        Returns:
+            int: The number of jobs that were cancelled
+
+        """
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE jobs SET state = 'cancelled', "
+                                "finished = ? WHERE batch = ? AND "
+                                "state IN ('queued', 'leased')",
+                                (time.time(), batch))
+            return cursor.rowcount
+    # end cancel
+
+    def set_priority(self, batch, priority):
+        """Changes the priority of a batch's queued jobs.
+
+        Args:
+            batch (str): The batch name
+            priority (int): The new priority
+
+        Returns:
+            int: The number of jobs that were changed
+
+        """
+        with self._transaction() as db:
+            cursor = db.execute("UPDATE jobs SET priority = ? "
+                                "WHERE batch = ? AND state = 'queued'",
+                                (priority, batch))
+            return cursor.rowcount
+    # end set_priority
+
+    def counts(self, batch=None):
+        """Counts the jobs in each state.
+
+        Args:
+            batch (str): Only count this batch. Every batch if None
+
+        Returns:
+            dict: Every state in STATES mapped to its number of jobs
+
+        """
+        query = "SELECT state, COUNT(*) FROM jobs"
+        args = ()
+        if batch is not None:
+            query += " WHERE batch = ?"
+            args = (batch,)
+        with self._reader() as db:
+            counts = dict(db.execute(query + " GROUP BY state", args))
+        return dict((state, counts.get(state, 0)) for state in STATES)
+    # end counts
+
+    def batches(self):
+        """Counts the jobs in each state, for every batch.
+
+        Returns:
+            dict: Each batch name mapped to its counts (see self.counts)
+
+        """
+        with self._reader() as db:
+            rows = db.execute("SELECT batch, state, COUNT(*) FROM jobs "
+                              "GROUP BY batch, state").fetchall()
+        batches = {}
+        for batch, state, count in rows:
+            counts = batches.setdefault(batch, dict((x, 0) for x in STATES))
+            counts[state] = count
+        return batches
+    # end batches
+
+    def jobs(self, batch):
+        """Gets the status of every job of a batch.
+
+        Args:
+            batch (str): The batch name
+
+        Returns:
+            list of dicts: Each job's id, output, state, priority, worker,
+                           attempts and returncode
+
+        """
+        with self._reader() as db:
+            rows = db.execute("SELECT id, job, state, priority, worker, "
+                              "attempts, returncode FROM jobs "
+                              "WHERE batch = ? ORDER BY id",
+                              (batch,)).fetchall()
+        return [{"id": row[0], "output": json.loads(row[1])["output"],
+                 "state": row[2], "priority": row[3], "worker": row[4],
+                 "attempts": row[5], "returncode": row[6]} for row in rows]
+    # end jobs
+# end JobQueue
+
+
+class FarmWorker(object):
+
+    """Takes jobs from a JobQueue and runs them until it is empty."""
+
+    def __init__(self, jobQueue, slots=1, name=None, pollSeconds=2.0,
+                 exitWhenEmpty=False, **schedulerOptions):
+        """Sets up the worker. Nothing runs until self.run is called.
+
+        Args:
+            jobQueue (<JobQueue>): The queue to take jobs from
+            slots (int): The number of jobs that this worker runs at once
+            name (str): The worker's name in the queue. Defaults to
+                        "<hostname>-<pid>"
+            pollSeconds (float): How long to wait before asking an empty
+                                 queue again
+            exitWhenEmpty (bool): If True, self.run returns once no job is
+                                  queued or leased
+            **schedulerOptions: Passed to every scheduler.Scheduler (ex:
+                                timeout, retryPolicy, logFolder)
+
+        """
+        super(FarmWorker, self).__init__()
+        self.jobQueue = jobQueue
+        self.slots = max(1, slots)
+        self.name = name or "{host}-{pid}".format(host=socket.gethostname(),
+                                                  pid=os.getpid())
+        self.pollSeconds = pollSeconds
+        self.exitWhenEmpty = exitWhenEmpty
+        self.schedulerOptions = schedulerOptions
+        self.finished = 0
+        self._stopEvent = threading.Event()
+        self._killEvent = threading.Event()
+        self._schedulers = {}  # slot name: the scheduler of its job
+        self._lock = threading.Lock()
+    # end __init__
+
+    def stop(self, kill=False):
+        """Makes every slot return.
+
+        Args:
+            kill (bool): If True, the running merges are killed and put back
+                         in the queue. Otherwise they finish first
+
+        """
+        self._stopEvent.set()
+        if kill:
+            self._killEvent.set()
+            with self._lock:
+                schedulers = list(self._schedulers.values())
+            for batch in schedulers:
+                batch.cancel()
+    # end stop
+
+    def run(self):
+        """Runs jobs on every slot until self.stop (or the queue is empty).
+
+        On Ctrl+C the running merges are killed and put back in the queue
+        before KeyboardInterrupt is raised again.
+
+        """
+        slotsDone = []
+        for index in range(self.slots):
+            done = threading.Event()
+            thread = threading.Thread(target=self._slot_main,
+                                      args=("{0}/{1}".format(self.name,
+                                                             index), done))
+            thread.daemon = True
+            thread.start()
+            slotsDone.append(done)
+        # waits on events, not Thread.join: a join that Ctrl+C interrupts
+        # can mark the thread as finished on Python 3
+        try:
+            for done in slotsDone:
+                while not done.wait(0.5):  # a timeout keeps Ctrl+C working
+                    pass
+        except KeyboardInterrupt:
+            # the merges run in their own sessions, so Ctrl+C doesn't reach
+            # them. Left running, they would be leased (and run) twice
+            self.stop(kill=True)
+            for done in slotsDone:
+                done.wait()
+            raise
+    # end run
+
+    def _slot_main(self, slotName, done):
+        """Runs self._slot_loop and sets done once it returns."""
+        try:
+            self._slot_loop(slotName)
+        finally:
+            done.set()
+    # end _slot_main
+
+    def _slot_loop(self, slotName):
+        """Leases and runs jobs one at a time."""
+        while not self._stopEvent.is_set():
+            lease = self.jobQueue.lease(slotName)
+            if lease is None:
+                counts = self.jobQueue.counts()
+                if self.exitWhenEmpty and not counts["leased"]:
+                    return
+                self._stopEvent.wait(self.pollSeconds)
+                continue
+
+            jobId, job = lease
+            result = self._run_job(jobId, job, slotName)
+            if result.cancelled and self._killEvent.is_set():
+                self.jobQueue.release(jobId, slotName)
+            elif self.jobQueue.complete(jobId, slotName, result.returncode):
+                self.finished += 1
+            else:
+                LOGGER.warning("Lost the lease of: %s. Its result was "
+                               "dropped", job.output)
+    # end _slot_loop
+
+    def _run_job(self, jobId, job, slotName):
+        """Runs one job, renewing its lease until it exits.
+
+        Returns:
+            <scheduler.JobResult>: The job's last attempt
+
+        """
+        batch = scheduler.Scheduler(maxWorkers=1, **self.schedulerOptions)
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(self.jobQueue.leaseSeconds / 3.0):
+                try:
+                    renewed = self.jobQueue.heartbeat(jobId, slotName)
+                except sqlite3.Error as err:  # ex: "database is locked"
+                    LOGGER.warning("Lease of: %s could not be renewed. "
+                                   "Trying again. %s", job.output, err)
+                    continue
+                if not renewed:
+                    LOGGER.warning("Lease of: %s was lost or cancelled. "
+                                   "Stopping it", job.output)
+                    batch.cancel()
+                    return
+        # end beat
+
+        heart = threading.Thread(target=beat)
+        heart.daemon = True
+        with self._lock:
+            self._schedulers[slotName] = batch
+        if self._killEvent.is_set():
+            batch.cancel()  # stop(kill=True) came before it was registered
+        heart.start()
+        try:
+            results = batch.run([job])
+        finally:
+            done.set()
+            with self._lock:
+                self._schedulers.pop(slotName, None)
+        LOGGER.info("%s: %s", results[-1].status.capitalize(), job.output)
+        return results[-1]
+    # end _run_job
+# end FarmWorker
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Fingerprints merge jobs so that a re-run only redoes the jobs that changed.
+
+A job's fingerprint is a hash of everything that decides its output: the
+bracket paths (in order), each bracket's size and mtime, the mkhdri flags and
+the curve file given with -ci. If content hashing is enabled, the SHA-1 of
+each file is used instead of its mtime, so that copied or touched brackets
+are not redone. Hashes from the last run are reused for every file whose
+size and mtime didn't change, so only new or changed files are read.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+file_signature: Gets the size, mtime and (optionally) content hash of a file.
+job_fingerprint: Gets the fingerprint of a merge job.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+fingerprint.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import json
+import hashlib
+
+
+HASH_CHUNK_SIZE = 1024 ** 2
+
+
+def _hash_file(path):
+    """Gets the SHA-1 of a file's contents, reading it in chunks."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+# end _hash_file
+
+
+def file_signature(path, hashContents=False, known=None):
+    """Gets the size, mtime and (optionally) content hash of a file.
+
+    Args:
+        path (str): The file to describe
+        hashContents (bool): If True, the file's SHA-1 is included
+        known (dict): The signature of the same file from a previous run.
+                      Its hash is reused if the size and mtime still match
+
+    Returns:
+        dict: The "size", "mtime" and "sha1" of the file. A missing file has
+              a size of None
+
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return {"size": None, "mtime": None, "sha1": None}
+
+    signature = {"size": info.st_size, "mtime": info.st_mtime, "sha1": None}
+    if hashContents:
+        if known and known.get("sha1") and \
+                known.get("size") == info.st_size and \
+                known.get("mtime") == info.st_mtime:
+            signature["sha1"] = known["sha1"]
+        else:
+            signature["sha1"] = _hash_file(path)
+    return signature
+# end file_signature
+
+
+def job_fingerprint(job, hashContents=False, known=None):
+    """Gets the fingerprint of a merge job.
+
+    Args:
+        job (<engine.MergeJob>): The job to fingerprint
+        hashContents (bool): If True, files are compared by content instead
+                             of by mtime
+        known (dict): File paths mapped to their signatures from a previous
+                      run. Used to skip re-hashing unchanged files
+
+    Returns:
+        tuple of str and dict: The fingerprint and the signature of every
+                               file that went into it, by path
+
+    """
+    known = known or {}
+    signatures = {}
+    files = []
+    for path in job.readFiles:
+        signature = file_signature(path, hashContents, known.get(path))
+        signatures[path] = signature
+        if hashContents:
+            files.append([path, signature["size"], signature["sha1"]])
+        else:
+            files.append([path, signature["size"], signature["mtime"]])
+
+    description = {"executable": os.path.basename(job.executable),
+                   "arguments": sorted(job.arguments),
+                   "files": files}
+    digest = hashlib.sha1(json.dumps(description, sort_keys=True).encode("utf-8"))
+    return (digest.hexdigest(), signatures)
+# end job_fingerprint
+
+
+if __name__ == "__main__":
+    print(__doc__)
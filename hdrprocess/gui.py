@@ -0,0 +1,651 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+The GUI of the tool. Kept apart from hdrprocess.py so that the command-line
+never has to import Qt.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Window: The main GUI of the tool
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+show_gui: Shows the GUI and runs the Qt event loop until it's closed
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+gui.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import sys
+import multiprocessing
+import shutil
+import functools
+
+# IMPORT THIRD-PARTY LIBRARIES
+try:
+    import PyQt4.QtCore as QtCore
+    import PyQt4.QtGui as QtGui
+except ImportError:
+    import PySide.QtCore as QtCore
+    import PySide.QtGui as QtGui
+
+# IMPORT LOCAL LIBRARIES
+import paths
+import engine
+import routine
+import scheduler
+import guiworker
+import history
+import journal
+import planner
+import retry
+import report
+import concurrency
+import batchpolicies
+import guiwidgets
+import mainWindow
+
+
+CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class Window(QtGui.QMainWindow, mainWindow.Ui_MainWindow):
+
+    """The main window that's drawn when the script is executed."""
+
+    def __init__(self, parent=None):
+        """Main constructor method for initializing an instance.
+
+        Args:
+            parent (QApplication): The application (instance or otherwise) to
+                                   hook into the GUI
+
+        """
+        super(Window, self).__init__(parent)
+        # super(Window, self).__init__(parent)
+        self.dataDict = {}
+        self.maxRowCount = 20
+        self.defLEPhrases = ["Some hdr file/folder/text file",
+                             "Input your raw files and any text files (text "\
+                             "files must comma-separated list of image names. "\
+                             "See docs for more details on that)"]
+        self.allowedExtensions = [# HDR Formats
+                                  ".pfm",
+                                  ".exr",
+                                  ".tif",
+                                  ".tiff",
+
+                                  # LDR Formats
+                                  ".jpg",
+                                  ".jpeg",
+                                  ".tga",
+                                  ".cr2",
+                                  ".raw",
+
+                                  # GENERAL Formats
+                                  ".txt"]
+        self.fnumDefault = 1.4
+        # fnum values taken from wiki page: https://en.wikipedia.org/wiki/F-number
+        self.fnumOptions = [0.5, 0.7, 1.0, 1.4, 2, 2.8, 4, 5.6, 8, 11, 16, 22,
+                            32, 45, 64, 90, 128, 180, 256]
+        self.outputTypeOptions = [".exr", ".hdr", ".tiff", ".pfm"]
+        self.outputTypeDefault = ".hdr"
+        self.curveInputDir = os.path.join(CURRENT_DIR, "dependencies")
+        self.maxThreadCount = multiprocessing.cpu_count()
+        self.maxLogLines = 2000
+        self.batchThread = None
+        self.batchWorker = None
+        self.setupUi(self)
+        self.init_ui()
+        self.trigger()
+    # end __init__
+
+    def init_ui(self):
+        """Initializes the UI window and overrides some default values."""
+        # get basic main config settings
+        self.addFolderLine_pb.setMaximumSize(90, 28)
+        self.threads_sb.setSpecialValueText("auto")  # 0 = adaptive
+        self.threads_sb.setValue(self.maxThreadCount)
+        self.autoRenameFiles_cb.setChecked(True)
+        self.curveInput_cb.addItem
+        self.defaultCurve_cb.setChecked(True)
+        self.estimateCurve_cb.setEnabled(False)
+        self.curveInput_cb.setEnabled(False)
+        self.curveInput_tb.setEnabled(False)
+        self.seqInterval_sb.setProperty("value", 5)
+        self.fnum_cb.setProperty("value", self.fnumDefault)
+        self.fnum_cb.set
+        self.colorBalancing_cb.setChecked(True)
+        self.exposureCorrection_cb.setChecked(True)
+        self.use32bitIEE_cb.setChecked(True)
+        self.fnumAutomatic_cb.setChecked(True)
+        self.fnum_sw.setEnabled(False)
+        self.init_curve_inputs()
+
+        for fnum in self.fnumOptions:
+            self.fnum_cb.addItem(str(fnum))
+        index = self.fnum_cb.findText(self.fnumDefault, QtCore.Qt.MatchFixedString)
+        if index >= 0:
+            self.fnum_cb.setCurrentIndex(index)
+
+        for opt in self.outputTypeOptions:
+            self.outputType_cb.addItem(str(opt))
+
+        index = self.fnum_cb.findText(self.outputTypeDefault, QtCore.Qt.MatchFixedString)
+        if index >= 0:
+            self.outputType_cb.setCurrentIndex(index)
+
+
+        # self.outputLogger_te.setText()
+        self.outputLogger_pb.setValue(0)
+        self.outputLogger_pb.hide()
+        self.outputLogger_te.setReadOnly(True)
+        # old lines are dropped once the cap is reached so long batches stay
+        # fast to draw and don't grow the log's memory forever
+        self.outputLogger_te.document().setMaximumBlockCount(self.maxLogLines)
+
+        # :AUTHORNOTE: :TEMP: :REMOVELATER:
+        # self.addFolderLine_le.setText(r"D:\capture_test\cr2s\Newfolder")
+        self.addFolderLine_le.setText(r"I:/Savannah/CollaborativeSpace/portal-origins-part-2/Pipeline/the_LATESTDEV/sys_PY/py_MODULES/hdrprocess/test/image_files")
+        self.recursiveSearch_cb.setChecked(True)
+    # end init_ui
+
+    def init_curve_inputs(self, fileSuffix=".crv"):
+        """Creates the options for the curve input.
+
+        Args:
+            fileSuffix (str or tuple): The extension or tuple of extensions
+                                       allowed for camera filetypes
+
+        """
+        self.curveInput_cb.clear()
+        self.curveInput_cb.addItem("")
+        for f in os.listdir(self.curveInputDir):
+            if f.lower().endswith(fileSuffix):
+                self.curveInput_cb.addItem(f)
+    # end init_curve_inputs
+
+    def trigger(self):
+        """Define the interactivity of the GUI."""
+        addFolder = functools.partial(self.add_folder_line, self.defLEPhrases[0])
+        self.addFolderLine_pb.clicked.connect(addFolder)
+        self.automaticSeq_cb.stateChanged.connect(self.auto_sequence_interval)
+        self.manual_fnum_cb.stateChanged.connect(self.exchange_fnum_widget)
+        self.connect(self.curveInput_cb,
+                     QtCore.SIGNAL("currentIndexChanged(const QString&)"),
+                     self.curve_input_blank_status)
+        self.fnumAutomatic_cb.stateChanged.connect(self.toggle_fnum_automatic)
+        self.curveInput_tb.clicked.connect(self.browse_curve_file)
+        self.estimateCurve_cb.stateChanged.connect(self.estimate_curve_checked)
+        self.defaultCurve_cb.stateChanged.connect(self.default_curve_checked)
+        self.okCancel_bb.accepted.connect(self.accept)
+        self.okCancel_bb.rejected.connect(self.reject)
+
+        QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Q"), self, self.reject)
+    # end trigger
+
+    def add_folder_line(self, defaultText=""):
+        """Creates a folder/file text field at the bottom of the layout.
+
+        The field contains a lineEdit, a QToolButton, and a QPushButton in a
+        horizontalLayout
+
+        Args:
+            defaultText (str): The text that is placed in the lineEdit
+
+        Returns:
+            NoneType: None
+
+        """
+        windowSize = self.geometry()
+
+        combinedLD = guiwidgets.CombinedRow(self)
+
+        self.DATADICT = {"license": "", "items": []}
+
+        if defaultText != "":
+            combinedLD.lineEdit.setText(defaultText)
+
+        combinedLD.remove_button()
+        combinedLD.setObjectName("horizontalLayout_2")
+        self.gridLayout.addLayout(combinedLD,
+                                  self.gridLayout.rowCount() + 1, 0, 1, 5)
+    # end add_folder_line
+
+    def auto_sequence_interval(self):
+        """Disables/Enables the sequence interval, based on whether or not
+        the user has automatic checked
+
+        .. important::
+            This function is currently not implemented
+
+        """
+        raise NotImplementedError("Auto sequence interval doesn't work yet. Sorry!")
+        isAutomaticChecked = self.automaticSeq_cb.isChecked()
+        self.seqInterval_sb.setEnabled(not isAutomaticChecked)
+    # end auto_sequenece_interval
+
+    def curve_input_blank_status(self):
+        """Toggles curve fields as un/locked, depending on if input is blank.
+
+        If the curve input is not blank, it will also lock the "Default Curve"
+        and "Estimate Curve Only" from editing.
+
+        """
+        isBlank = self.curveInput_cb.currentText()
+        if isBlank.strip() == "":
+            isBlank = True
+        else:
+            isBlank = False
+        self.defaultCurve_cb.setEnabled(isBlank)
+        self.estimateCurve_cb.setEnabled(isBlank)
+    # end curve_input_blank_status
+
+    def toggle_fnum_automatic(self):
+        """Enables/Disables the F-Num value if the checkbox is enabled."""
+        isChecked = self.fnumAutomatic_cb.isChecked()
+        self.manual_fnum_cb.setChecked(not isChecked)
+        self.fnum_sw.setEnabled(not isChecked)
+    # end toggle_fnum_automatic
+
+    def estimate_curve_checked(self):
+        """Toggles the un/lock of curve-related attributes.
+
+        If the estimate curve is checked, all other curve-related widgets are
+        disabled and vice versa
+
+        """
+        isChecked = self.estimateCurve_cb.isChecked()
+        self.defaultCurve_cb.setEnabled(not isChecked)
+        self.curveInput_cb.setEnabled(not isChecked)
+    # end estimate_curve_checked
+
+    def default_curve_checked(self):
+        """Toggles the un/lock of curve attributes, like estimate_curve_checked"""
+        isChecked = self.defaultCurve_cb.isChecked()
+        self.estimateCurve_cb.setEnabled(not isChecked)
+        self.curveInput_cb.setEnabled(not isChecked)
+    # end default_curve_checked
+
+    def accept(self):
+        """Gets the GUI's info and sends it to batch processor.
+
+        The function runs when the "OK" button is pressed.
+
+        The function keeps two dictionaries, one for displaying and other other
+        for execution. The display version is used only if the contents of the
+        script would be too long to view all at once in the GUI (aka, if it's
+        greater than self.maxRowCount)
+
+        """
+        # the truncated version is for if the retrieved items would cause the
+        # GUI to be really long. The idea is to only get the first/last pair
+        # of every filename and try to shorten the output as much as possible
+        #
+        # The original list is still retained within self.dataDict, regardless
+        #
+        self.dataDict, self.truncatedView = self.get_gui_data()
+
+        if self.dataDict.get('items', []) == []:
+            raise RuntimeError("No valid raw/text files were acquired")
+
+        try:
+            options, jobs = self.get_batch_jobs()
+        except ValueError as err:
+            QtGui.QMessageBox.warning(self, "Invalid settings", str(err))
+            return
+        costModel = history.load_model()
+        plan = planner.make_plan(jobs, concurrency.max_workers(options['threads']),
+                                 estimator=history.ModelCostEstimator(costModel))
+
+        message = 'Take a look at these settings before continuing:\n\n'\
+                  'The following file(s) will be affected:\n{f}\n\n'\
+                  'General Settings:\n'\
+                  'Output extension: {ext!r}\n'\
+                  'Number of threads allowed for the job: {tr!r}\n'\
+                  'Search all folders/subfolders? "{cb}"\n'\
+                  'Auto rename the output files? {ar!r}\n\n'\
+                  'Curve Settings:\n'\
+                  'Chosen Method: {cm!r}\n\n'\
+                  'Shooting Seetings:\n'\
+                  'F-Number (Stops): {fnum!r}\n'\
+                  'Sequence Interval: {si!r}\n\n'\
+                  'Merge Settings:\n'\
+                  'Image Alignment? {ia!r}\n'\
+                  'Exposure Correction? {ec!r}\n'\
+                  'Ghost Removal? {gr!r}\n'\
+                  'Color Balancing? {cr!r}\n\n'\
+                  'Misc Settings:\n'\
+                  'Ignore missing exposure values? {ie!r}\n'\
+                  'Use 32-bit float IEEE for TIFF files? {bt!r}\n\n'\
+                  'Plan:\n'\
+                  '{plan}\n'\
+                  ''.format(f=self.truncatedView['items'],
+                            ext=self.dataDict['outputType'],
+                            tr=options['threads'],
+                            cb=self.dataDict['recursiveSearch'],
+                            ar=self.dataDict['autoRenameFiles'],
+                            cm=self.dataDict['curveMethod'],
+                            fnum=self.dataDict['fnum'],
+                            si=self.dataDict['seqInt'],
+                            ia=self.dataDict['imageAlignment'],
+                            ec=self.dataDict['exposureCorrection'],
+                            gr=self.dataDict['ghostRemoval'],
+                            cr=self.dataDict['colorBalancing'],
+                            ie=self.dataDict['ignoreMissingExposures'],
+                            bt=self.dataDict['use32bitIEE'],
+                            plan=plan.summary()
+                            )
+
+        self.msgBox = QtGui.QMessageBox().question(self,
+                                                   'Message',
+                                                   message,
+                                                   QtGui.QMessageBox.Yes,
+                                                   QtGui.QMessageBox.No,
+                                                   )
+
+        if self.msgBox == QtGui.QMessageBox.Yes:
+            # user said yes to the message dialog
+            self.outputLogger_pb.show()
+            self.outputLogger_pb.setValue(0)
+            self.outputLogger_te.append("Script starting...")
+            self.outputLogger_te.append(plan.summary())
+
+            # run each formatted command on a separate thread. The worker's
+            # signals are queued back onto the GUI thread
+            self.okCancel_bb.button(QtGui.QDialogButtonBox.Ok).setEnabled(False)
+            self.batchThread = QtCore.QThread(self)
+            jobJournal = journal.JobJournal(journal.default_journal_path(plan.jobs))
+            self.batchWorker = guiworker.BatchWorker(plan,
+                                                     policies=batchpolicies.make_policies(options, costModel),
+                                                     observers=[jobJournal],
+                                                     history=history.RunHistory(),
+                                                     retryPolicy=retry.RetryPolicy())
+            self.batchWorker.moveToThread(self.batchThread)
+            self.batchThread.started.connect(self.batchWorker.run)
+            self.batchWorker.progress.connect(self.update_progress)
+            self.batchWorker.eta.connect(self.update_eta)
+            self.batchWorker.messages.connect(self.append_log_lines)
+            self.batchWorker.finished.connect(self.batch_finished)
+            self.batchThread.start()
+        else:
+            # close message box but do not close the main window
+            # reset dict to default settings
+            #
+            self.reset_gui_data()
+    # end accept
+
+    def get_batch_jobs(self):
+        """Builds the merge jobs for the settings in self.dataDict.
+
+        Returns:
+            tuple: The options dict given to engine.plan_batch and the
+                   list of <engine.MergeJob> that it created
+
+        """
+        options = {"threads": self.dataDict['numOfThreads'] or concurrency.AUTO,
+                   "outputType": self.dataDict['outputType'],
+                   'autoRename': self.dataDict['autoRenameFiles'],
+                   'fno': self.dataDict['fnum'],
+                   'ec': self.dataDict['exposureCorrection'],
+                   'a': self.dataDict['imageAlignment'],
+                   'gr': self.dataDict['ghostRemoval'],
+                   'cb': self.dataDict['colorBalancing'],
+                   'f32': self.dataDict['use32bitIEE'],
+                   'da': self.dataDict['ignoreMissingExposures']}
+
+        # Curve Settings
+        if self.dataDict['curveMethod'] == "Default curve":
+            options.update({"defcurve": True})
+        elif self.dataDict['curveMethod'] == "Estimate curve only":
+            options.update({"eo": True})
+        elif self.dataDict['curveMethod'] == "Curve Input":
+            curveFile = str(self.curveInput_cb.currentText()).strip()
+            options.update({"ci": os.path.join(self.curveInputDir,
+                                               curveFile)})
+
+        # the GUI can't prompt in the middle of planning, so colliding
+        # outputs get a numbered suffix instead
+        options['onCollision'] = 'rename'
+        sequences = routine.get_sequences(self.dataDict["items"],
+                                          self.dataDict["seqInt"])
+        jobs = engine.plan_batch(sequences, self.dataDict['seqInt'],
+                                 **options)
+        return (options, jobs)
+    # end get_batch_jobs
+
+    def update_progress(self, finished, total):
+        """Shows the percent of finished jobs in the progress bar.
+
+        Args:
+            finished (int): The number of jobs that have exited so far
+            total (int): The number of jobs in the batch
+
+        """
+        processPercent = finished * 100 / float(max(total, 1))
+        self.outputLogger_pb.setValue(int(processPercent))
+    # end update_progress
+
+    def update_eta(self, seconds):
+        """Shows the predicted time left in the progress bar.
+
+        Args:
+            seconds (float): The predicted number of seconds left
+
+        """
+        self.outputLogger_pb.setFormat(
+            "%p% - ETA {eta}".format(eta=planner.format_duration(seconds)))
+    # end update_eta
+
+    def append_log_lines(self, lines):
+        """Adds a group of lines to the output logger in a single redraw.
+
+        Args:
+            lines (list of strs): The lines to add
+
+        """
+        self.outputLogger_te.append("\n".join(lines))
+    # end append_log_lines
+
+    def batch_finished(self, results):
+        """Cleans up after the batch's thread has run every job.
+
+        Args:
+            results (list of <scheduler.JobResult>): The finished jobs
+
+        """
+        self.batchThread.quit()
+        self.batchThread.wait()
+        if results:
+            batchReport = report.BatchReport(results, self.batchWorker.maxWorkers)
+            self.outputLogger_te.append(batchReport.format_text())
+            try:
+                batchReport.write(os.path.dirname(results[0].job.output))
+            except (IOError, OSError) as err:
+                self.outputLogger_te.append(
+                    "The report could not be written. {err}".format(err=err))
+        self.batchThread = None
+        self.batchWorker = None
+
+        self.outputLogger_te.append("Percent Complete: 100%.")
+        self.outputLogger_pb.setValue(1)
+        self.outputLogger_pb.setFormat("%p%")
+        self.outputLogger_pb.hide()
+        self.okCancel_bb.button(QtGui.QDialogButtonBox.Ok).setEnabled(True)
+        print("Completed")
+    # end batch_finished
+
+    def get_gui_data(self):
+        """Gets information about the current scene.
+
+        Returns:
+            tuple: Returns two dictionaries. The first is the dictionary that's
+                   used for executing files and the second is used for viewing
+                   within the GUI
+
+        """
+        # Get information about the GUI before running external commands
+        self.dataDict['numOfThreads'] = self.threads_sb.value()
+        self.dataDict['outputType'] = str(self.outputType_cb.currentText()).strip()
+        self.dataDict['recursiveSearch'] = self.recursiveSearch_cb.isChecked()
+        self.dataDict['autoRenameFiles'] = self.autoRenameFiles_cb.isChecked()
+        self.dataDict['seqInt'] = self.seqInterval_sb.value()
+
+        self.dataDict['imageAlignment'] = self.imageAlignment_cb.isChecked()
+        self.dataDict['exposureCorrection'] = self.exposureCorrection_cb.isChecked()
+        self.dataDict['ghostRemoval'] = self.ghostRemoval_cb.isChecked()
+        self.dataDict['colorBalancing'] = self.colorBalancing_cb.isChecked()
+        self.dataDict['ignoreMissingExposures'] = self.ignoreMissingExposures_cb.isChecked()
+        self.dataDict['use32bitIEE'] = self.use32bitIEE_cb.isChecked()
+
+        fnumSwitch = self.fnum_sw.currentWidget()
+        if fnumSwitch == self.fnum_cb_p:
+            self.dataDict['fnum'] = str(self.fnum_cb.currentText()).strip()
+        elif fnumSwitch == self.fnum_le_p:
+            self.dataDict['fnum'] = str(self.fnum_le.text()).strip()
+        else:
+            raise RuntimeError("The expected widget returned for f-num's "
+                               "stacked widget got an unexpected value "
+                               "returned. Stopping script from continuing.")
+
+        try:
+            self.dataDict['fnum'] = float(self.dataDict['fnum'])
+        except ValueError:
+            raise ValueError("Invalid value recieved for sequencial interval. "
+                             "Please input a number (float or integer)")
+        except:
+            raise
+
+        if self.defaultCurve_cb.isChecked():
+            self.dataDict['curveMethod'] = "Default curve"
+        elif self.estimateCurve_cb.isChecked():
+            self.dataDict['curveMethod'] = "Estimate curve only"
+        elif str(self.curveInput_cb.currentText()).strip() != "":
+            self.dataDict['curveMethod'] = "Curve Input"
+        elif str(self.curveInput_cb.currentText()).strip() == "":
+            raise RuntimeError("Curve input was specified but no item as "
+                               "passed to it. Script cannot continue")
+        else:
+            raise RuntimeError("A bad widget was passed to the curve settings "
+                               "for loop. To prevent the script potentially "
+                               "executing wrongfully, the script will exit "
+                               "prematurely")
+
+        for f in self.findChildren(QtGui.QLineEdit):
+            formText = str(f.text()).strip()
+
+            if f.objectName() == "addFolderLine_le" and \
+                    formText not in self.defLEPhrases and formText != '' and \
+                    formText is not None and (os.path.isdir(formText) or \
+                    os.path.isfile(formText)):
+                self.dataDict["items"] = self.dataDict.get("items", []) + \
+                                         [formText]
+
+        self.dataDict["items"] = list(set(self.dataDict["items"]))  # remove dups
+        processedItems = routine.process_files(self.dataDict,
+                                               self.allowedExtensions,
+                                               self.defLEPhrases)
+        processedItems = routine.sort_by_ext_and_name(processedItems)
+        self.dataDict["items"] = processedItems
+        if len(self.dataDict["items"]) > self.maxRowCount:
+            processedItems = routine.truncate_filename_ranges(processedItems,
+                                                              self.maxRowCount)
+        truncatedDict = {}
+        truncatedDict.update({"items": processedItems})
+        return (self.dataDict, truncatedDict)
+    # end get_gui_data
+
+    def reset_gui_data(self):
+        """Sets GUI back to its default state.
+
+        This function must be used whenever the user stops the script
+        mid-execution or when they execute self.accept but exit out of the
+        confirmation message box prematurely. If this isn't done, the
+        information from the previous execution is compounded with the next.
+
+        """
+        self.dataDict = {}
+    # end reject_gui_data
+
+    def reject(self):
+        """The method that runs when the "Cancel" button is pressed.
+
+        If a batch is running, its merges are killed and the window stays
+        open. Otherwise the window is closed.
+
+        """
+        if self.batchWorker is not None:
+            self.outputLogger_te.append("Cancelling...")
+            self.batchWorker.cancel()
+            return
+        self.close()
+    # end reject
+
+    def exchange_fnum_widget(self):
+        """Toggles the GUI between a menu and a text box for the "f-num".
+
+        The user can either write in a f-number by hand or pick from a menu.
+
+        """
+        value = self.manual_fnum_cb.isChecked()
+        if not value:
+            self.fnum_sw.setCurrentWidget(self.fnum_cb_p)
+        else:
+            self.fnum_sw.setCurrentWidget(self.fnum_le_p)
+    # end exchange_fnum_widget
+
+    def browse_curve_file(self, preferredExt="crv"):
+        """Gets curve file from a file browser.
+
+        If the returned string from the browser is a valid file, the curve
+        input box is set to that new item and "Default Curve" and
+        "Estimate Curve Only" are disabled.
+
+        Args:
+            preferredExt (str): The extension that the browser will look for
+                                whenever listing directories for a curve file
+        """
+        # make sure to filter out all unwanted files and leave a * (All Files)
+        #
+        filepaths = QtGui.QFileDialog.getOpenFileName(self, "Browse Curve Profile")
+        filepaths = [x for x in filepaths if x.strip() != ""]
+
+        for f in filepaths:
+            if os.path.isfile(f) and f.lower().endswith(preferredExt):
+                fname = paths.path_leaf(f)
+                shutil.copy2(f, os.path.join(self.curveInputDir, fname))
+
+                self.curveInput_cb.addItem(fname)
+                index = self.curveInput_cb.findText(fname,
+                                                    QtCore.Qt.MatchFixedString)
+                if index >= 0:
+                    self.curveInput_cb.setCurrentIndex(index)
+
+                self.defaultCurve_cb.setEnabled(False)
+                self.estimateCurve_cb.setEnabled(False)
+    # end browse_curve_file
+# end Window
+
+
+def show_gui():
+    """Shows the GUI and runs the Qt event loop until it's closed."""
+    app = QtGui.QApplication.activeWindow()
+    if app is None:
+        app = QtGui.QApplication.instance()
+    if app is None:
+        app = QtGui.QApplication(sys.argv)
+
+    window = Window()
+    window.show()
+    sys.exit(app.exec_())
+# end show_gui
+
+
+if __name__ == "__main__":
+    show_gui()
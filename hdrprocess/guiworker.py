@@ -0,0 +1,239 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Runs a batch of merge jobs on a QThread so that the GUI stays responsive.
+
+The scheduler's callbacks fire on the worker thread. Instead of touching any
+widgets from there, BatchWorker collects the log lines and the latest progress
+and emits them as signals at a bounded rate. Qt queues those signals onto the
+GUI thread, which is the only place that widgets are drawn.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+ProgressThrottle: Decides if enough time has passed to report progress again.
+BatchWorker: A QObject which runs a scheduler batch when its thread starts.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+guiworker.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import time
+import threading
+
+# IMPORT THIRD-PARTY LIBRARIES
+try:
+    import PyQt4.QtCore as QtCore
+    Signal = QtCore.pyqtSignal
+except ImportError:
+    import PySide.QtCore as QtCore
+    Signal = QtCore.Signal
+
+# IMPORT LOCAL LIBRARIES
+import planner
+import scheduler
+
+
+class ProgressThrottle(object):
+
+    """Decides if enough time has passed to report progress again."""
+
+    def __init__(self, maxRate=10.0):
+        """Sets the rate limit.
+
+        Args:
+            maxRate (float): The max number of reports allowed per second
+
+        """
+        super(ProgressThrottle, self).__init__()
+        self.interval = 1.0 / maxRate
+        self._lastReport = None
+    # end __init__
+
+    def ready(self, force=False):
+        """Checks if a report may be sent now and, if so, records that it was.
+
+        Args:
+            force (bool): Always allow the report (used for the final update)
+
+        Returns:
+            bool: True if the caller should report now
+
+        """
+        now = time.time()
+        if not force and self._lastReport is not None and \
+                now - self._lastReport < self.interval:
+            return False
+        self._lastReport = now
+        return True
+    # end ready
+
+    def wait_time(self):
+        """float: The seconds until a report is allowed again (0 if now)."""
+        if self._lastReport is None:
+            return 0.0
+        return max(0.0, self._lastReport + self.interval - time.time())
+    # end wait_time
+# end ProgressThrottle
+
+
+class BatchWorker(QtCore.QObject):
+
+    """A QObject which runs a scheduler batch when its thread starts.
+
+    Signals:
+        progress (int, int): The number of finished jobs and the total
+        eta (float): The predicted number of seconds left in the batch
+        messages (list): Log lines collected since the last emit
+        finished (list): The scheduler.JobResult of every job
+
+    """
+
+    progress = Signal(int, int)
+    eta = Signal(float)
+    messages = Signal(list)
+    finished = Signal(list)
+
+    def __init__(self, plan, policies=(), observers=(), history=None,
+                 retryPolicy=None, maxRate=10.0, parent=None):
+        """Stores the jobs to run. Nothing runs until self.run is called.
+
+        Args:
+            plan (<planner.Plan>): The ordered jobs and their estimated costs
+            policies (list): The scheduler admission policies to use
+            observers (list): The scheduler observers to use
+            history (<history.RunHistory>): If given, every finished job is
+                                            recorded in it
+            retryPolicy (<retry.RetryPolicy>): Decides which failed jobs are
+                                               run again
+            maxRate (float): The max number of signal emits per second
+            parent (QObject): The Qt parent of this worker
+
+        """
+        super(BatchWorker, self).__init__(parent)
+        self.jobs = plan.jobs
+        self.maxWorkers = plan.workers
+        self.policies = policies
+        self.observers = observers
+        self.history = history
+        self.retryPolicy = retryPolicy
+        self._eta = planner.EtaEstimator(plan)
+        self._throttle = ProgressThrottle(maxRate)
+        self._pendingMessages = []
+        self._lock = threading.Lock()  # the throttle and pending messages
+        self._trailingFlush = None  # a threading.Timer, while one is pending
+        self._finishedCount = 0
+        self._scheduler = None
+        self._cancelRequested = False
+    # end __init__
+
+    def cancel(self):
+        """Kills the running jobs and skips the rest.
+
+        This is called directly from the GUI thread, since the worker's own
+        thread is busy inside of self.run.
+
+        """
+        self._cancelRequested = True
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+    # end cancel
+
+    def run(self):
+        """Runs every job. Meant to be connected to QThread.started."""
+        batch = scheduler.Scheduler(maxWorkers=self.maxWorkers,
+                                    onStart=self._eta.job_started,
+                                    onFinish=self._job_finished,
+                                    onProgress=self._job_progress,
+                                    onOutput=self._job_output,
+                                    policies=self.policies,
+                                    observers=self.observers,
+                                    retryPolicy=self.retryPolicy)
+        self._scheduler = batch
+        if self._cancelRequested:
+            batch.cancel()
+        results = batch.run(self.jobs)
+        with self._lock:
+            if self._trailingFlush is not None:
+                self._trailingFlush.cancel()
+        self._flush(len(self.jobs), force=True)
+        self.finished.emit(results)
+    # end run
+
+    def _queue_message(self, line):
+        """Adds a line to be emitted with the next throttled update."""
+        with self._lock:
+            self._pendingMessages.append(line)
+    # end _queue_message
+
+    def _job_output(self, job, streamName, line):
+        """Queues a line that a running job printed."""
+        self._queue_message(line)
+        self._flush(len(self.jobs))
+    # end _job_output
+
+    def _job_finished(self, result):
+        """Queues a log line for a finished job and records it."""
+        self._eta.job_finished(result.job)
+        if self.history is not None:
+            self.history.append(result)
+
+        if result.succeeded or result.cancelled:
+            line = "{status}: {out}".format(status=result.status.capitalize(),
+                                            out=result.job.output)
+        else:
+            line = "{status} (exit code {code!r}): {out}".format(
+                status=result.status.capitalize(), code=result.returncode,
+                out=result.job.output)
+        self._queue_message(line)
+    # end _job_finished
+
+    def _job_progress(self, finished, total):
+        """Records the progress and emits it if the throttle allows it."""
+        self._finishedCount = finished
+        self._flush(total)
+    # end _job_progress
+
+    def _flush(self, total, force=False):
+        """Emits the queued log lines and the latest progress.
+
+        It is called from the scheduler's thread and every job's reader
+        threads, so the throttle and the queued lines are only touched with
+        self._lock held. If the throttle holds the update back, a trailing
+        flush is scheduled for when it allows one, so the last lines and
+        progress of a quiet stretch (ex: the last exit before a long merge)
+        aren't held back until the next event.
+
+        """
+        with self._lock:
+            if not self._throttle.ready(force=force):
+                if self._trailingFlush is None:
+                    self._trailingFlush = threading.Timer(
+                        self._throttle.wait_time(), self._flush_trailing,
+                        args=(total,))
+                    self._trailingFlush.daemon = True
+                    self._trailingFlush.start()
+                return
+            messages = self._pendingMessages
+            self._pendingMessages = []
+            if messages:
+                self.messages.emit(messages)
+            self.progress.emit(self._finishedCount, total)
+            self.eta.emit(self._eta.remaining())
+    # end _flush
+
+    def _flush_trailing(self, total):
+        """Runs the flush that _flush scheduled."""
+        with self._lock:
+            self._trailingFlush = None
+        self._flush(total)
+    # end _flush_trailing
+# end BatchWorker
+
+
+if __name__ == "__main__":
+    print(__doc__)
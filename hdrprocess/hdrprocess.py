@@ -9,14 +9,19 @@ were pass
 Classes
 +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 CmdTool: Converts args to strings. Also handles option priority.
-Window: The main GUI of the tool
 
 Methods
 +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-run_mkhdr: Runs the multi-threaded process of the HDRi merge.
 show_gui: Shows the GUI (shows if user passes no args to the .py file)
+get_jobs: Builds the merge jobs of a batch from the command-line options.
+get_manifest_jobs: Builds the merge jobs of every shoot in a manifest.
+make_parser: Creates the parser of the batch options.
 cmd_main: Runs the command-line version of the .py
-main: Main execution which runs either cmd_main or show_gui
+submit_main: Puts the merges of a batch in a farm queue.
+worker_main: Runs the merges of a farm queue.
+serve_main: Runs the merge service of this machine.
+main: Main execution which runs cmd_main, submit_main, worker_main,
+      serve_main or show_gui
 
 Filename
 +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -29,49 +34,52 @@ import os
 import sys
 import argparse
 import multiprocessing
-import shutil
 import functools
-from subprocess import Popen
-from itertools import islice
-
-
-# IMPORT THIRD-PARTY LIBRARIES
-try:
-    import PyQt4.QtCore as QtCore
-    import PyQt4.QtGui as QtGui
-except ImportError:
-    import PySide.QtCore as QtCore
-    import PySide.QtGui as QtGui
+import collections
+import time
 
 # IMPORT LOCAL LIBRARIES
-import paths
+#
+# Qt and the GUI modules are only imported by show_gui (and sqlite3 and the
+# HTTP modules only by the farm and service modes), so that the command-line
+# starts quickly and works on machines without a display. See startup.py
+#
 import engine
-import routine
-import guiwidgets
-import mainWindow
-
-
-CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+import scheduler
+import history
+import journal
+import planner
+import planexport
+import retry
+import manifest
+import report
+import concurrency
+import devices
+import staging
+import readahead
+import transfer
+import memorybudget
+import batchpolicies
 
 
 class CmdTool:
 
     """Helps initialize the basic configuration of the command-line version."""
 
-    def __init__(self, *args):
+    def __init__(self, args):
         # optionalArgs = dict((k, v) for k, v in optionalArgs.iteritems() if v)
-        self.args = args  # keep a list of the original args
+        self.args = args  # keep a dict of the original args
         self.requiredArgKeys = ["seqInt", "inputs"]
         self.init_args()
     # end __init__
 
     def init_args(self):
         """Convenience method to help sort required args from optional ones."""
-        optionalArgs = dict((k, v) for k, v in self.args.iteritems()
+        optionalArgs = dict((k, v) for k, v in self.args.items()
                             if v is not None and v is not False)
 
         tempRequired = [x.lower() for x in self.requiredArgKeys]
-        self.requiredArgs = {k: optionalArgs[k] for k, v in optionalArgs.iteritems()
+        self.requiredArgs = {k: optionalArgs[k] for k, v in optionalArgs.items()
                              if k.lower() in tempRequired}
         for requiredArg in self.requiredArgKeys:
             optionalArgs.pop(requiredArg, None)
@@ -93,535 +101,6 @@ class CmdTool:
 # end CmdTool
 
 
-class Window(QtGui.QMainWindow, mainWindow.Ui_MainWindow):
-
-    """The main window that's drawn when the script is executed."""
-
-    def __init__(self, parent=None):
-        """Main constructor method for initializing an instance.
-
-        Args:
-            parent (QApplication): The application (instance or otherwise) to
-                                   hook into the GUI
-
-        """
-        super(Window, self).__init__(parent)
-        # super(Window, self).__init__(parent)
-        self.dataDict = {}
-        self.maxRowCount = 20
-        self.defLEPhrases = ["Some hdr file/folder/text file",
-                             "Input your raw files and any text files (text "\
-                             "files must comma-separated list of image names. "\
-                             "See docs for more details on that)"]
-        self.allowedExtensions = [# HDR Formats
-                                  ".pfm",
-                                  ".exr",
-                                  ".tif",
-                                  ".tiff",
-
-                                  # LDR Formats
-                                  ".jpg",
-                                  ".jpeg",
-                                  ".tga",
-                                  ".cr2",
-                                  ".raw",
-
-                                  # GENERAL Formats
-                                  ".txt"]
-        self.fnumDefault = 1.4
-        # fnum values taken from wiki page: https://en.wikipedia.org/wiki/F-number
-        self.fnumOptions = [0.5, 0.7, 1.0, 1.4, 2, 2.8, 4, 5.6, 8, 11, 16, 22,
-                            32, 45, 64, 90, 128, 180, 256]
-        self.outputTypeOptions = [".exr", ".hdr", ".tiff", ".pfm"]
-        self.outputTypeDefault = ".hdr"
-        self.curveInputDir = os.path.join(CURRENT_DIR, "dependencies")
-        self.maxThreadCount = multiprocessing.cpu_count()
-        self.setupUi(self)
-        self.init_ui()
-        self.trigger()
-    # end __init__
-
-    def init_ui(self):
-        """Initializes the UI window and overrides some default values."""
-        # get basic main config settings
-        self.addFolderLine_pb.setMaximumSize(90, 28)
-        self.threads_sb.setValue(self.maxThreadCount)
-        self.autoRenameFiles_cb.setChecked(True)
-        self.curveInput_cb.addItem
-        self.defaultCurve_cb.setChecked(True)
-        self.estimateCurve_cb.setEnabled(False)
-        self.curveInput_cb.setEnabled(False)
-        self.curveInput_tb.setEnabled(False)
-        self.seqInterval_sb.setProperty("value", 5)
-        self.fnum_cb.setProperty("value", self.fnumDefault)
-        self.fnum_cb.set
-        self.colorBalancing_cb.setChecked(True)
-        self.exposureCorrection_cb.setChecked(True)
-        self.use32bitIEE_cb.setChecked(True)
-        self.fnumAutomatic_cb.setChecked(True)
-        self.fnum_sw.setEnabled(False)
-        self.init_curve_inputs()
-
-        for fnum in self.fnumOptions:
-            self.fnum_cb.addItem(str(fnum))
-        index = self.fnum_cb.findText(self.fnumDefault, QtCore.Qt.MatchFixedString)
-        if index >= 0:
-            self.fnum_cb.setCurrentIndex(index)
-
-        for opt in self.outputTypeOptions:
-            self.outputType_cb.addItem(str(opt))
-
-        index = self.fnum_cb.findText(self.outputTypeDefault, QtCore.Qt.MatchFixedString)
-        if index >= 0:
-            self.outputType_cb.setCurrentIndex(index)
-
-
-        # self.outputLogger_te.setText()
-        self.outputLogger_pb.setValue(0)
-        self.outputLogger_pb.hide()
-        self.outputLogger_te.setReadOnly(True)
-
-        # :AUTHORNOTE: :TEMP: :REMOVELATER:
-        # self.addFolderLine_le.setText(r"D:\capture_test\cr2s\Newfolder")
-        self.addFolderLine_le.setText(r"I:/Savannah/CollaborativeSpace/portal-origins-part-2/Pipeline/the_LATESTDEV/sys_PY/py_MODULES/hdrprocess/test/image_files")
-        self.recursiveSearch_cb.setChecked(True)
-    # end init_ui
-
-    def init_curve_inputs(self, fileSuffix=".crv"):
-        """Creates the options for the curve input.
-
-        Args:
-            fileSuffix (str or tuple): The extension or tuple of extensions
-                                       allowed for camera filetypes
-
-        """
-        self.curveInput_cb.clear()
-        self.curveInput_cb.addItem("")
-        for f in os.listdir(self.curveInputDir):
-            if f.lower().endswith(fileSuffix):
-                self.curveInput_cb.addItem(f)
-    # end init_curve_inputs
-
-    def trigger(self):
-        """Define the interactivity of the GUI."""
-        addFolder = functools.partial(self.add_folder_line, self.defLEPhrases[0])
-        self.addFolderLine_pb.clicked.connect(addFolder)
-        self.automaticSeq_cb.stateChanged.connect(self.auto_sequence_interval)
-        self.manual_fnum_cb.stateChanged.connect(self.exchange_fnum_widget)
-        self.connect(self.curveInput_cb,
-                     QtCore.SIGNAL("currentIndexChanged(const QString&)"),
-                     self.curve_input_blank_status)
-        self.fnumAutomatic_cb.stateChanged.connect(self.toggle_fnum_automatic)
-        self.curveInput_tb.clicked.connect(self.browse_curve_file)
-        self.estimateCurve_cb.stateChanged.connect(self.estimate_curve_checked)
-        self.defaultCurve_cb.stateChanged.connect(self.default_curve_checked)
-        self.okCancel_bb.accepted.connect(self.accept)
-        self.okCancel_bb.rejected.connect(self.reject)
-
-        QtGui.QShortcut(QtGui.QKeySequence("Ctrl+Q"), self, self.reject)
-    # end trigger
-
-    def add_folder_line(self, defaultText=""):
-        """Creates a folder/file text field at the bottom of the layout.
-
-        The field contains a lineEdit, a QToolButton, and a QPushButton in a
-        horizontalLayout
-
-        Args:
-            defaultText (str): The text that is placed in the lineEdit
-
-        Returns:
-            NoneType: None
-
-        """
-        windowSize = self.geometry()
-
-        combinedLD = guiwidgets.CombinedRow(self)
-
-        self.DATADICT = {"license": "", "items": []}
-
-        if defaultText != "":
-            combinedLD.lineEdit.setText(defaultText)
-
-        combinedLD.remove_button()
-        combinedLD.setObjectName("horizontalLayout_2")
-        self.gridLayout.addLayout(combinedLD,
-                                  self.gridLayout.rowCount() + 1, 0, 1, 5)
-    # end add_folder_line
-
-    def auto_sequence_interval(self):
-        """Disables/Enables the sequence interval, based on whether or not
-        the user has automatic checked
-
-        .. important::
-            This function is currently not implemented
-
-        """
-        raise NotImplementedError("Auto sequence interval doesn't work yet. Sorry!")
-        isAutomaticChecked = self.automaticSeq_cb.isChecked()
-        self.seqInterval_sb.setEnabled(not isAutomaticChecked)
-    # end auto_sequenece_interval
-
-    def curve_input_blank_status(self):
-        """Toggles curve fields as un/locked, depending on if input is blank.
-
-        If the curve input is not blank, it will also lock the "Default Curve"
-        and "Estimate Curve Only" from editing.
-
-        """
-        isBlank = self.curveInput_cb.currentText()
-        if isBlank.strip() == "":
-            isBlank = True
-        else:
-            isBlank = False
-        self.defaultCurve_cb.setEnabled(isBlank)
-        self.estimateCurve_cb.setEnabled(isBlank)
-    # end curve_input_blank_status
-
-    def toggle_fnum_automatic(self):
-        """Enables/Disables the F-Num value if the checkbox is enabled."""
-        isChecked = self.fnumAutomatic_cb.isChecked()
-        self.manual_fnum_cb.setChecked(not isChecked)
-        self.fnum_sw.setEnabled(not isChecked)
-    # end toggle_fnum_automatic
-
-    def estimate_curve_checked(self):
-        """Toggles the un/lock of curve-related attributes.
-
-        If the estimate curve is checked, all other curve-related widgets are
-        disabled and vice versa
-
-        """
-        isChecked = self.estimateCurve_cb.isChecked()
-        self.defaultCurve_cb.setEnabled(not isChecked)
-        self.curveInput_cb.setEnabled(not isChecked)
-    # end estimate_curve_checked
-
-    def default_curve_checked(self):
-        """Toggles the un/lock of curve attributes, like estimate_curve_checked"""
-        isChecked = self.defaultCurve_cb.isChecked()
-        self.estimateCurve_cb.setEnabled(not isChecked)
-        self.curveInput_cb.setEnabled(not isChecked)
-    # end default_curve_checked
-
-    def accept(self):
-        """Gets the GUI's info and sends it to batch processor.
-
-        The function runs when the "OK" button is pressed.
-
-        The function keeps two dictionaries, one for displaying and other other
-        for execution. The display version is used only if the contents of the
-        script would be too long to view all at once in the GUI (aka, if it's
-        greater than self.maxRowCount)
-
-        """
-        # the truncated version is for if the retrieved items would cause the
-        # GUI to be really long. The idea is to only get the first/last pair
-        # of every filename and try to shorten the output as much as possible
-        #
-        # The original list is still retained within self.dataDict, regardless
-        #
-        self.dataDict, self.truncatedView = self.get_gui_data()
-
-        if self.dataDict.get('items', []) == []:
-            raise RuntimeError("No valid raw/text files were acquired")
-
-        message = 'Take a look at these settings before continuing:\n\n'\
-                  'The following file(s) will be affected:\n{f}\n\n'\
-                  'General Settings:\n'\
-                  'Output extension: {ext!r}\n'\
-                  'Number of threads allowed for the job: {tr!r}\n'\
-                  'Search all folders/subfolders? "{cb}"\n'\
-                  'Auto rename the output files? {ar!r}\n\n'\
-                  'Curve Settings:\n'\
-                  'Chosen Method: {cm!r}\n\n'\
-                  'Shooting Seetings:\n'\
-                  'F-Number (Stops): {fnum!r}\n'\
-                  'Sequence Interval: {si!r}\n\n'\
-                  'Merge Settings:\n'\
-                  'Image Alignment? {ia!r}\n'\
-                  'Exposure Correction? {ec!r}\n'\
-                  'Ghost Removal? {gr!r}\n'\
-                  'Color Balancing? {cr!r}\n\n'\
-                  'Misc Settings:\n'\
-                  'Ignore missing exposure values? {ie!r}\n'\
-                  'Use 32-bit float IEEE for TIFF files? {bt!r}\n'\
-                  ''.format(f=self.truncatedView['items'],
-                            ext=self.dataDict['outputType'],
-                            tr=self.dataDict['numOfThreads'],
-                            cb=self.dataDict['recursiveSearch'],
-                            ar=self.dataDict['autoRenameFiles'],
-                            cm=self.dataDict['curveMethod'],
-                            fnum=self.dataDict['fnum'],
-                            si=self.dataDict['seqInt'],
-                            ia=self.dataDict['imageAlignment'],
-                            ec=self.dataDict['exposureCorrection'],
-                            gr=self.dataDict['ghostRemoval'],
-                            cr=self.dataDict['colorBalancing'],
-                            ie=self.dataDict['ignoreMissingExposures'],
-                            bt=self.dataDict['use32bitIEE']
-                            )
-
-        self.msgBox = QtGui.QMessageBox().question(self,
-                                                   'Message',
-                                                   message,
-                                                   QtGui.QMessageBox.Yes,
-                                                   QtGui.QMessageBox.No,
-                                                   )
-
-        if self.msgBox == QtGui.QMessageBox.Yes:
-            # user said yes to the message dialog
-            options = {"threads": self.dataDict['numOfThreads'],
-                       "outputType": self.dataDict['outputType'],
-                       'autoRename': self.dataDict['autoRenameFiles'],
-                       'fno': self.dataDict['fnum'],
-                       'ec': self.dataDict['exposureCorrection'],
-                       'a': self.dataDict['imageAlignment'],
-                       'gr': self.dataDict['ghostRemoval'],
-                       'cb': self.dataDict['colorBalancing'],
-                       'f32': self.dataDict['use32bitIEE'],
-                       'da': self.dataDict['ignoreMissingExposures']}
-
-            # Curve Settings
-            if self.dataDict['curveMethod'] == "Default curve":
-                options.update({"defcurve": True})
-            elif self.dataDict['curveMethod'] == "Estimate curve only":
-                options.update({"eo": True})
-            elif self.dataDict['curveMethod'] == "Curve Input":
-                options.update({"ci": True})
-
-            sequences = routine.get_sequences(self.dataDict["items"],
-                                              self.dataDict["seqInt"])
-            self.outputLogger_pb.show()
-            self.outputLogger_pb.setValue(0)
-            self.outputLogger_te.append("Script starting...")
-            commands = []
-            outputs = []
-            for i, sequence in enumerate(sequences):
-                # test for a common file extension
-                extensions = [os.path.splitext(x)[-1] for x in sequence]
-                if engine.all_same(extensions):
-                    options.update({"fileType": extensions[0]})
-
-                # get progress percent
-                outputCmd = engine.hdr_batch_process(sequence,
-                                                     self.dataDict['seqInt'],
-                                                     **options)
-                commands.append(outputCmd[0])
-
-            # run each formatted command
-            processes = (Popen(cmd, shell=True) for cmd in commands)
-            running_processes = list(islice(processes, self.dataDict['numOfThreads']))  # start new processes
-            # because the processes are counting down, a reversed index is kept
-            # so that it increments while the number of remaining processes
-            # while the current execution decrements
-            #
-            reverseIndex = len(commands)
-            previousPercent = -1
-            while running_processes:
-                for i, process in enumerate(running_processes):
-                    # update time slider
-                    processPercent = ((len(commands) - len(running_processes)) /\
-                                      float(len(commands)))
-                    processPercent *= 100
-                    if processPercent != previousPercent:
-                        previousPercent = processPercent
-                        self.outputLogger_pb.setValue(processPercent)
-                        self.outputLogger_te.append("Percent Complete: {perc!r}%. "
-                                                    "\n".format(perc=processPercent))
-
-                    if process.poll() is not None:  # the process has finished
-                        try:
-                            running_processes[i] = next(processes)  # start new process
-                        except StopIteration:
-                            del running_processes[i]
-                            break
-
-            self.outputLogger_te.append("Percent Complete: 100%.")
-            self.outputLogger_pb.setValue(1)
-            self.outputLogger_pb.hide()
-            print("Completed")
-        else:
-            # close message box but do not close the main window
-            # reset dict to default settings
-            #
-            self.reset_gui_data()
-    # end accept
-
-    def get_gui_data(self):
-        """Gets information about the current scene.
-
-        Returns:
-            tuple: Returns two dictionaries. The first is the dictionary that's
-                   used for executing files and the second is used for viewing
-                   within the GUI
-
-        """
-        # Get information about the GUI before running external commands
-        self.dataDict['numOfThreads'] = self.threads_sb.value()
-        self.dataDict['outputType'] = str(self.outputType_cb.currentText()).strip()
-        self.dataDict['recursiveSearch'] = self.recursiveSearch_cb.isChecked()
-        self.dataDict['autoRenameFiles'] = self.autoRenameFiles_cb.isChecked()
-        self.dataDict['seqInt'] = self.seqInterval_sb.value()
-
-        self.dataDict['imageAlignment'] = self.imageAlignment_cb.isChecked()
-        self.dataDict['exposureCorrection'] = self.exposureCorrection_cb.isChecked()
-        self.dataDict['ghostRemoval'] = self.ghostRemoval_cb.isChecked()
-        self.dataDict['colorBalancing'] = self.colorBalancing_cb.isChecked()
-        self.dataDict['ignoreMissingExposures'] = self.ignoreMissingExposures_cb.isChecked()
-        self.dataDict['use32bitIEE'] = self.use32bitIEE_cb.isChecked()
-
-        fnumSwitch = self.fnum_sw.currentWidget()
-        if fnumSwitch == self.fnum_cb_p:
-            self.dataDict['fnum'] = str(self.fnum_cb.currentText()).strip()
-        elif fnumSwitch == self.fnum_le_p:
-            self.dataDict['fnum'] = str(self.fnum_le.text()).strip()
-        else:
-            raise RuntimeError("The expected widget returned for f-num's "
-                               "stacked widget got an unexpected value "
-                               "returned. Stopping script from continuing.")
-
-        try:
-            self.dataDict['fnum'] = float(self.dataDict['fnum'])
-        except ValueError:
-            raise ValueError("Invalid value recieved for sequencial interval. "
-                             "Please input a number (float or integer)")
-        except:
-            raise
-
-        if self.defaultCurve_cb.isChecked():
-            self.dataDict['curveMethod'] = "Default curve"
-        elif self.estimateCurve_cb.isChecked():
-            self.dataDict['curveMethod'] = "Estimate curve only"
-        elif str(self.curveInput_cb.currentText()).strip() != "":
-            self.dataDict['curveMethod'] = "Curve Input"
-        elif str(self.curveInput_cb.currentText()).strip() == "":
-            raise RuntimeError("Curve input was specified but no item as "
-                               "passed to it. Script cannot continue")
-        else:
-            raise RuntimeError("A bad widget was passed to the curve settings "
-                               "for loop. To prevent the script potentially "
-                               "executing wrongfully, the script will exit "
-                               "prematurely")
-
-        for f in self.findChildren(QtGui.QLineEdit):
-            formText = str(f.text()).strip()
-
-            if f.objectName() == "addFolderLine_le" and \
-                    formText not in self.defLEPhrases and formText != '' and \
-                    formText is not None and (os.path.isdir(formText) or \
-                    os.path.isfile(formText)):
-                self.dataDict["items"] = self.dataDict.get("items", []) + \
-                                         [formText]
-
-        self.dataDict["items"] = list(set(self.dataDict["items"]))  # remove dups
-        processedItems = routine.process_files(self.dataDict,
-                                               self.allowedExtensions,
-                                               self.defLEPhrases)
-        processedItems = routine.sort_by_ext_and_name(processedItems)
-        self.dataDict["items"] = processedItems
-        if len(self.dataDict["items"]) > self.maxRowCount:
-            processedItems = routine.truncate_filename_ranges(processedItems,
-                                                              self.maxRowCount)
-        truncatedDict = {}
-        truncatedDict.update({"items": processedItems})
-        return (self.dataDict, truncatedDict)
-    # end get_gui_data
-
-    def reset_gui_data(self):
-        """Sets GUI back to its default state.
-
-        This function must be used whenever the user stops the script
-        mid-execution or when they execute self.accept but exit out of the
-        confirmation message box prematurely. If this isn't done, the
-        information from the previous execution is compounded with the next.
-
-        """
-        self.dataDict = {}
-    # end reject_gui_data
-
-    def reject(self):
-        """The method that runs when the "OK" button is pressed."""
-        sys.exit()
-    # end reject
-
-    def exchange_fnum_widget(self):
-        """Toggles the GUI between a menu and a text box for the "f-num".
-
-        The user can either write in a f-number by hand or pick from a menu.
-
-        """
-        value = self.manual_fnum_cb.isChecked()
-        if not value:
-            self.fnum_sw.setCurrentWidget(self.fnum_cb_p)
-        else:
-            self.fnum_sw.setCurrentWidget(self.fnum_le_p)
-    # end exchange_fnum_widget
-
-    def browse_curve_file(self, preferredExt="crv"):
-        """Gets curve file from a file browser.
-
-        If the returned string from the browser is a valid file, the curve
-        input box is set to that new item and "Default Curve" and
-        "Estimate Curve Only" are disabled.
-
-        Args:
-            preferredExt (str): The extension that the browser will look for
-                                whenever listing directories for a curve file
-        """
-        # make sure to filter out all unwanted files and leave a * (All Files)
-        #
-        filepaths = QtGui.QFileDialog.getOpenFileName(self, "Browse Curve Profile")
-        filepaths = [x for x in filepaths if x.strip() != ""]
-
-        for f in filepaths:
-            if os.path.isfile(f) and f.lower().endswith(preferredExt):
-                fname = paths.path_leaf(f)
-                shutil.copy2(f, os.path.join(self.curveInputDir, fname))
-
-                self.curveInput_cb.addItem(fname)
-                index = self.curveInput_cb.findText(fname,
-                                                    QtCore.Qt.MatchFixedString)
-                if index >= 0:
-                    self.curveInput_cb.setCurrentIndex(index)
-
-                self.defaultCurve_cb.setEnabled(False)
-                self.estimateCurve_cb.setEnabled(False)
-    # end browse_curve_file
-# end Window
-
-
-def run_mkhdr(cmdList, maxWorkers, winInstance):
-    """Runs the multi-threaded process for the HDR merge.
-
-    .. warning::
-        Deprecated. Does NOT work
-
-    """
-    processes = (Popen(cmd, shell=True) for cmd in cmdList)
-    running_processes = list(islice(processes, maxWorkers))  # start new processes
-
-
-    while running_processes:
-        for i, process in enumerate(running_processes):
-            # update time slider
-            processPercent = float(i) * 100 / len(sequences)
-            winInstance.outputLogger_pb.setValue(processPercent)
-            winInstance.outputLogger_te.append("\n\nPercent Complete: {perc!r}%. "
-                                               "Processing sequence,"
-                                               "\n".format(perc=processPercent))
-            for f in sequence:
-                winInstance.outputLogger_te.append("{s!r}\n".format(s=f))
-
-            if process.poll() is not None:  # the process has finished
-                try:
-                    running_processes[i] = next(processes)  # start new process
-                except StopIteration:
-                    del running_processes[i]
-                    break
-# end run_mkhdr
-
-
 def show_gui():
     """Shows the GUI.
 
@@ -630,88 +109,77 @@ def show_gui():
         arguments or the GUI option within the command-line)
 
     """
-    app = QtGui.QApplication.activeWindow()
-    if app is None:
-        app = QtGui.QApplication.instance()
-    if app is None:
-        app = QtGui.QApplication(sys.argv)
-
-    window = Window()
-    window.show()
-    sys.exit(app.exec_())
+    import gui  # Qt is slow to import and needs a display
+    gui.show_gui()
 # end show_gui
 
 
-def cmd_main():
-    """Wraps a command-line utility around the hdr batch process.
-
-    It takes a list of files or folders, gets their hdr sequences, and outputs
-    hdrs based on common, user-specified settings.
+def get_jobs(cmdTool):
+    """Builds the merge jobs of a batch (or reads them from --rerun).
 
     Args:
-        --gui (bool): (-g) Setting this argument will ignore all over argument
-                      and simply load the GUI version of the script
+        cmdTool (<CmdTool>): The parsed options
 
-        --threads (int): (-t) The number of threads allowed for the current
-                         execution. Specified values that are > the machine's
-                         max number of threads are automatically clamped
+    Raises:
+        ValueError: If the options are not valid
 
-        --inputs-names (str): (-in) A list of comma-separated full file paths
-                              to every image that you wish to process into HDRs
-
-        --recursive (bool): (-r) If specified, the script will search folders
-                            to add files to process into HDRs recursively
-
-        --auto-renaming (bool): (-ait) Enable automatic filenaming. The feature
-                                takes first filename as its base for the rename
-
-        --input-type (str): (-ti) The file-type to process. Default is hdr if
-                            none is specified
-
-        --output-folder (str): (-o) The output folder for the created HDRs.
-                               The default folder is "$ROOT/Output_#"
-
-        --F-Num (float): (-fno) F-Number override for the sequence. Will
-                         automatically determine F-No if not specified
+    Returns:
+        list of <engine.MergeJob>: The batch's jobs
 
-        --curve-input (str): (-ci) A comma-separated list to a variable number
-                             of absolute paths pointing to text files. The text
-                             files contain information about the image brackets
-                             for a single HDR output image. Enabling this
-                             option will disable --default-curve (-dc) and
-                             --estimate-curve (-eo)
-
-        --estimate-curve (bool): (-eo) Estimate curve only (disables any input
-                                 curve files. The generated .crv file can be
-                                 used as a curve input in future executions.
-                                 Enabling this option will disable
-                                 --curve-input (-ci) and --default-curve (-dc)
-
-        --default-curve (bool): (-dc) A gamma correction of 1/2.2 is applied to
-                                the images prior to merging the images to a HDR.
-                                Enabling this option will disable
-                                --curve-input (-ci) and --estimate-curve (-eo)
+    """
+    if cmdTool.optionalArgs.get('rerunFile'):
+        return retry.read_rerun_manifest(cmdTool.optionalArgs['rerunFile'])
+    if cmdTool.optionalArgs.get('manifestFile'):
+        return get_manifest_jobs(cmdTool.optionalArgs['manifestFile'])
+    return engine.hdr_batch_process(inputs=cmdTool.requiredArgs.get('inputs'),
+                                    seqInt=cmdTool.requiredArgs.get('seqInt'),
+                                    **cmdTool.optionalArgs)
+# end get_jobs
 
-        --sequence-interval (int): (-si) The number of brackets per HDR, aka
-                                   HDR sequence interval
 
-        --image-alignment (bool): (-a) Enables image alignment for all of the
-                                  HDRs
+def get_manifest_jobs(path):
+    """Builds the merge jobs of every shoot in a manifest.
 
-        --exposure-correction (bool): (-ec) Enables exposure correction for all
-                                      of the HDRs. (Recommended to always be on)
+    Args:
+        path (str): The manifest file. See manifest.py for its format
 
-        --ghost-removal (bool): (-gr) Enables ghost removal for all of the HDRs
+    Raises:
+        ValueError: If a shoot is not valid or two shoots write the same file
 
-        --color-balancing (bool): (-cb) Enables color balancing for all of the
-                                  HDRs
+    Returns:
+        list of <engine.MergeJob>: The jobs of every shoot, in one list
 
-        --dont-ask (bool): (-da) Don't ask for exposure values if they are
-                           missing, (return error code -130 instead)
+    """
+    parser = make_parser()
+    jobs = []
+    owners = {}  # output: the name of the shoot that writes it
+    for shoot in manifest.load_manifest(path):
+        shootTool = CmdTool(manifest.shoot_args(parser, shoot))
+        shootJobs = engine.hdr_batch_process(
+            inputs=shootTool.requiredArgs.get('inputs'),
+            seqInt=shootTool.requiredArgs.get('seqInt'),
+            **shootTool.optionalArgs)
+        for job in shootJobs:
+            key = os.path.normcase(os.path.abspath(job.output))
+            if key in owners:
+                raise ValueError("Shoots: {first!r} and {second!r} both write "
+                                 "to: {out}".format(first=owners[key],
+                                                    second=shoot['name'],
+                                                    out=job.output))
+            owners[key] = shoot['name']
+        print("{name}: {count} HDRs".format(name=shoot['name'],
+                                            count=len(shootJobs)))
+        jobs.extend(shootJobs)
+    return jobs
+# end get_manifest_jobs
+
+
+def make_parser():
+    """Creates the parser of the batch options. See cmd_main for each option.
+
+    Returns:
+        <argparse.ArgumentParser>: The parser
 
-        --f32-tiff (bool): (-f32) Use 32-bit IEEE floating point for any output
-                           HDRi TIFF files. Does nothing if any other output
-                           image format is specified
     """
     description = 'Batch merge HDR images, using Picturenaut\'s mkhdri.exe '\
                   'command-line tool'
@@ -722,9 +190,11 @@ def cmd_main():
     parser.add_argument("-g", "--gui", action="store_true", dest="gui",
                         help=message)
 
-    message = "The number of CPU threads allowed to run at the same time."
-    parser.add_argument('-t', '--threads', nargs='?', const=1, type=int,
-                        dest='threads', help=message)
+    message = 'The number of CPU threads allowed to run at the same time. '\
+              '"auto" adapts it to the throughput of the machine'
+    parser.add_argument('-t', '--threads', nargs='?', const=1,
+                        type=concurrency.parse_threads, dest='threads',
+                        help=message)
 
     message = "The files/folders that you wish to process"
     parser.add_argument('-i', '--input', nargs='*',
@@ -751,6 +221,10 @@ def cmd_main():
     parser.add_argument('-o', '--output-folder', nargs='?',
                         dest='outputFolder', help=message)
 
+    message = 'Folder to write a log file of every merge\'s output to'
+    parser.add_argument('-lf', '--log-folder', nargs='?',
+                        dest='logFolder', help=message)
+
     # HDRi merge options
     message = 'F-Number override. Will automatically determine F-No if not '\
               'specified'
@@ -798,24 +272,864 @@ def cmd_main():
     parser.add_argument('-f32', '--f32-tiff', action='store_true',
                         default=False, dest="f32", help=message)
 
-    args = vars(parser.parse_args())
-    cmdTool = CmdTool(args)
+    message = 'The file-type of the HDRs. Default is .hdr'
+    parser.add_argument('-ot', '--output-type', nargs='?',
+                        choices=['.hdr', '.exr', '.tif', '.tiff', '.pfm'],
+                        dest='outputType', help=message)
+
+    message = 'The program that merges the brackets. "numpy" runs without '\
+              'mkhdri (or Wine) but does not support -a, -gr or -eo. '\
+              'Default is mkhdri'
+    parser.add_argument('-be', '--backend', default='mkhdri',
+                        choices=engine.BACKENDS, dest='backend', help=message)
+
+    message = 'Merge in strips that each use at most this much RAM, like '\
+              '256M, for brackets too large to load whole. Needs the numpy '\
+              'backend'
+    parser.add_argument('-tb', '--tile-budget', type=memorybudget.parse_size,
+                        dest='tileBudget', help=message)
+
+    # scheduling options
+    message = 'The RAM that concurrent merges may use, like 24G. "auto" '\
+              'uses most of the machine\'s RAM and "none" disables the limit'
+    parser.add_argument('-mb', '--memory-budget', nargs='?', default='auto',
+                        dest='memoryBudget', help=message)
+
+    message = 'Calibrate the memory estimate from the measured peak memory '\
+              'of finished merges'
+    parser.add_argument('-cm', '--calibrate-memory', action='store_true',
+                        default=False, dest='calibrateMemory', help=message)
+
+    message = 'The order to start merges in. "lpt" starts the most '\
+              'expensive merges first, "fifo" keeps the input order'
+    parser.add_argument('-ord', '--order', default='lpt',
+                        choices=sorted(planner.STRATEGIES), dest='order',
+                        help=message)
+
+    message = 'The file that finished merges are recorded in, used to '\
+              'predict the cost of future merges'
+    parser.add_argument('-hf', '--history', nargs='?', dest='historyFile',
+                        help=message)
+
+    message = 'Don\'t read or write the merge history'
+    parser.add_argument('-nh', '--no-history', action='store_true',
+                        default=False, dest='noHistory', help=message)
+
+    message = 'The journal file that records the state of every merge. '\
+              'Default is ".hdrprocess_journal.jsonl" in the output folder'
+    parser.add_argument('-j', '--journal', nargs='?', dest='journalFile',
+                        help=message)
+
+    message = 'Skip merges that a previous run finished and redo the ones '\
+              'that were interrupted'
+    parser.add_argument('-res', '--resume', action='store_true',
+                        default=False, dest='resume', help=message)
+
+    message = 'Only redo merges whose brackets or options changed since '\
+              'their output was made'
+    parser.add_argument('-inc', '--incremental', action='store_true',
+                        default=False, dest='incremental', help=message)
+
+    message = 'With --incremental, compare brackets by content instead of '\
+              'modification time'
+    parser.add_argument('-hi', '--hash-inputs', action='store_true',
+                        default=False, dest='hashInputs', help=message)
+
+    message = 'The seconds that a merge may run before it is killed'
+    parser.add_argument('-to', '--timeout', nargs='?', type=float,
+                        dest='timeout', help=message)
+
+    message = 'The number of retries for merges that timed out, were '\
+              'killed or couldn\'t start. Default is 2'
+    parser.add_argument('-rt', '--retries', type=int, default=2,
+                        dest='retries', help=message)
+
+    message = 'The seconds to wait before the first retry. Default is 5'
+    parser.add_argument('-rb', '--retry-backoff', type=float, default=5.0,
+                        dest='retryBackoff', help=message)
+
+    message = 'Where to save the merges that failed. Default is '\
+              '"failed_hdrs.json" in the output folder'
+    parser.add_argument('-rm', '--rerun-manifest', nargs='?',
+                        dest='rerunManifest', help=message)
+
+    message = 'Run the merges saved in a rerun manifest'
+    parser.add_argument('-rr', '--rerun', nargs='?', dest='rerunFile',
+                        help=message)
+
+    message = 'Where to write the performance report of the batch. Default '\
+              'is the output folder'
+    parser.add_argument('-rf', '--report-folder', nargs='?',
+                        dest='reportFolder', help=message)
+
+    message = 'The number of merges that may read from one storage device '\
+              'at once'
+    parser.add_argument('-dr', '--device-readers', type=int,
+                        dest='deviceReaders', help=message)
+
+    message = 'The number of merges that may write to one storage device '\
+              'at once'
+    parser.add_argument('-dw', '--device-writers', type=int,
+                        dest='deviceWriters', help=message)
+
+    message = 'The reader limit of one device, like /mnt/nas=2. Can be '\
+              'given more than once'
+    parser.add_argument('-dl', '--device-limit', action='append',
+                        dest='deviceLimits', help=message)
+
+    message = 'A local folder to copy brackets into before they are merged'
+    parser.add_argument('-sf', '--stage-folder', nargs='?',
+                        dest='stageFolder', help=message)
+
+    message = 'The most disk space that staged copies may use. Default '\
+              'is 10G'
+    parser.add_argument('-sb', '--stage-budget', default='10G',
+                        dest='stageBudget', help=message)
+
+    message = 'The number of upcoming merges to stage. Default is twice '\
+              'the number of threads'
+    parser.add_argument('-sa', '--stage-ahead', type=int, dest='stageAhead',
+                        help=message)
+
+    message = 'Pull the brackets of this many upcoming merges into the '\
+              'page cache. Default is 0 (off)'
+    parser.add_argument('-ra', '--read-ahead', type=int, default=0,
+                        dest='readAhead', help=message)
+
+    message = 'A local folder that merges write into before their HDRs are '\
+              'moved to the output folder in the background'
+    parser.add_argument('-lo', '--local-output', nargs='?',
+                        dest='localOutput', help=message)
+
+    message = 'The number of HDRs moved to the output folder at once. '\
+              'Default is 2'
+    parser.add_argument('-tt', '--transfer-threads', type=int, default=2,
+                        dest='transferThreads', help=message)
+
+    message = 'What to do when two merges would write the same HDR. '\
+              'Default is "error"'
+    parser.add_argument('-oc', '--on-collision',
+                        choices=engine.COLLISION_POLICIES, default='error',
+                        dest='onCollision', help=message)
+
+    message = 'A JSON or TOML file of shoots to merge in one batch'
+    parser.add_argument('-mf', '--manifest', nargs='?', dest='manifestFile',
+                        help=message)
+
+    message = 'Plan the batch without running anything'
+    parser.add_argument('-dry', '--dry-run', action='store_true',
+                        dest='dryRun', help=message)
+
+    message = 'Write the plan of the batch to this file'
+    parser.add_argument('-pf', '--plan-file', nargs='?', dest='planFile',
+                        help=message)
+
+    message = 'The format of the plan file. Guessed from its name if not '\
+              'given'
+    parser.add_argument('-pfm', '--plan-format', choices=planexport.FORMATS,
+                        dest='planFormat', help=message)
+    return parser
+# end make_parser
+
+
+def cmd_main(argv=None):
+    """Wraps a command-line utility around the hdr batch process.
+
+    It takes a list of files or folders, gets their hdr sequences, and outputs
+    hdrs based on common, user-specified settings.
+
+    Args:
+        argv (list of strs): The command-line arguments to parse. If None,
+                             sys.argv is used
+
+        --gui (bool): (-g) Setting this argument will ignore all over argument
+                      and simply load the GUI version of the script
+
+        --threads (int or str): (-t) The number of threads allowed for the
+                                current execution. Specified values that are >
+                                the machine's max number of threads are
+                                automatically clamped. "auto" adjusts the
+                                number while the batch runs, to merge the
+                                most brackets per minute
+
+        --inputs-names (str): (-in) A list of comma-separated full file paths
+                              to every image that you wish to process into HDRs
+
+        --recursive (bool): (-r) If specified, the script will search folders
+                            to add files to process into HDRs recursively
+
+        --auto-renaming (bool): (-ait) Enable automatic filenaming. The feature
+                                takes first filename as its base for the rename
+
+        --input-type (str): (-ti) The file-type to process. Default is hdr if
+                            none is specified
+
+        --output-folder (str): (-o) The output folder for the created HDRs.
+                               The default folder is "$ROOT/Output_#"
+
+        --F-Num (float): (-fno) F-Number override for the sequence. Will
+                         automatically determine F-No if not specified
+
+        --curve-input (str): (-ci) A comma-separated list to a variable number
+                             of absolute paths pointing to text files. The text
+                             files contain information about the image brackets
+                             for a single HDR output image. Enabling this
+                             option will disable --default-curve (-dc) and
+                             --estimate-curve (-eo)
+
+        --estimate-curve (bool): (-eo) Estimate curve only (disables any input
+                                 curve files. The generated .crv file can be
+                                 used as a curve input in future executions.
+                                 Enabling this option will disable
+                                 --curve-input (-ci) and --default-curve (-dc)
+
+        --default-curve (bool): (-dc) A gamma correction of 1/2.2 is applied to
+                                the images prior to merging the images to a HDR.
+                                Enabling this option will disable
+                                --curve-input (-ci) and --estimate-curve (-eo)
+
+        --sequence-interval (int): (-si) The number of brackets per HDR, aka
+                                   HDR sequence interval
+
+        --image-alignment (bool): (-a) Enables image alignment for all of the
+                                  HDRs
+
+        --exposure-correction (bool): (-ec) Enables exposure correction for all
+                                      of the HDRs. (Recommended to always be on)
+
+        --ghost-removal (bool): (-gr) Enables ghost removal for all of the HDRs
+
+        --color-balancing (bool): (-cb) Enables color balancing for all of the
+                                  HDRs
+
+        --dont-ask (bool): (-da) Don't ask for exposure values if they are
+                           missing, (return error code -130 instead)
+
+        --f32-tiff (bool): (-f32) Use 32-bit IEEE floating point for any output
+                           HDRi TIFF files. Does nothing if any other output
+                           image format is specified
+
+        --output-type (str): (-ot) The file-type of the HDRs: .hdr (the
+                             default), .exr, .tif, .tiff or .pfm
+
+        --backend (str): (-be) The program that merges the brackets.
+                         "mkhdri" (the default) or "numpy", which runs
+                         numpymerge.py without mkhdri or Wine. The numpy
+                         backend does not support -a, -gr or -eo
+
+        --tile-budget (str): (-tb) Merge each HDR in horizontal strips that
+                             use at most this much RAM, like 256M. Only the
+                             rows of the current strip are read from the
+                             brackets, so very large brackets can be merged
+                             several at a time. Needs --backend numpy
+
+        --memory-budget (str): (-mb) The RAM that concurrent merges may use,
+                               like 24G or 2048M. "auto" (the default) uses
+                               most of the machine's RAM and "none" disables
+                               the limit
+
+        --calibrate-memory (bool): (-cm) Correct the memory estimate of each
+                                   merge with the measured peak memory of the
+                                   merges that already finished
+
+        --order (str): (-ord) The order to start the merges in. "lpt" (the
+                       default) starts the most expensive merges first and
+                       "fifo" keeps the order of the input files
+
+        --history (str): (-hf) The file that finished merges are recorded in
+                         and that the cost model is learned from. Default is
+                         ~/.hdrprocess/history.jsonl
+
+        --no-history (bool): (-nh) Don't read or write the merge history
+
+        --journal (str): (-j) The file that the state of every merge is
+                         recorded in. Default is ".hdrprocess_journal.jsonl"
+                         in the output folder
+
+        --resume (bool): (-res) Skip the merges that a previous run already
+                         finished (according to the journal) and redo the
+                         ones that were interrupted
+
+        --incremental (bool): (-inc) Like --resume, but a finished merge is
+                              also redone if its brackets, their sizes or
+                              mtimes, or its merge options changed since
+
+        --hash-inputs (bool): (-hi) With --incremental, compare brackets by
+                              their contents instead of their mtimes. Only
+                              new or changed files are hashed
+
+        --timeout (float): (-to) The seconds that a single merge may run
+                           before it is killed. Default is no limit
+
+        --retries (int): (-rt) The number of times that a merge is retried
+                         if it timed out, was killed or couldn't be started.
+                         Default is 2
+
+        --retry-backoff (float): (-rb) The seconds to wait before the first
+                                 retry. The wait doubles on every retry
+
+        --rerun-manifest (str): (-rm) Where to save the merges that failed.
+                                Default is "failed_hdrs.json" in the output
+                                folder
 
+        --rerun (str): (-rr) Run the merges saved in a rerun manifest instead
+                       of building them from --input
+
+        --report-folder (str): (-rf) Where to write the performance report
+                               (hdrprocess_report.json/.txt) of the batch.
+                               Default is the output folder
+
+        --device-readers (int): (-dr) The number of merges that may read
+                                from the same storage device at once. Merges
+                                of different devices are interleaved
+
+        --device-writers (int): (-dw) The number of merges that may write to
+                                the same storage device at once
+
+        --device-limit (str): (-dl) A reader limit for a single device, like
+                              /mnt/nas=2. Can be given more than once
+
+        --stage-folder (str): (-sf) A local folder that brackets on other
+                              devices (ex: a NAS) are copied into before
+                              they are merged
+
+        --stage-budget (str): (-sb) The most disk space that staged copies
+                              may use, like 20G. Default is 10G
+
+        --stage-ahead (int): (-sa) The number of upcoming merges to stage.
+                             Default is twice the number of threads
+
+        --read-ahead (int): (-ra) Pull the brackets of this many upcoming
+                            merges into the OS page cache. 0 (the default)
+                            disables it
+
+        --local-output (str): (-lo) A local folder that merges write into.
+                              Each HDR is then copied to the output folder
+                              in the background, verified, and renamed into
+                              place
+
+        --transfer-threads (int): (-tt) The number of HDRs copied to the
+                                  output folder at once. Default is 2
+
+        --on-collision (str): (-oc) What to do when two merges would write
+                              the same HDR. "error" (the default) stops,
+                              "skip" keeps the first merge, "overwrite"
+                              keeps the last one and "rename" numbers the
+                              later outputs
+
+        --manifest (str): (-mf) A JSON or TOML file that lists many shoots,
+                          each with its own inputs, sequence interval,
+                          curve, flags and output folder. Every shoot is
+                          merged in this one batch. See manifest.py
+
+        --dry-run (bool): (-dry) Plan the batch but don't run anything. The
+                          plan is printed as JSON unless --plan-file is given
+
+        --plan-file (str): (-pf) Write the batch's plan (commands, inputs,
+                           outputs, estimated costs and dependencies) to
+                           this file
+
+        --plan-format (str): (-pfm) The format of --plan-file: "json",
+                             "make" (a Makefile) or "ninja" (a build.ninja).
+                             Guessed from the file name if not given
+    """
+    parser = make_parser()
+    args = vars(parser.parse_args(argv))
+    if args['gui']:
+        show_gui()
+
+    cmdTool = CmdTool(args)
+    try:
+        jobs = get_jobs(cmdTool)
+    except ValueError as err:
+        print(err)
+        return 1
+    if not jobs:  # and no output folder to keep a journal in
+        print("Nothing to merge")
+        return 0
+
+    incremental = cmdTool.optionalArgs.get('incremental', False)
+    # the hashes are only worth reading the brackets for if they are used to
+    # skip merges. Otherwise commits record the (free) sizes and mtimes
+    jobJournal = journal.JobJournal(cmdTool.optionalArgs.get('journalFile') or
+                                    journal.default_journal_path(jobs),
+                                    hashContents=incremental and
+                                    cmdTool.optionalArgs.get('hashInputs',
+                                                             False))
+    dryRun = cmdTool.optionalArgs.get('dryRun', False)
+    if cmdTool.optionalArgs.get('resume', False) or incremental:
+        allJobs = len(jobs)
+        jobs = journal.filter_resumable(jobs, jobJournal,
+                                        incremental=incremental,
+                                        removePartial=not dryRun)
+        print("Skipping {done}/{total} HDRs that are up to date".format(
+            done=allJobs - len(jobs), total=allJobs))
+
+    runHistory = None
+    costModel = None
+    if not cmdTool.optionalArgs.get('noHistory', False):
+        historyFile = cmdTool.optionalArgs.get('historyFile')
+        runHistory = history.RunHistory(historyFile)
+        costModel = history.load_model(historyFile)
+
+    groupBy = None
+    if batchpolicies.use_device_limits(cmdTool.optionalArgs):
+        groupBy = devices.job_source_device
+        sourceFolders = collections.OrderedDict()
+        for job in jobs:
+            if job.inputs:
+                sourceFolders.setdefault(groupBy(job), job.inputs[0])
+        print("Reading from {count} device(s): {mounts}".format(
+            count=len(sourceFolders),
+            mounts=", ".join(devices.mount_point(x)
+                             for x in sourceFolders.values())))
+
+    workers = concurrency.max_workers(cmdTool.optionalArgs['threads'])
+    plan = planner.make_plan(jobs, workers,
+                             strategy=cmdTool.optionalArgs['order'],
+                             estimator=history.ModelCostEstimator(costModel)
+                             if costModel is not None else None,
+                             groupBy=groupBy)
+    planFile = cmdTool.optionalArgs.get('planFile')
+    if planFile:
+        planexport.write_plan(plan, planFile,
+                              cmdTool.optionalArgs.get('planFormat'))
+    elif dryRun:
+        # keep stdout parseable
+        sys.stdout.write(planexport.format_plan(
+            plan, cmdTool.optionalArgs.get('planFormat') or 'json'))
+        return 0
+    print(plan.summary())
+    if planFile:
+        print("Plan written to: {path}".format(path=planFile))
+    if dryRun:
+        return 0
+    eta = planner.EtaEstimator(plan)
+
+    def job_finished(result):
+        eta.job_finished(result.job)
+        if runHistory is not None:
+            runHistory.append(result)
+    # end job_finished
+
+    def print_progress(finished, total):
+        print("Finished {done}/{total} HDRs. ETA {eta}".format(
+            done=finished, total=total,
+            eta=planner.format_duration(eta.remaining())))
+    # end print_progress
+
+    policies = batchpolicies.make_policies(cmdTool.optionalArgs, costModel)
+    preparers = []
+    stager = None
+    if cmdTool.optionalArgs.get('stageFolder'):
+        stager = staging.StagingCache(
+            cmdTool.optionalArgs['stageFolder'],
+            memorybudget.parse_size(cmdTool.optionalArgs['stageBudget']),
+            lookahead=cmdTool.optionalArgs.get('stageAhead') or workers * 2)
+        policies.append(stager)
+        preparers.append(stager)
+
+    observers = [jobJournal]
+    outputStager = None
+    if cmdTool.optionalArgs.get('localOutput'):
+        # the journal only hears about a job once its HDR is in place
+        outputStager = transfer.OutputStager(
+            cmdTool.optionalArgs['localOutput'],
+            workers=cmdTool.optionalArgs['transferThreads'],
+            downstream=[jobJournal])
+        recovered = outputStager.recover()
+        if recovered:
+            print("Finishing {count} transfer(s) from an earlier run".format(
+                count=recovered))
+        preparers.append(outputStager)
+        observers = [outputStager]
+
+    extraStats = []
+    prefetcher = None
+    if cmdTool.optionalArgs.get('readAhead'):
+        prefetcher = readahead.ReadAhead(cmdTool.optionalArgs['readAhead'])
+        observers.append(prefetcher)
+        extraStats.append(prefetcher.job_stats)
+
+    batch = scheduler.Scheduler(maxWorkers=workers,
+                                onStart=eta.job_started,
+                                onFinish=job_finished,
+                                onProgress=print_progress,
+                                logFolder=cmdTool.optionalArgs.get('logFolder'),
+                                policies=policies,
+                                observers=observers,
+                                timeout=cmdTool.optionalArgs.get('timeout'),
+                                retryPolicy=retry.RetryPolicy(
+                                    maxRetries=cmdTool.optionalArgs['retries'],
+                                    backoff=cmdTool.optionalArgs['retryBackoff']),
+                                preparers=preparers)
+    if stager is not None:
+        stager.onStaged = batch.wake
+        stager.start(plan.jobs)
+    if prefetcher is not None:
+        prefetcher.start(plan.jobs)
     try:
-        engine.hdr_batch_process(inputs=cmdTool.requiredArgs['inputs'],
-                                 seqInt=cmdTool.requiredArgs['seqInt'],
-                                 **optionalArgs)
-    except:
-        raise RuntimeError("Something bad happened")
+        results = batch.run(plan.jobs)
+    finally:
+        if stager is not None:
+            stager.close()
+        if prefetcher is not None:
+            prefetcher.close()
+        if outputStager is not None:
+            if outputStager.pending():
+                print("Waiting for {count} HDR(s) to reach the output "
+                      "folder".format(count=outputStager.pending()))
+            outputStager.close()
+    if results:
+        batchReport = report.BatchReport(results, plan.workers,
+                                         extraStats=extraStats)
+        print(batchReport.format_text())
+        reportFolder = cmdTool.optionalArgs.get('reportFolder') or \
+            os.path.dirname(plan.jobs[0].output)
+        try:
+            jsonPath, _ = batchReport.write(reportFolder)
+            print("Report written to: {path}".format(path=jsonPath))
+        except (IOError, OSError) as err:  # the merges are done regardless
+            print("The report could not be written. {err}".format(err=err))
+
+    failed = [x for x in results if not x.succeeded]
+    for result in failed:
+        print("{status}: {out} (exit code {code!r})".format(
+            status=result.status.capitalize(), out=result.job.output,
+            code=result.returncode))
+        if result.output is not None:
+            for _, line in result.output.tail(10):
+                print("    " + line)
+
+    if failed:
+        manifestPath = cmdTool.optionalArgs.get('rerunManifest') or \
+            os.path.join(os.path.dirname(failed[0].job.output),
+                         retry.RERUN_MANIFEST_NAME)
+        retry.write_rerun_manifest(manifestPath, failed)
+        print("{count} HDRs failed. Re-run them with: --rerun {path}".format(
+            count=len(failed), path=manifestPath))
+    if outputStager is not None and outputStager.failed:
+        print("{count} HDR(s) could not be moved to the output folder. They "
+              "are kept in: {folder} and are moved on the next run".format(
+                  count=len(outputStager.failed),
+                  folder=cmdTool.optionalArgs['localOutput']))
+        return 1
+    return int(bool(failed))
 # end cmd_main
 
 
+def submit_main(argv=None):
+    """Puts the merges of a batch in a farm queue instead of running them.
+
+    Takes every option of cmd_main (the ones that change how a batch runs
+    on this machine are ignored) and the options below. The merges are run
+    by "hdrprocess worker" processes, or by an "hdrprocess serve" service.
+
+    Args:
+        argv (list of strs): The command-line arguments to parse
+
+        --queue (str): (-q) The queue file. Workers must open the same file
+
+        --server (str): (-sv) The address of an "hdrprocess serve" service
+                        to submit to instead of a queue file, like
+                        http://127.0.0.1:8765
+
+        --priority (int): (-pri) Higher priority batches are run first.
+                          Default is 0
+
+        --batch-name (str): (-bn) The batch's name in the queue. A random one
+                            is made if not given
+
+        --wait (bool): (-w) Wait for the batch to finish, printing progress
+
+    Returns:
+        int: 0, or 1 if --wait was given and some merges failed
+
+    """
+    parser = make_parser()
+    parser.prog = 'hdrprocess submit'
+
+    message = 'The farm queue file, on storage that every worker sees'
+    parser.add_argument('-q', '--queue', dest='queueFile', help=message)
+
+    message = 'The address of an "hdrprocess serve" service to submit to'
+    parser.add_argument('-sv', '--server', dest='server', help=message)
+
+    message = 'Higher priority batches are run first. Default is 0'
+    parser.add_argument('-pri', '--priority', type=int, default=0,
+                        dest='priority', help=message)
+
+    message = 'The name of the batch in the queue'
+    parser.add_argument('-bn', '--batch-name', dest='batchName',
+                        help=message)
+
+    message = 'Wait for the batch to finish'
+    parser.add_argument('-w', '--wait', action='store_true', dest='wait',
+                        help=message)
+
+    args = vars(parser.parse_args(argv))
+    if bool(args['queueFile']) == bool(args['server']):
+        parser.error('Give either --queue or --server')
+    cmdTool = CmdTool(args)
+    try:
+        jobs = get_jobs(cmdTool)
+    except ValueError as err:
+        print(err)
+        return 1
+
+    if args['server']:
+        import service
+        client = service.ServiceClient(args['server'])
+        batchName = client.submit(jobs, priority=args['priority'],
+                                  name=args['batchName'])
+        get_batch = functools.partial(client.batch, batchName)
+    else:
+        import farm
+        jobQueue = farm.JobQueue(args['queueFile'])
+        batchName = jobQueue.submit(jobs, batch=args['batchName'],
+                                    priority=args['priority'])
+        get_batch = lambda: {'counts': jobQueue.counts(batchName),
+                             'jobs': jobQueue.jobs(batchName)}
+    print("Submitted {count} HDRs as batch: {name}".format(count=len(jobs),
+                                                           name=batchName))
+    if not args['wait']:
+        return 0
+
+    counts = get_batch()['counts']
+    while counts['queued'] or counts['leased']:
+        time.sleep(5.0)
+        counts = get_batch()['counts']
+        print("Finished {done}/{total} HDRs, {running} running".format(
+            done=counts['done'] + counts['failed'] + counts['cancelled'],
+            total=len(jobs), running=counts['leased']))
+    failed = [x for x in get_batch()['jobs'] if x['state'] != 'done']
+    for job in failed:
+        print("{state}: {out} (exit code {code!r})".format(
+            state=job['state'].capitalize(), out=job['output'],
+            code=job['returncode']))
+    return int(bool(failed))
+# end submit_main
+
+
+def worker_main(argv=None):
+    """Runs the merges of a farm queue until it is stopped.
+
+    Args:
+        argv (list of strs): The command-line arguments to parse
+
+        --queue (str): (-q) The queue file that batches are submitted to
+
+        --threads (int): (-t) The number of merges run at once. Default is
+                         the number of cores
+
+        --lease (float): (-l) The seconds that a merge stays leased to this
+                         worker without a heartbeat. When a worker dies, its
+                         merges go back in the queue after this long.
+                         Default is 60
+
+        --max-attempts (int): (-ma) The number of times that a merge may
+                              lose its lease (ex: its worker crashed)
+                              before it is marked failed. Default is 3
+
+        --exit-when-empty (bool): (-x) Stop once no merge is queued or running
+                                  instead of waiting for more
+
+        --timeout (float): (-to) The seconds that a single merge may run
+                           before it is killed. Default is no limit
+
+        --retries (int): (-rt) The number of times that a merge is retried
+                         on this worker if it timed out, was killed or
+                         couldn't be started. Default is 2
+
+        --retry-backoff (float): (-rb) The seconds to wait before the first
+                                 retry. The wait doubles on every retry
+
+        --log-folder (str): (-lf) Where to write the output of every merge
+
+    Returns:
+        int: 0
+
+    """
+    parser = argparse.ArgumentParser(
+        prog='hdrprocess worker',
+        description='Run the HDR merges of a farm queue')
+
+    message = 'The farm queue file'
+    parser.add_argument('-q', '--queue', required=True, dest='queueFile',
+                        help=message)
+
+    message = 'The number of merges run at once. Default is every core'
+    parser.add_argument('-t', '--threads', type=int,
+                        default=multiprocessing.cpu_count(), dest='threads',
+                        help=message)
+
+    message = 'The seconds that a merge stays leased without a heartbeat. '\
+              'Default is 60'
+    parser.add_argument('-l', '--lease', type=float, default=60.0,
+                        dest='lease', help=message)
+
+    message = 'The number of times that a merge may lose its lease before '\
+              'it is marked failed. Default is 3'
+    parser.add_argument('-ma', '--max-attempts', type=int, default=3,
+                        dest='maxAttempts', help=message)
+
+    message = 'Stop once the queue is empty'
+    parser.add_argument('-x', '--exit-when-empty', action='store_true',
+                        dest='exitWhenEmpty', help=message)
+
+    message = 'The seconds that a single merge may run before it is killed'
+    parser.add_argument('-to', '--timeout', type=float, dest='timeout',
+                        help=message)
+
+    message = 'The number of times that a failed merge is retried. '\
+              'Default is 2'
+    parser.add_argument('-rt', '--retries', type=int, default=2,
+                        dest='retries', help=message)
+
+    message = 'The seconds to wait before the first retry. Default is 5'
+    parser.add_argument('-rb', '--retry-backoff', type=float, default=5.0,
+                        dest='retryBackoff', help=message)
+
+    message = 'Where to write the output of every merge'
+    parser.add_argument('-lf', '--log-folder', dest='logFolder',
+                        help=message)
+
+    args = parser.parse_args(argv)
+    import farm
+    jobQueue = farm.JobQueue(args.queueFile, leaseSeconds=args.lease,
+                             maxAttempts=args.maxAttempts)
+    worker = farm.FarmWorker(jobQueue, slots=args.threads,
+                             exitWhenEmpty=args.exitWhenEmpty,
+                             timeout=args.timeout,
+                             logFolder=args.logFolder,
+                             retryPolicy=retry.RetryPolicy(
+                                 maxRetries=args.retries,
+                                 backoff=args.retryBackoff))
+    print("Worker {name} is running {slots} merge(s) at once from: "
+          "{path}".format(name=worker.name, slots=worker.slots,
+                          path=args.queueFile))
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        print("Stopped. Unfinished merges were put back in the queue")
+    print("Worker {name} finished {count} HDRs".format(name=worker.name,
+                                                        count=worker.finished))
+    return 0
+# end worker_main
+
+
+def serve_main(argv=None):
+    """Runs the merge service of this machine until it's stopped (Ctrl+C).
+
+    GUIs and scripts submit batches to it (see service.py and "hdrprocess
+    submit --server"), and it runs them all on one scheduler.
+
+    Args:
+        argv (list of strs): The command-line arguments to parse
+
+        --queue (str): (-q) The file that the batches are kept in. Default
+                       is ~/.hdrprocess/service.db
+
+        --port (int): (-p) The port to listen on, on 127.0.0.1. Default is
+                      8765
+
+        --threads (int): (-t) The number of merges run at once. Default is
+                         the number of cores
+
+        --memory-budget (str): (-mb) The RAM that concurrent merges may use,
+                               like 24G. "auto" (the default) uses most of
+                               the machine's RAM and "none" disables it
+
+        --timeout (float): (-to) The seconds that a single merge may run
+                           before it is killed. Default is no limit
+
+        --retries (int): (-rt) The number of times that a merge is retried
+                         if it timed out, was killed or couldn't be started.
+                         Default is 2
+
+        --log-folder (str): (-lf) Where to write the output of every merge
+
+    Returns:
+        int: 0
+
+    """
+    import service
+
+    parser = argparse.ArgumentParser(
+        prog='hdrprocess serve',
+        description='Run the HDR merge service of this machine')
+
+    message = 'The file that the batches are kept in'
+    parser.add_argument('-q', '--queue', default=service.DEFAULT_QUEUE,
+                        dest='queueFile', help=message)
+
+    message = 'The port to listen on, on 127.0.0.1. Default is 8765'
+    parser.add_argument('-p', '--port', type=int,
+                        default=service.DEFAULT_PORT, dest='port',
+                        help=message)
+
+    message = 'The number of merges run at once. Default is every core'
+    parser.add_argument('-t', '--threads', type=int,
+                        default=multiprocessing.cpu_count(), dest='threads',
+                        help=message)
+
+    message = 'The RAM that concurrent merges may use. Default is "auto"'
+    parser.add_argument('-mb', '--memory-budget', default='auto',
+                        dest='memoryBudget', help=message)
+
+    message = 'The seconds that a single merge may run before it is killed'
+    parser.add_argument('-to', '--timeout', type=float, dest='timeout',
+                        help=message)
+
+    message = 'The number of times that a failed merge is retried. '\
+              'Default is 2'
+    parser.add_argument('-rt', '--retries', type=int, default=2,
+                        dest='retries', help=message)
+
+    message = 'Where to write the output of every merge'
+    parser.add_argument('-lf', '--log-folder', dest='logFolder',
+                        help=message)
+
+    args = parser.parse_args(argv)
+    queueFolder = os.path.dirname(os.path.abspath(args.queueFile))
+    if not os.path.isdir(queueFolder):
+        os.makedirs(queueFolder)
+
+    import farm
+    mergeService = service.MergeService(
+        farm.JobQueue(args.queueFile), args.threads,
+        policies=batchpolicies.make_policies(
+            {'memoryBudget': args.memoryBudget}),
+        retryPolicy=retry.RetryPolicy(maxRetries=args.retries),
+        timeout=args.timeout, logFolder=args.logFolder)
+    server = service.make_server(mergeService, args.port)
+    mergeService.start()
+    print("Serving {slots} merge slot(s) on http://127.0.0.1:{port} from: "
+          "{path}".format(slots=mergeService.maxWorkers, port=args.port,
+                          path=args.queueFile))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping. Running merges are queued again on the next start")
+    finally:
+        server.server_close()
+        mergeService.stop()
+    return 0
+# end serve_main
+
+
 def main():
     """Chooses between the GUI or the command-line mode."""
     if len(sys.argv) == 1:
         show_gui()
+    elif sys.argv[1] == 'submit':
+        sys.exit(submit_main(sys.argv[2:]))
+    elif sys.argv[1] == 'worker':
+        sys.exit(worker_main(sys.argv[2:]))
+    elif sys.argv[1] == 'serve':
+        sys.exit(serve_main(sys.argv[2:]))
     else:
-        cmd_main(sys.argv[1:])
+        sys.exit(cmd_main(sys.argv[1:]))
 # end main
 
 
@@ -0,0 +1,408 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Keeps a local history of finished merges and learns their cost from it.
+
+Alignment (-a), ghost removal (-gr) and curve estimation (-eo) change the time
+of a merge by several times, which a guess based on file sizes can't know
+about. Every finished merge is appended to a JSON-lines file and a small
+linear model is fit to it, predicting the wall time and the peak memory of a
+merge from its input size, bracket count, flags and output type. Each merge
+backend (see engine.BACKENDS) gets its own model, since mkhdri and the NumPy
+merge don't spend their time and memory the same way.
+
+The planner, the GUI's ETA and the memory budget use the model when enough
+history exists and fall back to their plain estimates when it doesn't.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+RunHistory: The append-only JSON-lines file of finished merges.
+CostModel: Least-squares models of merge time and peak memory, per backend.
+ModelCostEstimator: A planner.CostEstimator that asks a CostModel first.
+ModelMemoryEstimator: A memorybudget.MemoryEstimator that asks a CostModel first.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+default_history_path: Gets the history file used if none is given.
+job_features: Gets the model's input values for a merge job.
+load_model: Reads a history file and fits a CostModel from it.
+make_record: Converts a finished job into a history record.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+history.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import io
+import json
+import errno
+import time
+import logging
+import threading
+
+# IMPORT LOCAL LIBRARIES
+import engine
+import sysinfo
+import planner
+import memorybudget
+
+
+LOGGER = logging.getLogger(__name__)
+MODEL_FLAGS = ["-a", "-gr", "-eo", "-ec", "-cb", "-tile"]
+MODEL_OUTPUT_TYPES = [".exr", ".tif", ".tiff", ".pfm"]  # .hdr is the baseline
+
+
+def default_history_path():
+    """Gets the history file used if none is given.
+
+    The HDRPROCESS_HISTORY environment variable overrides the default of
+    ~/.hdrprocess/history.jsonl.
+
+    Returns:
+        str: The path to the history file
+
+    """
+    return os.environ.get("HDRPROCESS_HISTORY",
+                          os.path.join(os.path.expanduser("~"), ".hdrprocess",
+                                       "history.jsonl"))
+# end default_history_path
+
+
+def _job_backend(job):
+    """Gets the backend of a job, counting other programs as mkhdri."""
+    return engine.job_backend(job) or "mkhdri"
+# end _job_backend
+
+
+def _job_flags(job):
+    """Gets the flags of a job without their values (-fno:2.8 -> -fno)."""
+    _, leading = engine.backend_command(_job_backend(job))
+    return sorted(set(x.split(":", 1)[0]
+                      for x in job.arguments[len(leading):]))
+# end _job_flags
+
+
+def make_record(result):
+    """Converts a finished job into a history record.
+
+    Args:
+        result (<scheduler.JobResult>): A job that finished successfully
+
+    Returns:
+        dict: The JSON-serializable record
+
+    """
+    job = result.job
+    return {"time": time.time(),
+            "backend": _job_backend(job),
+            "inputBytes": planner.CostEstimator.input_bytes(job),
+            "brackets": len(job.inputs),
+            "flags": _job_flags(job),
+            "outputType": os.path.splitext(job.output)[-1].lower(),
+            "wallTime": result.duration,
+            "peakRss": sysinfo.peak_rss_bytes(result.rusage)}
+# end make_record
+
+
+def _features(inputBytes, brackets, flags, outputType):
+    """Builds the model's input vector. See job_features."""
+    megabytes = inputBytes / float(1024 ** 2)
+    row = [1.0, megabytes, float(brackets)]
+    row.extend(megabytes if flag in flags else 0.0 for flag in MODEL_FLAGS)
+    row.extend(1.0 if outputType == ext else 0.0 for ext in MODEL_OUTPUT_TYPES)
+    return row
+# end _features
+
+
+def job_features(job):
+    """Gets the model's input values for a merge job.
+
+    Flags are multiplied by the input size, since alignment or ghost removal
+    scale with the amount of pixels to process.
+
+    Args:
+        job (<engine.MergeJob>): The job to describe
+
+    Returns:
+        list of floats: The feature vector
+
+    """
+    return _features(planner.CostEstimator.input_bytes(job), len(job.inputs),
+                     _job_flags(job), os.path.splitext(job.output)[-1].lower())
+# end job_features
+
+
+def _solve_least_squares(rows, targets, ridge=1e-6):
+    """Solves (X'X + ridge*I) w = X'y with Gaussian elimination.
+
+    The feature count is tiny, so the normal equations are cheap and no
+    linear algebra library is needed.
+
+    Args:
+        rows (list of lists): The feature vectors
+        targets (list of floats): The value to predict for each row
+        ridge (float): Regularization that keeps unused features at 0
+
+    Returns:
+        list of floats: The weights
+
+    """
+    size = len(rows[0])
+    matrix = [[0.0] * (size + 1) for _ in range(size)]
+    for row, target in zip(rows, targets):
+        for i in range(size):
+            for j in range(size):
+                matrix[i][j] += row[i] * row[j]
+            matrix[i][size] += row[i] * target
+    for i in range(size):
+        matrix[i][i] += ridge
+
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(matrix[r][col]))
+        matrix[col], matrix[pivot] = matrix[pivot], matrix[col]
+        if abs(matrix[col][col]) < 1e-12:
+            continue
+        for r in range(size):
+            if r != col:
+                factor = matrix[r][col] / matrix[col][col]
+                for c in range(col, size + 1):
+                    matrix[r][c] -= factor * matrix[col][c]
+
+    return [matrix[i][size] / matrix[i][i] if abs(matrix[i][i]) > 1e-12
+            else 0.0 for i in range(size)]
+# end _solve_least_squares
+
+
+class RunHistory(object):
+
+    """The append-only JSON-lines file of finished merges."""
+
+    def __init__(self, path=None, maxRecords=5000):
+        """Sets the file to read/write.
+
+        Args:
+            path (str): The history file. If None, default_history_path()
+            maxRecords (int): Only the newest records are used for fitting
+
+        """
+        super(RunHistory, self).__init__()
+        self.path = path or default_history_path()
+        self.maxRecords = maxRecords
+        self._lock = threading.Lock()
+    # end __init__
+
+    def records(self):
+        """Reads the newest records of the history file.
+
+        Returns:
+            list of dicts: The records. Unreadable lines are skipped
+
+        """
+        if not os.path.isfile(self.path):
+            return []
+
+        records = []
+        with io.open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash
+        return records[-self.maxRecords:]
+    # end records
+
+    def append(self, result):
+        """Adds a successfully finished job to the history.
+
+        Args:
+            result (<scheduler.JobResult>): The finished job. Failed jobs are
+                                            ignored
+
+        """
+        if not result.succeeded:
+            return
+
+        line = json.dumps(make_record(result))
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.path))
+            except OSError as err:
+                if err.errno != errno.EEXIST:
+                    raise
+            with io.open(self.path, "a", encoding="utf-8") as f:
+                f.write(u"{}\n".format(line))
+    # end append
+# end RunHistory
+
+
+class CostModel(object):
+
+    """Least-squares models of merge time and peak memory, per backend."""
+
+    def __init__(self, minSamples=10):
+        """Creates an unfitted model.
+
+        Args:
+            minSamples (int): The number of records of a backend needed
+                              before the model makes predictions for it
+
+        """
+        super(CostModel, self).__init__()
+        self.minSamples = minSamples
+        self.timeWeights = {}  # backend: weights
+        self.memoryWeights = {}
+    # end __init__
+
+    def fit(self, records):
+        """Fits the model to history records.
+
+        Args:
+            records (list of dicts): Records made by make_record. Records
+                                     without a backend are mkhdri merges
+
+        """
+        samples = {}  # backend: (rows, times, memoryRows, memories)
+        for record in records:
+            rows, times, memoryRows, memories = samples.setdefault(
+                record.get("backend", "mkhdri"), ([], [], [], []))
+            row = _features(record["inputBytes"], record["brackets"],
+                            record["flags"], record["outputType"])
+            rows.append(row)
+            times.append(record["wallTime"])
+            if record.get("peakRss"):
+                memoryRows.append(row)
+                memories.append(record["peakRss"])
+
+        for backend, (rows, times, memoryRows, memories) in samples.items():
+            if len(rows) >= self.minSamples:
+                self.timeWeights[backend] = _solve_least_squares(rows, times)
+            if len(memoryRows) >= self.minSamples:
+                self.memoryWeights[backend] = _solve_least_squares(memoryRows,
+                                                                   memories)
+    # end fit
+
+    @staticmethod
+    def _predict(weights, job):
+        """Applies the weights of the job's backend to its features."""
+        weights = weights.get(_job_backend(job))
+        if weights is None:
+            return None
+        return sum(w * x for w, x in zip(weights, job_features(job)))
+    # end _predict
+
+    def predict_time(self, job):
+        """Predicts the wall time of a job.
+
+        Args:
+            job (<engine.MergeJob>): The job to predict
+
+        Returns:
+            float or NoneType: Seconds, or None if the model isn't fitted
+                               for the job's backend
+
+        """
+        prediction = self._predict(self.timeWeights, job)
+        if prediction is None:
+            return None
+        return max(0.1, prediction)
+    # end predict_time
+
+    def predict_memory(self, job):
+        """Predicts the peak memory of a job.
+
+        Args:
+            job (<engine.MergeJob>): The job to predict
+
+        Returns:
+            int or NoneType: Bytes, or None if the model isn't fitted for
+                             the job's backend
+
+        """
+        prediction = self._predict(self.memoryWeights, job)
+        if prediction is None:
+            return None
+        return max(1, int(prediction))
+    # end predict_memory
+# end CostModel
+
+
+class ModelCostEstimator(planner.CostEstimator):
+
+    """A planner.CostEstimator that asks a CostModel first."""
+
+    def __init__(self, model):
+        """Stores the model.
+
+        Args:
+            model (<CostModel>): The (possibly unfitted) model
+
+        """
+        super(ModelCostEstimator, self).__init__()
+        self.model = model
+    # end __init__
+
+    def estimate(self, job):
+        """Predicts a job's seconds, falling back to the size-based guess."""
+        prediction = self.model.predict_time(job)
+        if prediction is None:
+            return super(ModelCostEstimator, self).estimate(job)
+        return prediction
+    # end estimate
+# end ModelCostEstimator
+
+
+class ModelMemoryEstimator(memorybudget.MemoryEstimator):
+
+    """A memorybudget.MemoryEstimator that asks a CostModel first."""
+
+    def __init__(self, model, **kwargs):
+        """Stores the model.
+
+        Args:
+            model (<CostModel>): The (possibly unfitted) model
+            **kwargs: Passed to memorybudget.MemoryEstimator
+
+        """
+        super(ModelMemoryEstimator, self).__init__(**kwargs)
+        self.model = model
+    # end __init__
+
+    def raw_estimate(self, job):
+        """Predicts a job's peak bytes, falling back to the pixel estimate."""
+        prediction = self.model.predict_memory(job)
+        if prediction is None:
+            return super(ModelMemoryEstimator, self).raw_estimate(job)
+        return prediction
+    # end raw_estimate
+# end ModelMemoryEstimator
+
+
+def load_model(path=None, minSamples=10):
+    """Reads a history file and fits a CostModel from it.
+
+    Args:
+        path (str): The history file. If None, default_history_path()
+        minSamples (int): The number of records needed for predictions
+
+    Returns:
+        <CostModel>: The model. A backend without enough history has no
+                     predictions
+
+    """
+    model = CostModel(minSamples=minSamples)
+    try:
+        model.fit(RunHistory(path).records())
+    except (IOError, OSError, KeyError, TypeError) as err:
+        LOGGER.warning("History could not be read. Using plain estimates. "
+                       "%s", err)
+    return model
+# end load_model
+
+
+if __name__ == "__main__":
+    print(__doc__)
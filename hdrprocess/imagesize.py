@@ -0,0 +1,159 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Reads the pixel dimensions of an image from its header, without decoding it
+
+Only the first few KB of each file are read, so this is cheap enough to run
+on every bracket of a batch while it is being planned. Every format that the
+GUI allows is supported (TIFF-based RAWs like CR2 included).
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+get_image_size: Gets the (width, height) of an image file.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+imagesize.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import struct
+
+
+def _tiff_size(f):
+    """Reads ImageWidth/ImageLength from the first IFD of a TIFF/CR2 file."""
+    f.seek(0)
+    header = f.read(8)
+    byteOrder = "<" if header[:2] == b"II" else ">"
+    ifdOffset = struct.unpack(byteOrder + "I", header[4:8])[0]
+    f.seek(ifdOffset)
+    entryCount = struct.unpack(byteOrder + "H", f.read(2))[0]
+    width = height = None
+    for _ in range(entryCount):
+        entry = f.read(12)
+        if len(entry) < 12:
+            break
+        tag, fieldType = struct.unpack(byteOrder + "HH", entry[:4])
+        if fieldType == 3:  # SHORT
+            value = struct.unpack(byteOrder + "H", entry[8:10])[0]
+        else:  # LONG
+            value = struct.unpack(byteOrder + "I", entry[8:12])[0]
+        if tag == 256:
+            width = value
+        elif tag == 257:
+            height = value
+    if width and height:
+        return (width, height)
+    return None
+# end _tiff_size
+
+
+def _jpeg_size(f):
+    """Reads the frame size from a JPEG's start-of-frame marker."""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0:1] != b"\xff":
+            return None
+        code = ord(marker[1:2])
+        length = struct.unpack(">H", f.read(2))[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", f.read(5)[1:5])
+            return (width, height)
+        f.seek(length - 2, os.SEEK_CUR)
+# end _jpeg_size
+
+
+def _pfm_size(f):
+    """Reads the size line of a portable float map."""
+    f.seek(0)
+    f.readline()
+    width, height = f.readline().split()[:2]
+    return (int(width), int(height))
+# end _pfm_size
+
+
+def _radiance_size(f):
+    """Reads the resolution line that follows a Radiance HDR's header."""
+    f.seek(0)
+    for _ in range(64):
+        line = f.readline()
+        if not line:
+            return None
+        if line.strip() == b"":
+            parts = f.readline().split()  # ex: -Y 512 +X 768
+            sizes = dict((parts[i][1:2].upper(), int(parts[i + 1]))
+                         for i in (0, 2))
+            return (sizes[b"X"], sizes[b"Y"])
+    return None
+# end _radiance_size
+
+
+def _exr_size(f):
+    """Reads the dataWindow attribute from an OpenEXR header."""
+    f.seek(8)
+    while True:
+        name = b""
+        while not name.endswith(b"\0"):
+            char = f.read(1)
+            if not char:
+                return None
+            name += char
+        if name == b"\0":
+            return None  # end of header
+        typeName = b""
+        while not typeName.endswith(b"\0"):
+            typeName += f.read(1)
+        size = struct.unpack("<i", f.read(4))[0]
+        if name == b"dataWindow\0":
+            xMin, yMin, xMax, yMax = struct.unpack("<iiii", f.read(16))
+            return (xMax - xMin + 1, yMax - yMin + 1)
+        f.seek(size, os.SEEK_CUR)
+# end _exr_size
+
+
+def _tga_size(f):
+    """Reads the width/height shorts of a TGA header."""
+    f.seek(12)
+    return struct.unpack("<HH", f.read(4))
+# end _tga_size
+
+
+def get_image_size(path):
+    """Gets the (width, height) of an image file.
+
+    Args:
+        path (str): The image to read
+
+    Returns:
+        tuple of ints or NoneType: (width, height) or None, if the format is
+                                   not recognized or the header is unreadable
+
+    """
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(4)
+            if magic[:2] in (b"II", b"MM"):
+                return _tiff_size(f)
+            elif magic[:2] == b"\xff\xd8":
+                return _jpeg_size(f)
+            elif magic[:2] in (b"PF", b"Pf"):
+                return _pfm_size(f)
+            elif magic[:2] == b"#?":
+                return _radiance_size(f)
+            elif magic == b"\x76\x2f\x31\x01":
+                return _exr_size(f)
+            elif path.lower().endswith(".tga"):
+                return tuple(_tga_size(f))
+    except (IOError, OSError, struct.error, ValueError, KeyError, IndexError):
+        pass
+    return None
+# end get_image_size
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Captures the stdout/stderr of merge processes while they run.
+
+Each stream of a child process is read line by line on its own thread, so the
+pipes never fill up and block mkhdri. Every line goes into a small per-job
+ring buffer (for live status in the GUI/CLI) and, optionally, into a per-job
+log file. Whole outputs are never held in memory: lines longer than MAX_LINE
+bytes are split into several lines.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+JobOutput: The most recent output lines and the log file of a single job.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+read_stream: Reads a pipe line by line into a JobOutput until it is closed.
+start_readers: Starts reader threads for a process's stdout and stderr.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+joboutput.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import io
+import logging
+import threading
+import collections
+
+
+LOGGER = logging.getLogger(__name__)
+MAX_LINE = 64 * 1024  # bytes read at most per line
+
+
+class JobOutput(object):
+
+    """The most recent output lines and the log file of a single job."""
+
+    def __init__(self, job, logPath=None, maxLines=200, onLine=None):
+        """Creates the ring buffer and opens the log file, if one is given.
+
+        Args:
+            job (any): The job whose output is being captured
+            logPath (str): The file to write every line to. If None, lines
+                           are only kept in the ring buffer
+            maxLines (int): The number of recent lines to keep in memory
+            onLine (callable): Called with (job, streamName, line) for every
+                               line as it is read
+
+        """
+        super(JobOutput, self).__init__()
+        self.job = job
+        self.logPath = logPath
+        self.onLine = onLine
+        self.lines = collections.deque(maxlen=maxLines)
+        self._lock = threading.Lock()
+        self._logFile = None
+        if logPath is not None:
+            self._logFile = io.open(logPath, "a", encoding="utf-8")
+    # end __init__
+
+    def add_line(self, streamName, line):
+        """Stores a single line of output.
+
+        Args:
+            streamName (str): "stdout" or "stderr"
+            line (unicode): The line, without its line ending
+
+        """
+        with self._lock:
+            self.lines.append((streamName, line))
+            if self._logFile is not None:
+                self._logFile.write(u"[{s}] {l}\n".format(s=streamName, l=line))
+
+        if self.onLine is not None:
+            try:
+                self.onLine(self.job, streamName, line)
+            except Exception:  # the pipe must keep draining
+                LOGGER.exception("The output callback of: %s failed",
+                                 self.job)
+    # end add_line
+
+    def tail(self, count=None):
+        """Gets the most recent lines of output.
+
+        Args:
+            count (int): The number of lines to get. If None, every line in
+                         the ring buffer is returned
+
+        Returns:
+            list of tuples: (streamName, line) pairs, oldest first
+
+        """
+        with self._lock:
+            lines = list(self.lines)
+        if count is not None:
+            lines = lines[-count:]
+        return lines
+    # end tail
+
+    @property
+    def lastLine(self):
+        """unicode or NoneType: The most recent line of output, if any."""
+        with self._lock:
+            if not self.lines:
+                return None
+            return self.lines[-1][1]
+    # end lastLine
+
+    def close(self):
+        """Closes the log file. The ring buffer is still readable afterwards."""
+        with self._lock:
+            if self._logFile is not None:
+                self._logFile.close()
+                self._logFile = None
+    # end close
+# end JobOutput
+
+
+def read_stream(pipe, streamName, output):
+    """Reads a pipe line by line into a JobOutput until it is closed.
+
+    Reads at most MAX_LINE bytes at a time, so output without line endings
+    can't grow a single line without bound.
+
+    Args:
+        pipe (file): The stdout or stderr pipe of a process
+        streamName (str): The name to record each line under
+        output (<JobOutput>): The object to store the lines in
+
+    """
+    for line in iter(lambda: pipe.readline(MAX_LINE), b""):
+        output.add_line(streamName, line.decode("utf-8", "replace").rstrip(u"\r\n"))
+    pipe.close()
+# end read_stream
+
+
+def start_readers(process, output):
+    """Starts reader threads for a process's stdout and stderr.
+
+    Args:
+        process (<subprocess.Popen>): A process started with stdout and
+                                      stderr set to subprocess.PIPE
+        output (<JobOutput>): The object to store the lines in
+
+    Returns:
+        list of <threading.Thread>: The started threads. Join them to make
+                                    sure that every line has been read
+
+    """
+    threads = []
+    for streamName, pipe in (("stdout", process.stdout),
+                             ("stderr", process.stderr)):
+        if pipe is None:
+            continue
+        thread = threading.Thread(target=read_stream,
+                                  args=(pipe, streamName, output))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    return threads
+# end start_readers
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,228 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+An append-only journal of job states, so an interrupted batch can resume.
+
+Every job writes a "started" line when it is launched and a "committed" (or
+"failed") line when it exits. A committed line records the size and mtime
+of the output so that a resumed batch can tell a finished output from one
+that was changed or deleted since. A job with a "started" line but no later
+line was in flight when the batch died and its output is partial.
+
+Committed lines also store the job's fingerprint (see fingerprint.py), so an
+incremental run can skip every job whose inputs and flags are the same as
+when its output was made.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+JobJournal: Reads/writes the JSON-lines journal of a batch.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+default_journal_path: Gets the journal file that sits next to the outputs.
+filter_resumable: Removes the jobs that a previous run already committed.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+journal.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import io
+import json
+import time
+import logging
+import threading
+
+# IMPORT LOCAL LIBRARIES
+import fingerprint
+
+
+LOGGER = logging.getLogger(__name__)
+JOURNAL_NAME = ".hdrprocess_journal.jsonl"
+
+
+def default_journal_path(jobs):
+    """Gets the journal file that sits next to the outputs.
+
+    Args:
+        jobs (list of <engine.MergeJob>): The jobs of the batch
+
+    Returns:
+        str or NoneType: The path in the first job's output folder or None if
+                         there are no jobs
+
+    """
+    if not jobs:
+        return None
+    return os.path.join(os.path.dirname(jobs[0].output), JOURNAL_NAME)
+# end default_journal_path
+
+
+class JobJournal(object):
+
+    """Reads/writes the JSON-lines journal of a batch.
+
+    The journal is a scheduler observer: it is told when every job starts
+    and finishes and appends a line for each.
+
+    """
+
+    def __init__(self, path, hashContents=False):
+        """Sets the journal file. Nothing is read until it's needed.
+
+        Args:
+            path (str): The journal file
+            hashContents (bool): If True, job fingerprints compare the
+                                 contents of the inputs instead of mtimes
+
+        """
+        super(JobJournal, self).__init__()
+        self.path = path
+        self.hashContents = hashContents
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+    # end __init__
+
+    def _write(self, record, sync=False):
+        """Appends a single record to the journal.
+
+        Args:
+            record (dict): The record to write
+            sync (bool): If True, the line is fsync'd before returning
+
+        """
+        record["time"] = time.time()
+        line = json.dumps(record)
+        with self._lock:
+            with io.open(self.path, "a", encoding="utf-8") as f:
+                f.write(u"{}\n".format(line))
+                if sync:
+                    f.flush()
+                    os.fsync(f.fileno())
+    # end _write
+
+    def states(self):
+        """Gets the latest record of every job in the journal.
+
+        Returns:
+            dict: Each job's output path mapped to its last record
+
+        """
+        states = {}
+        if not os.path.isfile(self.path):
+            return states
+
+        with io.open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                states[record["output"]] = record
+        return states
+    # end states
+
+    def fingerprint(self, job, known=None):
+        """Gets the fingerprint of a job and remembers it for its commit.
+
+        Args:
+            job (<engine.MergeJob>): The job to fingerprint
+            known (dict): File signatures from the job's last commit
+
+        Returns:
+            str: The fingerprint
+
+        """
+        digest, signatures = fingerprint.job_fingerprint(
+            job, hashContents=self.hashContents, known=known)
+        self._fingerprints[job.output] = (digest, signatures)
+        return digest
+    # end fingerprint
+
+    def job_started(self, job):
+        """Records that a job was launched."""
+        self._write({"event": "started", "output": job.output})
+    # end job_started
+
+    def job_finished(self, result):
+        """Records that a job committed its output or failed.
+
+        Args:
+            result (<scheduler.JobResult>): The finished job
+
+        """
+        output = result.job.output
+        if not result.succeeded or not os.path.isfile(output):
+            self._write({"event": "failed", "output": output,
+                         "returncode": result.returncode})
+            return
+
+        if output not in self._fingerprints:
+            self.fingerprint(result.job)
+        digest, signatures = self._fingerprints.pop(output)
+        info = os.stat(output)
+        self._write({"event": "committed", "output": output,
+                     "size": info.st_size, "mtime": info.st_mtime,
+                     "fingerprint": digest, "inputs": signatures},
+                    sync=True)
+    # end job_finished
+# end JobJournal
+
+
+def _is_committed(record):
+    """Checks if a record is a commit whose output is still unchanged."""
+    if record is None or record.get("event") != "committed":
+        return False
+    try:
+        info = os.stat(record["output"])
+    except OSError:
+        return False
+    return info.st_size == record["size"] and info.st_mtime == record["mtime"]
+# end _is_committed
+
+
+def filter_resumable(jobs, journal, incremental=False, removePartial=True):
+    """Removes the jobs that a previous run already committed.
+
+    Jobs that were in flight (started, never finished) have their partial
+    output deleted so they are redone from scratch.
+
+    Args:
+        jobs (list of <engine.MergeJob>): Every job of the batch
+        journal (<JobJournal>): The journal of the previous run
+        incremental (bool): If True, a committed job is only skipped if its
+                            fingerprint hasn't changed since the commit
+        removePartial (bool): If False, partial outputs are left alone (ex:
+                              for a dry run)
+
+    Returns:
+        list of <engine.MergeJob>: The jobs that still need to run
+
+    """
+    states = journal.states()
+    remaining = []
+    for job in jobs:
+        record = states.get(job.output)
+        if _is_committed(record):
+            if not incremental:
+                continue
+            digest = journal.fingerprint(job, known=record.get("inputs"))
+            if digest == record.get("fingerprint"):
+                continue
+
+        if removePartial and record is not None and \
+                record.get("event") == "started" and os.path.isfile(job.output):
+            LOGGER.info("Removing partial output: %s", job.output)
+            os.remove(job.output)
+        remaining.append(job)
+    return remaining
+# end filter_resumable
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,170 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Reads a manifest that lists many shoots, each with its own merge settings, so
+that one run can merge all of them.
+
+A manifest is a JSON (or, where a TOML reader is installed, a TOML) file:
+
+    {
+        "defaults": {"default-curve": true, "auto-renaming": true},
+        "shoots": [
+            {"name": "lobby", "input": ["/shoots/lobby/a.cr2", ...],
+             "sequence-interval": 3, "output-folder": "/hdr/lobby"},
+            {"name": "roof", "input": [...], "sequence-interval": 5,
+             "curve-input": "/curves/5d.crv", "F-Num": 8}
+        ]
+    }
+
+Every key is a command-line option, by its long name ("sequence-interval")
+or by its name in CmdTool ("seqInt"). "defaults" applies to every shoot and
+each shoot can override it. Only the options that describe the merges
+(inputs, bracket count, curve, flags, backend, output folder, names and type)
+are read from the manifest. Options of the run itself (threads, memory
+budget, staging, reports...) come from the command-line.
+
+The jobs of every shoot are planned and run as one batch, so the workers
+don't wait for the slowest merge of one shoot before starting the next.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+load_manifest: Reads the settings of every shoot in a manifest.
+shoot_args: Converts a shoot's settings to parsed command-line arguments.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+manifest.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import io
+import os
+import json
+
+try:
+    import tomllib as toml  # Python 3.11+
+except ImportError:
+    try:
+        import toml
+    except ImportError:
+        toml = None
+
+
+# the options that describe a shoot's merges. Everything else is batch-wide
+SHOOT_OPTIONS = ("inputs", "inputFileNames", "recursive", "autoRename",
+                 "fileType", "outputFolder", "fno", "ci", "eo",
+                 "defcurve", "seqInt", "a", "ec", "gr", "cb", "da", "f32",
+                 "outputType", "backend", "tileBudget", "onCollision")
+
+
+def load_manifest(path):
+    """Reads the settings of every shoot in a manifest.
+
+    Args:
+        path (str): The .json or .toml manifest
+
+    Raises:
+        ValueError: If the manifest has no shoots or can't be read
+
+    Returns:
+        list of dicts: The settings of each shoot, with the defaults applied.
+                       Shoots without a "name" are named by their position
+
+    """
+    if os.path.splitext(path)[-1].lower() == ".toml":
+        if toml is None:
+            raise ValueError("Manifest: {path} is TOML, but no TOML reader "
+                             "is installed. Use JSON or install "
+                             "toml".format(path=path))
+        if toml.__name__ == "tomllib":
+            with open(path, "rb") as f:
+                data = toml.load(f)
+        else:
+            with io.open(path, "r", encoding="utf-8") as f:
+                data = toml.load(f)
+    else:
+        with io.open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+    if not data.get("shoots"):
+        raise ValueError("Manifest: {path} has no shoots".format(path=path))
+
+    shoots = []
+    for index, settings in enumerate(data["shoots"]):
+        shoot = dict(data.get("defaults", {}))
+        shoot.update(settings)
+        shoot.setdefault("name", "shoot {0}".format(index + 1))
+        shoots.append(shoot)
+    return shoots
+# end load_manifest
+
+
+def shoot_args(parser, settings):
+    """Converts a shoot's settings to parsed command-line arguments.
+
+    The values go through the parser, so they are converted and checked
+    the same way as on the command-line.
+
+    Args:
+        parser (<argparse.ArgumentParser>): The parser of the batch options
+        settings (dict): The shoot's settings, from load_manifest
+
+    Raises:
+        ValueError: If a setting is not one of the shoot options, or its
+                    value is not valid
+
+    Returns:
+        dict: The same arguments that parser.parse_args would give (as a
+              dict), for the shoot's options only
+
+    """
+    actions = {}
+    for action in parser._actions:
+        actions[action.dest] = action
+        for option in action.option_strings:
+            actions[option.lstrip("-")] = action
+
+    argv = []
+    overrides = {}
+    for key, value in settings.items():
+        if key == "name":
+            continue
+        action = actions.get(key)
+        if action is None or action.dest not in SHOOT_OPTIONS:
+            raise ValueError("Shoot: {name!r} has an unknown setting: "
+                             "{key!r}. Shoots may only set these options: "
+                             "{opts}".format(
+                                 name=settings["name"], key=key,
+                                 opts=", ".join(SHOOT_OPTIONS)))
+        option = action.option_strings[-1]
+        if value is None or isinstance(value, bool):
+            overrides[action.dest] = value  # store_true options can't be unset
+        elif isinstance(value, list):
+            argv.append(option)
+            argv.extend(str(x) for x in value)
+        else:
+            argv.append("{0}={1}".format(option, value))
+
+    def fail(message):
+        """Replaces parser.error, which would print the usage and exit."""
+        raise ValueError("Shoot: {name!r} has an invalid setting. "
+                         "{msg}".format(name=settings["name"], msg=message))
+    # end fail
+
+    error = parser.error
+    parser.error = fail
+    try:
+        args = vars(parser.parse_args(argv))
+    finally:
+        parser.error = error
+    args.update(overrides)
+    return dict((key, value) for key, value in args.items()
+                if key in SHOOT_OPTIONS)
+# end shoot_args
+
+
+if __name__ == "__main__":
+    print(__doc__)
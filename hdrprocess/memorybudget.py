@@ -0,0 +1,266 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Keeps concurrent merges within a RAM budget.
+
+mkhdri decodes every bracket of a job into float buffers, so a job's peak
+memory grows with the bracket count and the pixel dimensions, not with the
+number of CPU threads. The scheduler asks MemoryBudget before it starts each
+job and the job only starts if its estimated peak fits next to the jobs that
+are already running. Tiled merges (numpymerge.py's -tile:) are estimated
+from their tile budget instead.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+MemoryEstimator: Guesses the peak memory of a merge job from its brackets.
+MemoryBudget: A scheduler admission policy that enforces a RAM budget.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+parse_size: Converts a size like "24G" or "auto" to a number of bytes.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+memorybudget.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import re
+import logging
+
+# IMPORT LOCAL LIBRARIES
+import sysinfo
+import imagesize
+
+
+LOGGER = logging.getLogger(__name__)
+AUTO_BUDGET_FRACTION = 0.8  # the fraction of physical RAM used by "auto"
+SIZE_SUFFIXES = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3,
+                 "T": 1024 ** 4}
+
+
+def parse_size(text):
+    """Converts a size like "24G" or "auto" to a number of bytes.
+
+    Args:
+        text (str): A number with an optional K/M/G/T suffix, "auto" (a
+                    fraction of the machine's physical RAM) or "none"/"0"
+                    (no limit)
+
+    Returns:
+        int or NoneType: The number of bytes or None for no limit
+
+    """
+    text = str(text).strip().upper()
+    if text in ("", "NONE", "0"):
+        return None
+    if text == "AUTO":
+        total = sysinfo.total_memory()
+        if total is None:
+            LOGGER.warning("Physical memory could not be found. The memory "
+                           "budget is disabled")
+            return None
+        return int(total * AUTO_BUDGET_FRACTION)
+
+    match = re.match(r"^([0-9.]+)\s*([KMGT]?)I?B?$", text)
+    if match is None:
+        raise ValueError("Memory size: {t!r} could not be read. Use a number "
+                         "like 2048M or 24G, or auto".format(t=text))
+    return int(float(match.group(1)) * SIZE_SUFFIXES[match.group(2)])
+# end parse_size
+
+
+class MemoryEstimator(object):
+
+    """Guesses the peak memory of a merge job from its brackets."""
+
+    def __init__(self, bytesPerPixel=12, fallbackExpansion=8.0,
+                 smoothing=0.3):
+        """Sets the constants of the estimate.
+
+        Args:
+            bytesPerPixel (int): The size of one decoded pixel. mkhdri works
+                                 in 3-channel, 32-bit float
+            fallbackExpansion (float): Used if an image's dimensions can't be
+                                       read. The job's input bytes are
+                                       multiplied by this number instead
+            smoothing (float): How much each calibration sample moves the
+                               scale (0-1). Higher is more reactive
+
+        """
+        super(MemoryEstimator, self).__init__()
+        self.bytesPerPixel = bytesPerPixel
+        self.fallbackExpansion = fallbackExpansion
+        self.smoothing = smoothing
+        self.scale = 1.0
+        self.samples = 0
+        self._sizeCache = {}
+    # end __init__
+
+    def _image_size(self, path):
+        """Gets the (width, height) of an image, caching it by path."""
+        if path not in self._sizeCache:
+            self._sizeCache[path] = imagesize.get_image_size(path)
+        return self._sizeCache[path]
+    # end _image_size
+
+    def raw_estimate(self, job):
+        """Estimates a job's peak memory, before calibration is applied.
+
+        The estimate is one decoded float buffer per bracket plus one for the
+        merged result, plus the encoded files themselves.
+
+        Args:
+            job (<engine.MergeJob>): The job to estimate
+
+        Returns:
+            int: The estimated peak memory, in bytes
+
+        """
+        fileBytes = 0
+        for path in job.inputs:
+            try:
+                fileBytes += os.path.getsize(path)
+            except OSError:
+                pass
+
+        dimensions = None
+        if job.inputs:
+            dimensions = self._image_size(job.inputs[0])
+        tileBytes = [int(x.split(":", 1)[1]) for x in job.arguments
+                     if x.startswith("-tile:")]
+        if tileBytes:
+            return tileBytes[0] + self._tiled_decode_bytes(job, dimensions,
+                                                           fileBytes)
+        if dimensions is None:
+            return int(fileBytes * self.fallbackExpansion)
+
+        width, height = dimensions
+        decodedBytes = width * height * self.bytesPerPixel
+        return decodedBytes * (len(job.inputs) + 1) + fileBytes
+    # end raw_estimate
+
+    def _tiled_decode_bytes(self, job, dimensions, fileBytes):
+        """Estimates the memory that a tiled merge needs besides its tiles.
+
+        TIFFs are read a strip at a time (if they are uncompressed, which is
+        assumed). Other brackets are decoded whole, one at a time, into a
+        temporary file (the decoder's image and an integer copy of it, up to
+        16-bit RGB).
+
+        """
+        if all(os.path.splitext(x)[-1].lower() in (".tif", ".tiff")
+               for x in job.inputs):
+            return 0
+        if dimensions is None:
+            return int(fileBytes * self.fallbackExpansion /
+                       max(1, len(job.inputs)))
+        width, height = dimensions
+        return width * height * 3 * 2 * 2
+    # end _tiled_decode_bytes
+
+    def estimate(self, job):
+        """Estimates a job's peak memory, in bytes, scaled by calibration."""
+        return int(self.raw_estimate(job) * self.scale)
+    # end estimate
+
+    def calibrate(self, job, peakBytes):
+        """Moves the scale of future estimates towards a measured peak.
+
+        Args:
+            job (<engine.MergeJob>): The finished job
+            peakBytes (int): The peak RSS that the job's process reached
+
+        """
+        rawEstimate = self.raw_estimate(job)
+        if rawEstimate <= 0 or not peakBytes:
+            return
+
+        ratio = peakBytes / float(rawEstimate)
+        if self.samples == 0:
+            self.scale = ratio
+        else:
+            self.scale += (ratio - self.scale) * self.smoothing
+        self.samples += 1
+    # end calibrate
+# end MemoryEstimator
+
+
+class MemoryBudget(object):
+
+    """A scheduler admission policy that enforces a RAM budget.
+
+    A job is admitted only if its estimate fits next to the estimates of the
+    jobs that are already running. If nothing is running, the job is always
+    admitted, even if it is bigger than the budget, so that the batch can
+    never stall.
+
+    """
+
+    def __init__(self, budgetBytes, estimator=None, calibrate=False):
+        """Sets the budget.
+
+        Args:
+            budgetBytes (int): The amount of memory that running jobs may use
+            estimator (<MemoryEstimator>): The estimator to use. A default
+                                           one is made if None
+            calibrate (bool): If True, the estimator is calibrated with the
+                              measured peak RSS of every finished job
+
+        """
+        super(MemoryBudget, self).__init__()
+        self.budgetBytes = budgetBytes
+        self.estimator = estimator or MemoryEstimator()
+        self.calibrate = calibrate
+        self._reserved = {}
+    # end __init__
+
+    @property
+    def reservedBytes(self):
+        """int: The summed estimates of every running job."""
+        return sum(self._reserved.values())
+    # end reservedBytes
+
+    def can_start(self, job):
+        """Checks if job fits in the budget next to the running jobs.
+
+        Args:
+            job (<engine.MergeJob>): The job that the scheduler wants to start
+
+        Returns:
+            bool: True if the job may start now
+
+        """
+        if not self._reserved:
+            return True
+        return self.reservedBytes + self.estimator.estimate(job) <= \
+            self.budgetBytes
+    # end can_start
+
+    def job_started(self, job):
+        """Reserves the job's estimated memory."""
+        self._reserved[id(job)] = self.estimator.estimate(job)
+    # end job_started
+
+    def job_finished(self, result):
+        """Releases the job's memory and calibrates from its measured peak.
+
+        Args:
+            result (<scheduler.JobResult>): The finished job
+
+        """
+        self._reserved.pop(id(result.job), None)
+        if self.calibrate:
+            peakBytes = sysinfo.peak_rss_bytes(result.rusage)
+            if peakBytes is not None:
+                self.estimator.calibrate(result.job, peakBytes)
+    # end job_finished
+# end MemoryBudget
+
+
+if __name__ == "__main__":
+    print(__doc__)
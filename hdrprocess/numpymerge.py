@@ -0,0 +1,1089 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Merges brackets into an HDR with NumPy, as a replacement for mkhdri.exe on
+machines that would otherwise run it through Wine.
+
+It takes mkhdri's flags, so a batch only has to change the command that its
+jobs run (see engine.BACKENDS and "hdrprocess --backend numpy"):
+
+    python numpymerge.py -defcurve -ec -out:/hdr/lobby.hdr a.jpg b.jpg c.jpg
+
+Supported flags are -fno:N, -defcurve, -ci:file.crv, -ec, -cb, -f32 and -da.
+Alignment, ghost removal and curve estimation (-a, -gr, -eo) need mkhdri.
+The extra flag -tile:BYTES merges in horizontal strips that each use at most
+BYTES of memory (see merge_files), for brackets too large to hold at once.
+
+Every bracket is linearized with the camera curve (the per-channel
+polynomials of a Picturenaut .crv file, or the sRGB curve for -defcurve) and
+divided by its exposure (exposure time x ISO / 100 / F-number squared, from
+the EXIF). The HDR is the weighted mean of those radiance estimates. A hat
+function trusts the mid-tones of each bracket, while the darkest bracket
+also keeps its highlights and the brightest its shadows, so pixels that are
+clipped in every bracket still get a value.
+
+-ec measures the exposure ratio of neighbouring brackets from the pixels
+that both exposed well, instead of trusting the EXIF. -cb scales the
+channels so that the well-exposed pixels average to gray. -da is accepted
+but changes nothing: a bracket without an exposure always fails the merge
+(exit code 130, like mkhdri's -130), since there is no one to ask.
+
+The output type comes from the output's extension: .hdr (Radiance RGBE),
+.pfm, .tif/.tiff (16-bit float, or 32-bit with -f32) and .exr (the same,
+needs the OpenEXR module). Brackets are read with imageio if it's installed
+(needed for 16-bit RGB TIFFs) or else Pillow. The EXIF is read with Pillow.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+MissingExposureError: A bracket has no exposure time in its EXIF.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+parse_arguments: Reads mkhdri-style merge flags.
+read_curve: Reads the per-channel polynomials of a Picturenaut .crv file.
+curve_tables: Tabulates a camera curve for every pixel value.
+weight_tables: Tabulates the weight of every pixel value, per bracket.
+read_exposure: Gets a bracket's relative exposure from its EXIF.
+read_pixels: Reads a bracket as an array of RGB integers.
+open_rows: Opens a bracket to be read a block of rows at a time.
+correct_exposures: Measures the exposure ratios of neighbouring brackets.
+merge_images: Merges brackets into a radiance map.
+balance_scales: Gets the channel scales that make well-exposed pixels gray.
+open_writer: Opens an HDR file that is written a block of rows at a time.
+write_image: Writes a radiance map in the format of its extension.
+rows_per_tile: Gets the number of rows that each tile of a merge may have.
+merge_files: Merges bracket files into an HDR file.
+main: Runs a merge from the command-line.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+numpymerge.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import sys
+import math
+import struct
+import logging
+import tempfile
+
+# IMPORT THIRD-PARTY LIBRARIES
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import imageio
+except ImportError:
+    imageio = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import OpenEXR
+    import Imath
+except ImportError:
+    OpenEXR = None
+
+
+LOGGER = logging.getLogger(__name__)
+MISSING_EXPOSURE_CODE = 130
+OUTPUT_TYPES = (".hdr", ".pfm", ".tif", ".tiff", ".exr")
+MIN_RATIO_SAMPLES = 100  # fewer well-exposed pixels and -ec keeps the EXIF
+MAX_SAMPLES = 4000000  # the pixels per bracket that -ec and -cb look at
+MIN_SAMPLES = 65536  # ...even if that many don't fit in the tile budget
+
+# the float32 (columns x 3) rows that a tile needs besides its brackets'
+# pixels: merge_images' sums and temporaries, and the writers' conversions
+FLOAT_ROW_BUFFERS = 8
+
+# EXIF tags
+EXIF_IFD = 0x8769
+EXPOSURE_TIME = 0x829A
+F_NUMBER = 0x829D
+ISO_SPEED = 0x8827
+
+_TIFF_STRIP_BYTES = 64 * 1024
+
+
+class MissingExposureError(ValueError):
+
+    """A bracket has no exposure time in its EXIF."""
+
+    pass
+# end MissingExposureError
+
+
+def parse_arguments(argv):
+    """Reads mkhdri-style merge flags.
+
+    Args:
+        argv (list of strs): The flags, "-out:<file>" and the bracket files
+
+    Raises:
+        ValueError: If a flag is not supported or no output or inputs were
+                    given
+
+    Returns:
+        tuple of dict, str and list of strs: The keyword arguments of
+                                             merge_files, the output and the
+                                             brackets
+
+    """
+    options = {"fno": None, "curve": None, "ec": False, "cb": False,
+               "f32": False, "tileBytes": None}
+    output = None
+    inputs = []
+    for arg in argv:
+        if not arg.startswith("-"):
+            inputs.append(arg)
+            continue
+        flag, _, value = arg.partition(":")
+        if flag == "-out":
+            output = value
+        elif flag == "-fno":
+            options["fno"] = float(value)
+        elif flag == "-ci":
+            options["curve"] = value
+        elif flag == "-tile":
+            options["tileBytes"] = int(value)
+        elif flag in ("-ec", "-cb", "-f32"):
+            options[flag[1:]] = True
+        elif flag not in ("-defcurve", "-da"):
+            raise ValueError("Flag: {flag} is not supported by the NumPy "
+                             "merge. Use mkhdri".format(flag=flag))
+
+    if not output or not inputs:
+        raise ValueError("A merge needs -out:<file> and at least one bracket")
+    return (options, output, inputs)
+# end parse_arguments
+
+
+def read_curve(path):
+    """Reads the per-channel polynomials of a Picturenaut .crv file.
+
+    The file has one "polynomial <channel> = c0, c1, ..., cn;" block per
+    channel, which maps a pixel value (0-1) to its relative radiance.
+
+    Args:
+        path (str): The curve file
+
+    Raises:
+        ValueError: If a channel is missing
+
+    Returns:
+        list of lists of floats: The coefficients of red, green and blue,
+                                 lowest power first
+
+    """
+    with open(path, "rt") as f:
+        text = f.read()
+
+    curves = {}
+    for block in text.split(";"):
+        if "=" not in block:
+            continue
+        name, values = block.split("=", 1)
+        curves[name.split()[-1].lower()] = [
+            float(x) for x in values.split(",") if x.strip()]
+
+    missing = [x for x in ("red", "green", "blue") if x not in curves]
+    if missing:
+        raise ValueError("Curve: {path} has no {names} polynomial".format(
+            path=path, names=", ".join(missing)))
+    return [curves["red"], curves["green"], curves["blue"]]
+# end read_curve
+
+
+def curve_tables(curve, maxValue):
+    """Tabulates a camera curve for every pixel value.
+
+    Args:
+        curve (list of lists of floats): The coefficients from read_curve.
+                                         None uses the sRGB curve
+        maxValue (int): The largest pixel value (255 or 65535)
+
+    Returns:
+        <numpy.ndarray>: The linear value of each channel and pixel value,
+                         shaped (3, maxValue + 1)
+
+    """
+    x = np.linspace(0.0, 1.0, maxValue + 1)
+    if curve is None:
+        table = np.where(x <= 0.04045, x / 12.92, ((x + 0.055) / 1.055) ** 2.4)
+        return np.tile(table.astype(np.float32), (3, 1))
+    tables = [np.polyval(coefficients[::-1], x) for coefficients in curve]
+    return np.clip(np.array(tables, dtype=np.float32), 0.0, None)
+# end curve_tables
+
+
+def _hat(maxValue):
+    """Gets the hat weight of every pixel value: 0 at both ends, 1 in the
+    middle."""
+    x = np.linspace(0.0, 1.0, maxValue + 1, dtype=np.float32)
+    return 1.0 - np.abs(2.0 * x - 1.0)
+# end _hat
+
+
+def weight_tables(maxValue, count):
+    """Tabulates the weight of every pixel value, per bracket.
+
+    Args:
+        maxValue (int): The largest pixel value (255 or 65535)
+        count (int): The number of brackets
+
+    Returns:
+        list of <numpy.ndarray>: The weights of each bracket, from the
+                                 darkest exposure to the brightest. The
+                                 darkest bracket keeps full weight in its
+                                 highlights, the brightest in its shadows
+
+    """
+    hat = _hat(maxValue)
+    if count == 1:
+        return [np.ones_like(hat)]
+    middle = len(hat) // 2
+    darkest = hat.copy()
+    darkest[middle:] = 1.0
+    brightest = hat.copy()
+    brightest[:middle + 1] = 1.0
+    return [darkest] + [hat] * (count - 2) + [brightest]
+# end weight_tables
+
+
+def _rational(value):
+    """Converts an EXIF rational (a number or a tuple) to a float or None."""
+    if isinstance(value, tuple):
+        if len(value) == 2 and value[1]:
+            return value[0] / float(value[1])
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+# end _rational
+
+
+def _exif_tags(path):
+    """Gets the EXIF tags of an image, from both its main and EXIF IFDs."""
+    if Image is None:
+        raise ImportError("Reading exposures needs Pillow. Install it with: "
+                          "pip install pillow")
+    image = Image.open(path)
+    try:
+        if hasattr(image, "getexif"):
+            exif = image.getexif()
+            tags = dict(exif)
+            try:
+                tags.update(exif.get_ifd(EXIF_IFD))
+            except (AttributeError, KeyError):
+                pass
+            return tags
+        return dict(getattr(image, "_getexif", lambda: None)() or {})
+    finally:
+        image.close()
+# end _exif_tags
+
+
+def read_exposure(path, fno=None):
+    """Gets a bracket's relative exposure from its EXIF.
+
+    Args:
+        path (str): The bracket
+        fno (float): Overrides the F-number of the EXIF
+
+    Raises:
+        MissingExposureError: If the EXIF has no exposure time
+
+    Returns:
+        float: exposure time x ISO / 100 / F-number squared
+
+    """
+    tags = _exif_tags(path)
+    seconds = _rational(tags.get(EXPOSURE_TIME))
+    if not seconds or seconds <= 0:
+        raise MissingExposureError("Bracket: {path} has no exposure time in "
+                                   "its EXIF".format(path=path))
+    fNumber = fno or _rational(tags.get(F_NUMBER)) or 1.0
+    iso = tags.get(ISO_SPEED) or 100
+    if isinstance(iso, (tuple, list)):
+        iso = iso[0]
+    return seconds * float(iso) / 100.0 / fNumber ** 2
+# end read_exposure
+
+
+def read_pixels(path):
+    """Reads a bracket as an array of RGB integers.
+
+    Args:
+        path (str): The bracket
+
+    Raises:
+        ValueError: If the bracket isn't 8 or 16-bit
+
+    Returns:
+        <numpy.ndarray>: The pixels, shaped (rows, columns, 3), as uint8 or
+                         uint16
+
+    """
+    if imageio is not None:
+        pixels = np.asarray(getattr(imageio, "v2", imageio).imread(path))
+    elif Image is not None:
+        image = Image.open(path)
+        try:
+            if image.mode not in ("RGB", "RGBA", "L", "I;16", "I;16B",
+                                  "I;16L"):
+                image = image.convert("RGB")
+            pixels = np.asarray(image)
+        finally:
+            image.close()
+    else:
+        raise ImportError("Reading brackets needs imageio or Pillow. Install "
+                          "one with: pip install pillow")
+
+    if pixels.dtype.kind != "u" or pixels.dtype.itemsize > 2:
+        raise ValueError("Bracket: {path} has {kind} pixels. Only 8 and "
+                         "16-bit brackets can be merged".format(
+                             path=path, kind=pixels.dtype))
+    if pixels.ndim == 2:
+        pixels = np.stack([pixels] * 3, axis=-1)
+    # native byte order, so that the pixels can index the curve tables
+    return np.ascontiguousarray(pixels[..., :3], dtype="u{0}".format(
+        pixels.dtype.itemsize))
+# end read_pixels
+
+
+class _ArrayRows(object):
+
+    """The rows of a bracket that was decoded into memory."""
+
+    def __init__(self, pixels):
+        """Keeps the pixels, from read_pixels."""
+        super(_ArrayRows, self).__init__()
+        self.pixels = pixels
+        self.height, self.width = pixels.shape[:2]
+        self.dtype = pixels.dtype
+    # end __init__
+
+    def rows(self, start, stop, step=1):
+        """Gets rows start to stop (excluded), every step-th row."""
+        return self.pixels[start:stop:step]
+    # end rows
+
+    def close(self):
+        """Frees the pixels."""
+        self.pixels = None
+    # end close
+# end _ArrayRows
+
+
+class _FileRows(object):
+
+    """The rows of a bracket, read from a file that has its pixels in one
+    block. Only the rows that are asked for are read (a memory map would
+    keep every page it touched in the process' memory)."""
+
+    def __init__(self, path, offset, shape, dtype, temporary=False):
+        """Opens the file.
+
+        Args:
+            path (str): The file that has the pixels in one block
+            offset (int): The position of the first pixel
+            shape (tuple of ints): The rows, columns and channels (1, 3 or
+                                   4) of the pixels
+            dtype (<numpy.dtype>): The pixel type, with its byte order
+            temporary (bool): Delete the file on close
+
+        """
+        super(_FileRows, self).__init__()
+        self.path = path
+        self.temporary = temporary
+        self.height, self.width, self._channels = shape
+        self.dtype = np.dtype("u{0}".format(dtype.itemsize))
+        self._fileType = dtype
+        self._offset = offset
+        self._rowItems = self.width * self._channels
+        self._file = open(path, "rb")
+    # end __init__
+
+    def _read(self, start, count):
+        """Reads count rows from row start, as (rows, columns, channels)."""
+        self._file.seek(self._offset +
+                        start * self._rowItems * self._fileType.itemsize)
+        pixels = np.fromfile(self._file, dtype=self._fileType,
+                             count=count * self._rowItems)
+        return pixels.reshape(count, self.width, self._channels)
+    # end _read
+
+    def rows(self, start, stop, step=1):
+        """Gets rows start to stop (excluded), every step-th row, as RGB."""
+        if step == 1:
+            pixels = self._read(start, max(0, stop - start))
+        else:
+            indexes = range(start, stop, step)
+            pixels = np.empty((len(indexes), self.width, self._channels),
+                              dtype=self._fileType)
+            for index, row in enumerate(indexes):
+                pixels[index] = self._read(row, 1)[0]
+        if self._channels == 1:
+            pixels = np.repeat(pixels, 3, axis=-1)
+        return np.ascontiguousarray(pixels[..., :3], dtype=self.dtype)
+    # end rows
+
+    def close(self):
+        """Closes the file (and deletes a temporary file)."""
+        self._file.close()
+        if self.temporary:
+            try:
+                os.remove(self.path)
+            except OSError:
+                LOGGER.warning("Could not delete: %s", self.path)
+    # end close
+# end _FileRows
+
+
+def _tiff_pixel_layout(path):
+    """Finds the pixels of an uncompressed TIFF that are stored in one block.
+
+    Returns:
+        tuple or NoneType: The offset, shape and dtype of the pixels (see
+                           _FileRows), or None if the file isn't a TIFF
+                           whose rows can be read directly
+
+    """
+    if os.path.splitext(path)[-1].lower() not in (".tif", ".tiff"):
+        return None
+    with open(path, "rb") as f:
+        header = f.read(8)
+        if len(header) < 8 or header[:2] not in (b"II", b"MM"):
+            return None
+        order = "<" if header[:2] == b"II" else ">"
+        magic, position = struct.unpack(order + "HI", header[2:])
+        if magic != 42:  # BigTIFF or not a TIFF
+            return None
+        f.seek(position)
+        tags = {}
+        for _ in range(struct.unpack(order + "H", f.read(2))[0]):
+            tag, kind, count, value = struct.unpack(order + "HHI4s",
+                                                    f.read(12))
+            if kind not in (3, 4):
+                continue
+            kind = "H" if kind == 3 else "I"
+            size = struct.calcsize(kind) * count
+            if size > 4:
+                position = f.tell()
+                f.seek(struct.unpack(order + "I", value)[0])
+                value = f.read(size)
+                f.seek(position)
+            tags[tag] = struct.unpack(
+                "{0}{1}{2}".format(order, count, kind), value[:size])
+
+    width = tags.get(256, (0,))[0]
+    height = tags.get(257, (0,))[0]
+    channels = tags.get(277, (1,))[0]
+    bits = set(tags.get(258, (1,)))
+    if not width or not height or 273 not in tags or 322 in tags or \
+            channels not in (1, 3, 4) or bits not in (set([8]), set([16])) or \
+            tags.get(259, (1,))[0] != 1 or tags.get(284, (1,))[0] != 1 or \
+            tags.get(262, (2,))[0] not in (1, 2) or \
+            set(tags.get(339, (1,))) != set([1]):
+        return None
+
+    itemSize = bits.pop() // 8
+    rowBytes = width * channels * itemSize
+    rowsPerStrip = min(tags.get(278, (height,))[0], height)
+    offsets = tags[273]
+    for index, offset in enumerate(offsets):
+        if offset != offsets[0] + index * rowsPerStrip * rowBytes:
+            return None
+    if offsets[0] + height * rowBytes > os.path.getsize(path):
+        return None
+    return (offsets[0], (height, width, channels),
+            np.dtype("{0}u{1}".format(order, itemSize)))
+# end _tiff_pixel_layout
+
+
+def open_rows(path, tiled=False):
+    """Opens a bracket to be read a block of rows at a time.
+
+    Args:
+        path (str): The bracket
+        tiled (bool): If False, the bracket is decoded into memory. If True,
+                      the rows of an uncompressed TIFF are read straight
+                      from the file and any other bracket is decoded once
+                      (one bracket at a time) into a temporary file that
+                      the rows are read from, so only the rows being merged
+                      are held in memory
+
+    Returns:
+        object: A reader, with the bracket's width, height and dtype, a
+                rows(start, stop, step=1) method that gets RGB pixels like
+                read_pixels, and a close method
+
+    """
+    if not tiled:
+        return _ArrayRows(read_pixels(path))
+    layout = _tiff_pixel_layout(path)
+    if layout is not None:
+        return _FileRows(path, *layout)
+
+    pixels = read_pixels(path)
+    handle, temporary = tempfile.mkstemp(prefix="hdrprocess_", suffix=".raw")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            pixels.tofile(f)
+    except Exception:
+        os.remove(temporary)
+        raise
+    return _FileRows(temporary, 0, pixels.shape, pixels.dtype,
+                     temporary=True)
+# end open_rows
+
+
+_CHANNELS = None if np is None else np.arange(3)
+
+
+def correct_exposures(brackets, exposures, tables, step=4):
+    """Measures the exposure ratios of neighbouring brackets.
+
+    Camera shutters and apertures are not exact, so the EXIF can be off by
+    a few percent. The ratio of two brackets is the median ratio of their
+    linear values, over the pixels that both exposed well. Every step-th
+    row and column is sampled.
+
+    Args:
+        brackets (list of <numpy.ndarray>): The pixels of each bracket, from
+                                            the darkest exposure to the
+                                            brightest
+        exposures (list of floats): The EXIF exposure of each bracket
+        tables (<numpy.ndarray>): The camera curve, from curve_tables
+        step (int): The sampling step, in pixels
+
+    Returns:
+        list of floats: The corrected exposures. Their geometric mean is the
+                        same as the EXIF's, so the HDR keeps its brightness
+
+    """
+    hat = _hat(tables.shape[1] - 1)
+    corrected = [1.0]
+    for index in range(1, len(brackets)):
+        dark = brackets[index - 1][::step, ::step]
+        bright = brackets[index][::step, ::step]
+        usable = (hat[dark] > 0.2) & (hat[bright] > 0.2)
+        ratios = tables[_CHANNELS, bright][usable] / \
+            np.maximum(tables[_CHANNELS, dark][usable], 1e-6)
+        if ratios.size < MIN_RATIO_SAMPLES:
+            LOGGER.info("Too few well-exposed pixels to correct bracket %s. "
+                        "The EXIF is used", index)
+            ratio = exposures[index] / exposures[index - 1]
+        else:
+            ratio = float(np.median(ratios))
+        corrected.append(corrected[-1] * ratio)
+
+    offset = np.exp(np.mean(np.log(exposures)) - np.mean(np.log(corrected)))
+    return [x * float(offset) for x in corrected]
+# end correct_exposures
+
+
+def merge_images(brackets, exposures, tables):
+    """Merges brackets into a radiance map.
+
+    Each channel of each pixel is the weighted mean of linear value /
+    exposure over the brackets (see weight_tables).
+
+    Args:
+        brackets (list of <numpy.ndarray>): The pixels of each bracket, from
+                                            the darkest exposure to the
+                                            brightest. They may be any same
+                                            region of the brackets
+        exposures (list of floats): The exposure of each bracket
+        tables (<numpy.ndarray>): The camera curve, from curve_tables
+
+    Returns:
+        <numpy.ndarray>: The radiance, as float32 with the brackets' shape
+
+    """
+    weights = weight_tables(tables.shape[1] - 1, len(brackets))
+    numerator = np.zeros(brackets[0].shape, dtype=np.float32)
+    denominator = np.zeros(brackets[0].shape, dtype=np.float32)
+    for pixels, exposure, weight in zip(brackets, exposures, weights):
+        pixelWeights = weight[pixels]
+        linear = tables[_CHANNELS, pixels]
+        linear *= pixelWeights
+        linear *= np.float32(1.0 / exposure)
+        numerator += linear
+        denominator += pixelWeights
+    numerator /= np.maximum(denominator, np.float32(1e-6))
+    return numerator
+# end merge_images
+
+
+def balance_scales(radiance, pixels, maxValue):
+    """Gets the channel scales that make well-exposed pixels gray.
+
+    Args:
+        radiance (<numpy.ndarray>): The merged radiance
+        pixels (<numpy.ndarray>): The bracket (usually the middle one) whose
+                                  well-exposed pixels are averaged
+        maxValue (int): The largest pixel value of the bracket
+
+    Returns:
+        <numpy.ndarray>: The scale of each channel. Their mean is 1, so the
+                         HDR keeps its brightness
+
+    """
+    usable = (_hat(maxValue)[pixels] > 0.2).all(axis=-1)
+    if not usable.any():
+        return np.ones(3, dtype=np.float32)
+    means = radiance[usable].mean(axis=0)
+    means = np.maximum(means, 1e-12)
+    scales = 1.0 / means
+    return (scales / scales.mean()).astype(np.float32)
+# end balance_scales
+
+
+def _rgbe(radiance):
+    """Converts a radiance map to Radiance's shared-exponent RGBE bytes."""
+    brightest = radiance.max(axis=-1)
+    mantissa, exponent = np.frexp(brightest)
+    valid = brightest > 1e-32
+    scale = np.zeros(brightest.shape, dtype=np.float32)
+    scale[valid] = mantissa[valid] * 256.0 / brightest[valid]
+    rgbe = np.empty(radiance.shape[:2] + (4,), dtype=np.uint8)
+    rgbe[..., :3] = np.clip(radiance * scale[..., None], 0, 255)
+    rgbe[..., 3] = np.where(valid, np.clip(exponent + 128, 0, 255), 0)
+    return rgbe
+# end _rgbe
+
+
+def _radiance_scanlines(radiance):
+    """Encodes rows of a radiance map as Radiance scanlines.
+
+    Widths of 8 to 32767 use the run-length scanline format (with literal
+    runs only), which readers can't confuse with flat pixels.
+
+    """
+    rgbe = _rgbe(radiance)
+    height, width = rgbe.shape[:2]
+    if not 8 <= width < 0x8000:
+        return rgbe.tobytes()
+
+    chunks = -(-width // 128)
+    lastCount = width - (chunks - 1) * 128
+    components = np.zeros((height, 4, chunks * 128), dtype=np.uint8)
+    components[..., :width] = rgbe.transpose(0, 2, 1)
+    blocks = np.empty((height, 4, chunks, 129), dtype=np.uint8)
+    blocks[..., 0] = 128
+    blocks[..., -1, 0] = lastCount
+    blocks[..., 1:] = components.reshape(height, 4, chunks, 128)
+
+    keep = np.ones((chunks, 129), dtype=bool)
+    keep[-1, 1 + lastCount:] = False
+    rows = blocks.reshape(height, -1)[:, np.tile(keep.ravel(), 4)]
+    header = np.array([2, 2, width >> 8, width & 0xFF], dtype=np.uint8)
+    return np.hstack([np.tile(header, (height, 1)), rows]).tobytes()
+# end _radiance_scanlines
+
+
+class _RadianceWriter(object):
+
+    """Writes a Radiance .hdr file, a block of rows at a time."""
+
+    def __init__(self, path, width, height, f32=False):
+        """Writes the header."""
+        super(_RadianceWriter, self).__init__()
+        self._file = open(path, "wb")
+        self._file.write("#?RADIANCE\nFORMAT=32-bit_rle_rgbe\n\n"
+                         "-Y {h} +X {w}\n".format(h=height,
+                                                  w=width).encode("ascii"))
+    # end __init__
+
+    def write_rows(self, radiance):
+        """Writes the next rows, top to bottom."""
+        self._file.write(_radiance_scanlines(radiance))
+    # end write_rows
+
+    def close(self):
+        """Closes the file."""
+        self._file.close()
+    # end close
+# end _RadianceWriter
+
+
+class _PfmWriter(object):
+
+    """Writes a little-endian color .pfm file (always 32-bit), a block of
+    rows at a time. PFM stores the bottom row first, so each block is
+    written at its place from the end of the file."""
+
+    def __init__(self, path, width, height, f32=False):
+        """Writes the header."""
+        super(_PfmWriter, self).__init__()
+        self._file = open(path, "wb")
+        self._file.write("PF\n{w} {h}\n-1.0\n".format(
+            w=width, h=height).encode("ascii"))
+        self._start = self._file.tell()
+        self._rowBytes = width * 3 * 4
+        self._height = height
+        self._row = 0
+    # end __init__
+
+    def write_rows(self, radiance):
+        """Writes the next rows, top to bottom."""
+        self._row += radiance.shape[0]
+        self._file.seek(self._start +
+                        (self._height - self._row) * self._rowBytes)
+        self._file.write(np.ascontiguousarray(radiance[::-1],
+                                              dtype="<f4").tobytes())
+    # end write_rows
+
+    def close(self):
+        """Closes the file."""
+        self._file.close()
+    # end close
+# end _PfmWriter
+
+
+def _tiff_layout(width, height, itemSize):
+    """Gets the header, strip offsets and tags of a float RGB TIFF.
+
+    The pixels start right after the 8-byte header and the IFD comes after
+    them.
+
+    """
+    rowBytes = width * 3 * itemSize
+    rowsPerStrip = max(1, _TIFF_STRIP_BYTES // rowBytes)
+    starts = range(0, height, rowsPerStrip)
+    offsets = [8 + y * rowBytes for y in starts]
+    counts = [(min(y + rowsPerStrip, height) - y) * rowBytes for y in starts]
+    bits = itemSize * 8
+    return [(256, 4, [width]), (257, 4, [height]), (258, 3, [bits] * 3),
+            (259, 3, [1]), (262, 3, [2]), (273, 4, offsets), (277, 3, [3]),
+            (278, 4, [rowsPerStrip]), (279, 4, counts), (284, 3, [1]),
+            (339, 3, [3] * 3)]
+# end _tiff_layout
+
+
+def _tiff_ifd(tags, start):
+    """Packs TIFF tags as the values that don't fit in an entry, followed by
+    the IFD. start is the file offset of the returned bytes."""
+    formats = {3: "H", 4: "I"}
+    extra = b""
+    entries = b""
+    for tag, kind, values in tags:
+        packed = struct.pack("<{0}{1}".format(len(values), formats[kind]),
+                             *values)
+        if len(packed) <= 4:
+            value = packed.ljust(4, b"\0")
+        else:
+            value = struct.pack("<I", start + len(extra))
+            extra += packed
+        entries += struct.pack("<HHI", tag, kind, len(values)) + value
+    return (extra, entries)
+# end _tiff_ifd
+
+
+class _TiffWriter(object):
+
+    """Writes an uncompressed float RGB TIFF (16-bit, or 32-bit if f32), a
+    block of rows at a time. The IFD is written after the pixels."""
+
+    def __init__(self, path, width, height, f32=False):
+        """Writes the header."""
+        super(_TiffWriter, self).__init__()
+        self._dtype = np.dtype("<f4" if f32 else "<f2")
+        self._tags = _tiff_layout(width, height, self._dtype.itemsize)
+        end = 8 + width * height * 3 * self._dtype.itemsize
+        self._padding = end % 2
+        self._extra, self._entries = _tiff_ifd(self._tags, end + self._padding)
+        self._file = open(path, "wb")
+        self._file.write(struct.pack("<2sHI", b"II", 42, end + self._padding +
+                                     len(self._extra)))
+    # end __init__
+
+    def write_rows(self, radiance):
+        """Writes the next rows, top to bottom."""
+        self._file.write(np.ascontiguousarray(radiance,
+                                              dtype=self._dtype).tobytes())
+    # end write_rows
+
+    def close(self):
+        """Writes the IFD and closes the file."""
+        try:
+            self._file.write(b"\0" * self._padding)
+            self._file.write(self._extra)
+            self._file.write(struct.pack("<H", len(self._tags)) +
+                             self._entries + struct.pack("<I", 0))
+        finally:
+            self._file.close()
+    # end close
+# end _TiffWriter
+
+
+class _ExrWriter(object):
+
+    """Writes an OpenEXR file (16-bit float, or 32-bit if f32), a block of
+    rows at a time."""
+
+    def __init__(self, path, width, height, f32=False):
+        """Opens the file."""
+        super(_ExrWriter, self).__init__()
+        if OpenEXR is None:
+            raise ImportError("Writing .exr files needs OpenEXR. Install it "
+                              "with: pip install OpenEXR")
+        kind = Imath.PixelType.FLOAT if f32 else Imath.PixelType.HALF
+        header = OpenEXR.Header(width, height)
+        header["channels"] = dict((name, Imath.Channel(Imath.PixelType(kind)))
+                                  for name in "RGB")
+        self._dtype = np.float32 if f32 else np.float16
+        self._file = OpenEXR.OutputFile(path, header)
+    # end __init__
+
+    def write_rows(self, radiance):
+        """Writes the next rows, top to bottom."""
+        self._file.writePixels(dict(
+            (name, np.ascontiguousarray(radiance[..., index],
+                                        dtype=self._dtype).tobytes())
+            for index, name in enumerate("RGB")), radiance.shape[0])
+    # end write_rows
+
+    def close(self):
+        """Closes the file."""
+        self._file.close()
+    # end close
+# end _ExrWriter
+
+
+_WRITERS = {".hdr": _RadianceWriter, ".pfm": _PfmWriter, ".tif": _TiffWriter,
+            ".tiff": _TiffWriter, ".exr": _ExrWriter}
+
+
+def open_writer(path, width, height, f32=False, extension=None):
+    """Opens an HDR file that is written a block of rows at a time.
+
+    Args:
+        path (str): The output. See OUTPUT_TYPES for its extensions
+        width (int): The HDR's width, in pixels
+        height (int): The HDR's height, in pixels
+        f32 (bool): Write 32-bit floats to .tif and .exr files instead of
+                    16-bit
+        extension (str): The output type, if path's extension isn't it
+
+    Raises:
+        ValueError: If the extension is not an output type
+
+    Returns:
+        object: A writer. Call its write_rows with each block of rows of the
+                radiance (top to bottom), then its close
+
+    """
+    extension = (extension or os.path.splitext(path)[-1]).lower()
+    if extension not in _WRITERS:
+        raise ValueError("Output: {path} is not one of: {types}".format(
+            path=path, types=", ".join(OUTPUT_TYPES)))
+    return _WRITERS[extension](path, width, height, f32=f32)
+# end open_writer
+
+
+def write_image(path, radiance, f32=False):
+    """Writes a radiance map in the format of its extension.
+
+    Args:
+        path (str): The output. See OUTPUT_TYPES for its extensions
+        radiance (<numpy.ndarray>): The radiance, shaped (rows, columns, 3)
+        f32 (bool): Write 32-bit floats to .tif and .exr files instead of
+                    16-bit
+
+    Raises:
+        ValueError: If the extension is not an output type
+
+    """
+    writer = open_writer(path, radiance.shape[1], radiance.shape[0], f32=f32)
+    try:
+        writer.write_rows(radiance)
+    finally:
+        writer.close()
+# end write_image
+
+
+def rows_per_tile(width, count, itemSize, tileBytes):
+    """Gets the number of rows that each tile of a merge may have.
+
+    Args:
+        width (int): The brackets' width, in pixels
+        count (int): The number of brackets
+        itemSize (int): The bytes per channel of the brackets (1 or 2)
+        tileBytes (int): The most memory that a tile may use
+
+    Returns:
+        int: The rows per tile. At least 1, even if one row is over budget
+
+    """
+    rowBytes = width * 3 * (count * itemSize + FLOAT_ROW_BUFFERS * 4)
+    return max(1, int(tileBytes // rowBytes))
+# end rows_per_tile
+
+
+def _sample(readers, rowsPerTile, step):
+    """Reads every step-th row and column of each bracket, a tile at a
+    time, for correct_exposures and balance_scales."""
+    height = readers[0].height
+    samples = [[] for _ in readers]
+    for start in range(0, height, rowsPerTile):
+        first = start + (-start) % step
+        stop = min(start + rowsPerTile, height)
+        if first >= stop:
+            continue
+        for reader, sample in zip(readers, samples):
+            sample.append(np.ascontiguousarray(
+                reader.rows(first, stop, step)[:, ::step]))
+    return [np.concatenate(x) for x in samples]
+# end _sample
+
+
+def merge_files(inputs, output, fno=None, curve=None, ec=False, cb=False,
+                f32=False, tileBytes=None):
+    """Merges bracket files into an HDR file.
+
+    The HDR is written to output + ".part" and renamed to output once it's
+    complete, so a merge that fails or is killed never leaves a truncated
+    HDR that looks finished.
+
+    Without tileBytes, every bracket is decoded into memory and merged at
+    once. With it, the HDR is merged and written in horizontal strips and
+    only the rows of the current strip are read from the brackets (see
+    open_rows), so the merge's memory is bounded by tileBytes instead of
+    growing with brackets x width x height. -ec and -cb look at a sample of
+    the pixels either way (every few rows and columns, at most MAX_SAMPLES
+    pixels and no more than fit in tileBytes, but at least MIN_SAMPLES),
+    which is read in a first pass over the strips.
+
+    Args:
+        inputs (list of strs): The brackets, in any order
+        output (str): The HDR to write
+        fno (float): Overrides the F-number of every bracket
+        curve (str): A Picturenaut .crv camera curve. None uses sRGB
+        ec (bool): Correct the EXIF exposures from the pixels
+        cb (bool): Balance the colors so well-exposed pixels are gray
+        f32 (bool): Write 32-bit floats to .tif and .exr files
+        tileBytes (int): The most memory that a strip may use. None merges
+                         the whole image at once
+
+    Raises:
+        MissingExposureError: If a bracket has no exposure in its EXIF
+        ValueError: If the brackets don't have the same size and bit depth
+
+    """
+    if np is None:
+        raise ImportError("The NumPy merge needs numpy. Install it with: "
+                          "pip install numpy")
+    exposures = [read_exposure(path, fno=fno) for path in inputs]
+    order = sorted(range(len(inputs)), key=lambda index: exposures[index])
+    exposures = [exposures[index] for index in order]
+
+    readers = []
+    try:
+        for index in order:
+            readers.append(open_rows(inputs[index],
+                                     tiled=tileBytes is not None))
+        if len(set((x.width, x.height, x.dtype) for x in readers)) > 1:
+            raise ValueError("Brackets: {files} don't all have the same size "
+                             "and bit depth".format(files=", ".join(inputs)))
+
+        width, height = readers[0].width, readers[0].height
+        maxValue = np.iinfo(readers[0].dtype).max
+        tables = curve_tables(read_curve(curve) if curve else None, maxValue)
+        rowsPerTile = height
+        if tileBytes is not None:
+            rowsPerTile = rows_per_tile(width, len(readers),
+                                        readers[0].dtype.itemsize, tileBytes)
+
+        scales = None
+        if (ec and len(readers) > 1) or cb:
+            samples = MAX_SAMPLES
+            if tileBytes is not None:  # the samples are merged like a tile
+                samples = max(MIN_SAMPLES, min(samples, rows_per_tile(
+                    1, len(readers), readers[0].dtype.itemsize, tileBytes)))
+            step = max(4, int(math.ceil(math.sqrt(
+                width * height / float(samples)))))
+            samples = _sample(readers, rowsPerTile, step)
+            if ec and len(readers) > 1:
+                exposures = correct_exposures(samples, exposures, tables,
+                                              step=1)
+            if cb:
+                scales = balance_scales(
+                    merge_images(samples, exposures, tables),
+                    samples[len(samples) // 2], maxValue)
+            samples = None
+
+        partial = output + ".part"
+        writer = open_writer(partial, width, height, f32=f32,
+                             extension=os.path.splitext(output)[-1])
+        try:
+            try:
+                for start in range(0, height, rowsPerTile):
+                    stop = min(start + rowsPerTile, height)
+                    radiance = merge_images(
+                        [x.rows(start, stop) for x in readers],
+                        exposures, tables)
+                    if scales is not None:
+                        radiance *= scales
+                    writer.write_rows(radiance)
+                    radiance = None
+            finally:
+                writer.close()
+        except BaseException:
+            if os.path.isfile(partial):
+                os.remove(partial)
+            raise
+        if os.name == "nt" and os.path.exists(output):
+            os.remove(output)  # Windows can't rename over a file
+        os.rename(partial, output)
+    finally:
+        for reader in readers:
+            reader.close()
+# end merge_files
+
+
+def main(argv=None):
+    """Runs a merge from the command-line.
+
+    Args:
+        argv (list of strs): mkhdri-style flags, -out:<file> and the brackets.
+                             Default is sys.argv[1:]
+
+    Returns:
+        int: 0 if the HDR was written, 2 for bad flags, 130 if a bracket has
+             no exposure and 1 for any other error
+
+    """
+    try:
+        options, output, inputs = parse_arguments(
+            sys.argv[1:] if argv is None else argv)
+    except ValueError as err:
+        sys.stderr.write("{0}\n".format(err))
+        return 2
+
+    try:
+        merge_files(inputs, output, **options)
+    except MissingExposureError as err:
+        sys.stderr.write("{0}\n".format(err))
+        return MISSING_EXPOSURE_CODE
+    except (ValueError, ImportError, IOError, OSError) as err:
+        sys.stderr.write("{0}\n".format(err))
+        return 1
+    print("Wrote: {0}".format(output))
+    return 0
+# end main
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Writes a batch's plan to a file instead of (or before) running it.
+
+Three formats are supported:
+
+    - "json": every job's command, flags, inputs, output, estimated cost and
+      the jobs it depends on. Good for scripts and for diffing two plans
+    - "make": a Makefile. Run it with "make -j N"
+    - "ninja": a build.ninja. Run it with "ninja -j N". Ninja reruns a
+      merge if a bracket is newer than its HDR or if its command changed,
+      so unchanged HDRs are skipped on the next run
+
+A job depends on another job if it reads that job's output (its inputs or
+its -ci: curve file). Merges are usually independent, so most jobs have no
+dependencies.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+plan_to_dict: Gets a plan as a JSON-serializable dictionary.
+format_plan: Formats a plan as JSON, a Makefile or a build.ninja.
+guess_format: Gets the format of a plan file from its name.
+write_plan: Writes a plan to a file.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+planexport.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import io
+import json
+import subprocess
+
+try:
+    from shlex import quote as _shell_quote
+except ImportError:
+    from pipes import quote as _shell_quote
+
+
+FORMATS = ("json", "make", "ninja")
+
+
+def _command_line(argv):
+    """Joins an argv list into one command for this platform's shell."""
+    if os.name == "nt":
+        return subprocess.list2cmdline(argv)
+    return " ".join(_shell_quote(x) for x in argv)
+# end _command_line
+
+
+def _dependencies(jobs):
+    """Gets the indexes of the jobs that each job reads the output of."""
+    producers = dict((job.output, index) for index, job in enumerate(jobs))
+    return [sorted(set(producers[x] for x in job.readFiles
+                       if x in producers)) for job in jobs]
+# end _dependencies
+
+
+def plan_to_dict(plan):
+    """Gets a plan as a JSON-serializable dictionary.
+
+    Args:
+        plan (<planner.Plan>): The plan to export
+
+    Returns:
+        dict: The plan's settings and its jobs, in the order they would start
+
+    """
+    jobs = []
+    for index, (job, cost, dependsOn) in enumerate(
+            zip(plan.jobs, plan.costs, _dependencies(plan.jobs))):
+        data = job.to_dict()
+        data.update({"id": index,
+                     "argv": job.argv,
+                     "readFiles": job.readFiles,
+                     "estimatedSeconds": cost,
+                     "dependsOn": dependsOn})
+        jobs.append(data)
+    return {"workers": plan.workers,
+            "strategy": plan.strategy,
+            "predictedSeconds": plan.makespan,
+            "jobs": jobs}
+# end plan_to_dict
+
+
+def _make_path(path):
+    """Escapes a path for a Makefile target or prerequisite."""
+    return path.replace("$", "$$").replace(" ", "\\ ").replace(":", "\\:")
+# end _make_path
+
+
+def _format_make(plan):
+    """Formats a plan as a Makefile."""
+    lines = ["# Generated by hdrprocess. Run with: make -j {0}".format(
+        plan.workers), "", ".PHONY: all", ""]
+    lines.append("all: " + " ".join(_make_path(job.output)
+                                    for job in plan.jobs))
+    for job in plan.jobs:
+        lines.append("")
+        lines.append("{output}: {inputs}".format(
+            output=_make_path(job.output),
+            inputs=" ".join(_make_path(x) for x in job.readFiles)))
+        lines.append("\t" + _command_line(job.argv).replace("$", "$$"))
+    return "\n".join(lines) + "\n"
+# end _format_make
+
+
+def _ninja_path(path):
+    """Escapes a path for a build.ninja build line."""
+    return path.replace("$", "$$").replace(" ", "$ ").replace(":", "$:")
+# end _ninja_path
+
+
+def _format_ninja(plan):
+    """Formats a plan as a build.ninja."""
+    lines = ["# Generated by hdrprocess. Run with: ninja -j {0}".format(
+        plan.workers), "",
+        "rule merge",
+        "  command = $cmd",
+        "  description = HDR $out", ""]
+    for job in plan.jobs:
+        curveFiles = [x for x in job.readFiles if x not in job.inputs]
+        line = "build {output}: merge {inputs}".format(
+            output=_ninja_path(job.output),
+            inputs=" ".join(_ninja_path(x) for x in job.inputs))
+        if curveFiles:
+            line += " | " + " ".join(_ninja_path(x) for x in curveFiles)
+        lines.append(line)
+        lines.append("  cmd = " + _command_line(job.argv).replace("$", "$$"))
+    lines.append("")
+    lines.append("default " + " ".join(_ninja_path(job.output)
+                                       for job in plan.jobs))
+    return "\n".join(lines) + "\n"
+# end _format_ninja
+
+
+def format_plan(plan, fmt="json"):
+    """Formats a plan as JSON, a Makefile or a build.ninja.
+
+    Args:
+        plan (<planner.Plan>): The plan to export
+        fmt (str): The format. Options: "json", "make", "ninja"
+
+    Raises:
+        ValueError: If fmt is not a known format
+
+    Returns:
+        str: The formatted plan
+
+    """
+    if fmt == "json":
+        return json.dumps(plan_to_dict(plan), indent=4, sort_keys=True) + "\n"
+    if fmt == "make":
+        return _format_make(plan)
+    if fmt == "ninja":
+        return _format_ninja(plan)
+    raise ValueError('Plan format: {fmt!r} is not valid. Options were, '
+                     '{opts}'.format(fmt=fmt, opts=list(FORMATS)))
+# end format_plan
+
+
+def guess_format(path):
+    """Gets the format of a plan file from its name.
+
+    Args:
+        path (str): The plan file, like "plan.json", "Makefile" or
+                    "build.ninja"
+
+    Returns:
+        str: "make" for Makefiles and *.mk, "ninja" for *.ninja and "json"
+             for anything else
+
+    """
+    name = os.path.basename(path).lower()
+    if name in ("makefile", "gnumakefile") or name.endswith(".mk"):
+        return "make"
+    if name.endswith(".ninja"):
+        return "ninja"
+    return "json"
+# end guess_format
+
+
+def write_plan(plan, path, fmt=None):
+    """Writes a plan to a file.
+
+    Args:
+        plan (<planner.Plan>): The plan to export
+        path (str): The file to write
+        fmt (str): The format. Guessed from the file name if None
+
+    """
+    text = format_plan(plan, fmt or guess_format(path))
+    with io.open(path, "w", encoding="utf-8") as f:
+        f.write(u"{}".format(text))
+# end write_plan
+
+
+if __name__ == "__main__":
+    print(__doc__)
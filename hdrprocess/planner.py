@@ -0,0 +1,296 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Decides the order that merge jobs run in and predicts how long a batch takes.
+
+With N workers, the batch ends when the last worker goes idle. If a few big
+(ex: 9-bracket) jobs are left for the end, most workers sit idle while they
+finish. Starting the most expensive jobs first (longest-processing-time-first,
+"lpt") keeps that tail short.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+CostEstimator: Estimates how long a merge job takes from its inputs.
+Plan: An ordered list of jobs, with their costs and the predicted makespan.
+EtaEstimator: Predicts the time left in a running plan.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+format_duration: Formats a number of seconds as H:MM:SS.
+make_plan: Orders jobs with a strategy and predicts the batch's makespan.
+predict_makespan: Simulates N workers taking jobs in order.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+planner.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import time
+import heapq
+import threading
+import collections
+
+
+class CostEstimator(object):
+
+    """Estimates how long a merge job takes from its inputs.
+
+    The estimate is a rough number of seconds: the time to decode the input
+    bytes plus a fixed amount of work for each bracket.
+
+    """
+
+    bytesPerSecond = 25 * 1024 ** 2
+    secondsPerBracket = 1.0
+
+    @staticmethod
+    def input_bytes(job):
+        """Gets the summed file size of a job's inputs.
+
+        Args:
+            job (<engine.MergeJob>): The job to measure
+
+        Returns:
+            int: The number of bytes (missing files count as 0)
+
+        """
+        total = 0
+        for path in job.inputs:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+    # end input_bytes
+
+    def estimate(self, job):
+        """Estimates the wall-clock time of a job.
+
+        Args:
+            job (<engine.MergeJob>): The job to estimate
+
+        Returns:
+            float: The estimated number of seconds
+
+        """
+        return self.input_bytes(job) / float(self.bytesPerSecond) + \
+            len(job.inputs) * self.secondsPerBracket
+    # end estimate
+# end CostEstimator
+
+
+class Plan(object):
+
+    """An ordered list of jobs, with their costs and the predicted makespan."""
+
+    def __init__(self, jobs, costs, workers, strategy):
+        """Stores the plan and predicts its makespan.
+
+        Args:
+            jobs (list): The jobs, in the order that they will be started
+            costs (list of floats): The estimated seconds of each job
+            workers (int): The number of jobs that run at once
+            strategy (str): The name of the ordering that was used
+
+        """
+        super(Plan, self).__init__()
+        self.jobs = jobs
+        self.costs = costs
+        self.workers = workers
+        self.strategy = strategy
+        self.makespan = predict_makespan(costs, workers)
+    # end __init__
+
+    @property
+    def totalCost(self):
+        """float: The summed cost of every job, in worker-seconds."""
+        return sum(self.costs)
+    # end totalCost
+
+    def summary(self):
+        """str: A one-line description of the plan for the GUI/CLI."""
+        return '{count} merges on {workers} workers ({strategy} order). '\
+               'Predicted time: {time}'.format(count=len(self.jobs),
+                                               workers=self.workers,
+                                               strategy=self.strategy,
+                                               time=format_duration(self.makespan))
+    # end summary
+# end Plan
+
+
+class EtaEstimator(object):
+
+    """Predicts the time left in a running plan.
+
+    Running jobs count with their estimated cost minus the time that they
+    already ran, pending jobs count with their full cost, and the result is
+    simulated over the plan's workers like predict_makespan.
+
+    """
+
+    def __init__(self, plan):
+        """Reads the costs of the plan's jobs.
+
+        Args:
+            plan (<Plan>): The plan being run
+
+        """
+        super(EtaEstimator, self).__init__()
+        self.workers = plan.workers
+        self._costs = dict((id(job), cost)
+                           for job, cost in zip(plan.jobs, plan.costs))
+        self._order = dict((id(job), i) for i, job in enumerate(plan.jobs))
+        self._pending = set(self._costs)
+        self._startTimes = {}
+        self._lock = threading.Lock()  # jobs may be reported from any thread
+    # end __init__
+
+    def job_started(self, job):
+        """Marks a job as running."""
+        with self._lock:
+            self._pending.discard(id(job))
+            self._startTimes[id(job)] = time.time()
+    # end job_started
+
+    def job_finished(self, job):
+        """Marks a job as done."""
+        with self._lock:
+            self._pending.discard(id(job))
+            self._startTimes.pop(id(job), None)
+    # end job_finished
+
+    def remaining(self):
+        """Predicts the number of seconds until the plan is finished.
+
+        Returns:
+            float: The predicted seconds left
+
+        """
+        now = time.time()
+        with self._lock:
+            costs = [max(0.0, self._costs[key] - (now - startTime))
+                     for key, startTime in self._startTimes.items()]
+            costs.extend(self._costs[key]
+                         for key in sorted(self._pending, key=self._order.get))
+        return predict_makespan(costs, self.workers)
+    # end remaining
+# end EtaEstimator
+
+
+def format_duration(seconds):
+    """Formats a number of seconds as H:MM:SS.
+
+    Args:
+        seconds (float): The duration
+
+    Returns:
+        str: The formatted duration
+
+    """
+    seconds = int(round(seconds))
+    return '{h}:{m:02d}:{s:02d}'.format(h=seconds // 3600,
+                                        m=seconds % 3600 // 60,
+                                        s=seconds % 60)
+# end format_duration
+
+
+def predict_makespan(costs, workers):
+    """Simulates N workers taking jobs in order.
+
+    Each job goes to the worker that frees up first, which is what the
+    scheduler does.
+
+    Args:
+        costs (list of floats): The cost of each job, in start order
+        workers (int): The number of jobs that run at once
+
+    Returns:
+        float: The time at which the last job finishes
+
+    """
+    finishTimes = [0.0] * max(1, int(workers))
+    for cost in costs:
+        heapq.heapreplace(finishTimes, finishTimes[0] + cost)
+    return max(finishTimes)
+# end predict_makespan
+
+
+def _order_fifo(jobs, costs):
+    """Keeps the jobs in the order they were given."""
+    return list(range(len(jobs)))
+# end _order_fifo
+
+
+def _order_lpt(jobs, costs):
+    """Orders the jobs by cost, most expensive first."""
+    return sorted(range(len(jobs)), key=lambda i: costs[i], reverse=True)
+# end _order_lpt
+
+
+STRATEGIES = {"fifo": _order_fifo, "lpt": _order_lpt}
+
+
+def _interleave(order, keys):
+    """Reorders job indices round-robin across their groups.
+
+    Args:
+        order (list of ints): The job indices, in their planned order
+        keys (list): The group of every job, by index
+
+    Returns:
+        list of ints: One job from each group in turn. Every group keeps its
+                      own order
+
+    """
+    groups = collections.OrderedDict()
+    for i in order:
+        groups.setdefault(keys[i], collections.deque()).append(i)
+
+    interleaved = []
+    while groups:
+        for key in list(groups):
+            interleaved.append(groups[key].popleft())
+            if not groups[key]:
+                del groups[key]
+    return interleaved
+# end _interleave
+
+
+def make_plan(jobs, workers, strategy="lpt", estimator=None, groupBy=None):
+    """Orders jobs with a strategy and predicts the batch's makespan.
+
+    Args:
+        jobs (list of <engine.MergeJob>): The jobs to plan
+        workers (int): The number of jobs that run at once
+        strategy (str): The ordering to use. Options: "lpt", "fifo"
+        estimator (<CostEstimator>): Estimates the cost of each job. A
+                                     default one is made if None
+        groupBy (callable): If given, it is called with each job and the
+                            jobs of different groups (ex: storage devices)
+                            are interleaved
+
+    Returns:
+        <Plan>: The ordered jobs
+
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError('Strategy: {s!r} is not valid. Options were, '
+                         '{opts}'.format(s=strategy, opts=sorted(STRATEGIES)))
+
+    estimator = estimator or CostEstimator()
+    costs = [estimator.estimate(job) for job in jobs]
+    order = STRATEGIES[strategy](jobs, costs)
+    if groupBy is not None:
+        order = _interleave(order, [groupBy(job) for job in jobs])
+    return Plan([jobs[i] for i in order], [costs[i] for i in order],
+                workers, strategy)
+# end make_plan
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,168 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Pulls the brackets of the next few merges into the OS page cache, so that
+mkhdri finds them in memory instead of waiting on the disk or network.
+
+A background thread walks the next K unstarted jobs. Where Python has
+os.posix_fadvise (Python 3.3+ on POSIX), each bracket gets a WILLNEED hint,
+which makes the kernel read it asynchronously. Elsewhere the bracket is read
+once from start to end and the data is thrown away.
+
+Whether it helped shows in the I/O counters of each merge (see
+report.job_stats): "cacheHitRatio" is the share of a merge's reads that
+didn't have to go to storage. ReadAhead.job_stats adds whether each job was
+prefetched before its start, so K can be tuned. (WILLNEED only queues the
+reads, so when a prefetch "finishes" says nothing about when the data is in
+memory; the hit ratio is the measure to trust.)
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+ReadAhead: A scheduler observer that prefetches upcoming brackets.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+readahead.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import logging
+import threading
+
+# IMPORT LOCAL LIBRARIES
+import scheduler
+
+
+LOGGER = logging.getLogger(__name__)
+READ_CHUNK_SIZE = 1024 ** 2
+
+
+def _prefetch_file(path):
+    """Asks the OS to cache a file, or reads it through if it can't."""
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+        return
+
+    with open(path, "rb") as f:
+        while f.read(READ_CHUNK_SIZE):
+            pass
+# end _prefetch_file
+
+
+class ReadAhead(object):
+
+    """A scheduler observer that prefetches upcoming brackets."""
+
+    def __init__(self, lookahead=4):
+        """Sets the number of jobs to prefetch. Nothing runs until start.
+
+        Args:
+            lookahead (int): The number of unstarted jobs to prefetch (K)
+
+        """
+        super(ReadAhead, self).__init__()
+        self.lookahead = lookahead
+        self._condition = threading.Condition()
+        self._jobs = []
+        self._cursor = 0
+        self._started = set()  # id(job)
+        self._prefetched = set()  # id(job)
+        self._stopped = False
+        self._thread = None
+    # end __init__
+
+    def start(self, jobs):
+        """Starts prefetching in the background.
+
+        Args:
+            jobs (list of <engine.MergeJob>): The jobs, in the order that the
+                                              scheduler will start them
+
+        """
+        self._jobs = list(jobs)
+        self._thread = threading.Thread(target=self._prefetch_loop)
+        self._thread.daemon = True
+        self._thread.start()
+    # end start
+
+    def close(self):
+        """Stops the prefetch thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+    # end close
+
+    def _next_job(self):
+        """Gets the first upcoming job that isn't prefetched, or None.
+
+        Must be called with self._condition held.
+
+        """
+        job, self._cursor = scheduler.next_upcoming(
+            self._jobs, self._cursor, self._started, self._prefetched,
+            self.lookahead)
+        return job
+    # end _next_job
+
+    def _prefetch_loop(self):
+        """Prefetches upcoming jobs until self.close is called."""
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None and not self._stopped:
+                    self._condition.wait()
+                    job = self._next_job()
+                if self._stopped:
+                    return
+
+            for path in job.inputs:
+                try:
+                    _prefetch_file(path)
+                except (IOError, OSError) as err:
+                    LOGGER.debug("Could not prefetch: %s. %s", path, err)
+            with self._condition:
+                if id(job) not in self._started:  # else it was too late
+                    self._prefetched.add(id(job))
+    # end _prefetch_loop
+
+    def job_started(self, job):
+        """Moves the prefetch window past the job."""
+        with self._condition:
+            self._started.add(id(job))
+            self._condition.notify_all()
+    # end job_started
+
+    def job_finished(self, result):
+        """Nothing to do. Observers must have this method."""
+        pass
+    # end job_finished
+
+    def job_stats(self, job):
+        """Gets the prefetch stats of a job, for report.BatchReport.
+
+        Args:
+            job (<engine.MergeJob>): A job of the batch
+
+        Returns:
+            dict: "prefetched", True if the job's brackets were prefetched
+                  before it started
+
+        """
+        with self._condition:
+            return {"prefetched": id(job) in self._prefetched}
+    # end job_stats
+# end ReadAhead
+
+
+if __name__ == "__main__":
+    print(__doc__)
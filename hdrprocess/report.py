@@ -0,0 +1,299 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Summarizes where the time of a batch went, so that --threads can be tuned
+from numbers instead of guesswork.
+
+Every finished job already carries its wall time and the rusage of its
+process (user/sys CPU and peak RSS, from os.wait4). On Linux the scheduler
+also reads /proc/<pid>/io just before the process is reaped. Where those I/O
+counters aren't available, the input and output file sizes are used instead.
+
+The share of a merge's reads that the page cache served (cacheHitRatio)
+is logical reads minus storage reads, over logical reads.
+
+The report is written as JSON (for scripts) and as plain text (for people).
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+BatchReport: The performance summary of a finished batch.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+job_stats: Gets the measured resource usage of a single finished job.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+report.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import io
+import json
+import errno
+import multiprocessing
+
+# IMPORT LOCAL LIBRARIES
+import sysinfo
+import planner
+
+
+REPORT_NAME = "hdrprocess_report"
+
+
+def _file_size(path):
+    """Gets the size of a file, or 0 if it doesn't exist."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+# end _file_size
+
+
+def _cache_hit_ratio(readBytes, storageReadBytes):
+    """Gets the share of reads that didn't go to storage, or None."""
+    if not readBytes or storageReadBytes is None:
+        return None
+    return 1.0 - min(storageReadBytes, readBytes) / float(readBytes)
+# end _cache_hit_ratio
+
+
+def _sum_or_none(values):
+    """Sums the values that aren't None, or gets None if they all are."""
+    values = [x for x in values if x is not None]
+    return sum(values) if values else None
+# end _sum_or_none
+
+
+def job_stats(result):
+    """Gets the measured resource usage of a single finished job.
+
+    A retried job's times, I/O and peak memory cover all of its attempts, not
+    only the last one. "attemptWallTimes" lists the time of each attempt.
+
+    Args:
+        result (<scheduler.JobResult>): The finished job
+
+    Returns:
+        dict: The job's output, status, bracket count, wallTime, userTime,
+              sysTime (seconds), peakRss, readBytes and writeBytes. CPU times
+              and peakRss are None if the OS didn't report them
+
+    """
+    job = result.job
+    attempts = result.earlierAttempts + [result]
+    usages = [x.rusage for x in attempts if x.rusage is not None]
+    peaks = [x for x in map(sysinfo.peak_rss_bytes, usages) if x]
+    stats = {"output": job.output,
+             "status": result.status,
+             "attempts": result.attempts,
+             "brackets": len(job.inputs),
+             "wallTime": sum(x.duration for x in attempts),
+             "attemptWallTimes": [x.duration for x in attempts],
+             "userTime": None,
+             "sysTime": None,
+             "peakRss": max(peaks) if peaks else None}
+    if usages:
+        stats["userTime"] = sum(x.ru_utime for x in usages)
+        stats["sysTime"] = sum(x.ru_stime for x in usages)
+
+    counters = [x.io for x in attempts if x.io is not None]
+    if counters:
+        for key in set(key for x in counters for key in x):
+            stats[key] = _sum_or_none(x.get(key) for x in counters)
+        stats["ioSource"] = "proc"
+        stats["cacheHitRatio"] = _cache_hit_ratio(
+            stats.get("readBytes"), stats.get("storageReadBytes"))
+    else:
+        stats["readBytes"] = sum(_file_size(path) for path in job.inputs)
+        stats["writeBytes"] = _file_size(job.output)
+        stats["ioSource"] = "files"
+    return stats
+# end job_stats
+
+
+class BatchReport(object):
+
+    """The performance summary of a finished batch."""
+
+    def __init__(self, results, workers, slowestCount=10, extraStats=()):
+        """Measures every job and summarizes the batch.
+
+        Args:
+            results (list of <scheduler.JobResult>): Every job of the batch
+            workers (int): The number of jobs that were allowed to run at once
+            slowestCount (int): The number of slowest jobs to list
+            extraStats (list of callables): Each is called with every job and
+                                            returns a dict of more stats for
+                                            it (ex: ReadAhead.job_stats)
+
+        """
+        super(BatchReport, self).__init__()
+        self.workers = workers
+        self.cores = multiprocessing.cpu_count()
+        self.jobs = []
+        for result in results:
+            stats = job_stats(result)
+            for getStats in extraStats:
+                stats.update(getStats(result.job))
+            self.jobs.append(stats)
+        self.slowestCount = slowestCount
+
+        started = [x for x in results if x.attempts > 0]
+        if started:
+            self.wallTime = max(x.endTime for x in started) - \
+                min((x.earlierAttempts or [x])[0].startTime for x in started)
+        else:
+            self.wallTime = 0.0
+    # end __init__
+
+    def _total(self, key):
+        """Sums a stat over every job that reported it."""
+        return sum(x[key] for x in self.jobs if x.get(key) is not None)
+    # end _total
+
+    def _cache_hit_ratio(self, jobs):
+        """Gets the page cache hit ratio over some jobs, or None."""
+        jobs = [x for x in jobs if x.get("storageReadBytes") is not None]
+        return _cache_hit_ratio(sum(x["readBytes"] for x in jobs),
+                                sum(x["storageReadBytes"] for x in jobs))
+    # end _cache_hit_ratio
+
+    def summary(self):
+        """Gets the batch-wide numbers.
+
+        Returns:
+            dict: The totals, throughput and utilization of the batch
+
+        """
+        finished = [x for x in self.jobs if x["status"] == "finished"]
+        brackets = sum(x["brackets"] for x in finished)
+        cpuTime = self._total("userTime") + self._total("sysTime")
+        jobTime = self._total("wallTime")
+        wallTime = max(self.wallTime, 1e-6)
+        peaks = [x["peakRss"] for x in self.jobs if x["peakRss"]]
+
+        return {"jobs": len(self.jobs),
+                "finished": len(finished),
+                "failed": len(self.jobs) - len(finished),
+                "brackets": brackets,
+                "wallTime": self.wallTime,
+                "bracketsPerMinute": brackets / wallTime * 60.0,
+                "workers": self.workers,
+                "cores": self.cores,
+                "cpuTime": cpuTime,
+                # the share of all cores that the merges kept busy
+                "coreUtilization": cpuTime / (wallTime * self.cores),
+                # the share of the time that the worker slots were filled
+                "workerUtilization": jobTime / (wallTime * max(1, self.workers)),
+                "readBytes": self._total("readBytes"),
+                "writeBytes": self._total("writeBytes"),
+                "readBytesPerSecond": self._total("readBytes") / wallTime,
+                "maxPeakRss": max(peaks) if peaks else None,
+                "cacheHitRatio": self._cache_hit_ratio(self.jobs),
+                "prefetchedCacheHitRatio": self._cache_hit_ratio(
+                    [x for x in self.jobs if x.get("prefetched")]),
+                "otherCacheHitRatio": self._cache_hit_ratio(
+                    [x for x in self.jobs if x.get("prefetched") is False])}
+    # end summary
+
+    def slowest(self):
+        """list of dicts: The stats of the slowest jobs, slowest first."""
+        return sorted(self.jobs, key=lambda x: x["wallTime"],
+                      reverse=True)[:self.slowestCount]
+    # end slowest
+
+    def to_dict(self):
+        """dict: The report as a JSON-serializable dictionary."""
+        return {"summary": self.summary(),
+                "slowest": self.slowest(),
+                "jobs": self.jobs}
+    # end to_dict
+
+    def format_text(self):
+        """Formats the report for people.
+
+        Returns:
+            str: The multi-line report
+
+        """
+        summary = self.summary()
+        megabyte = float(1024 ** 2)
+        lines = [
+            "Merged {finished}/{jobs} HDRs ({brackets} brackets) in "
+            "{time}".format(time=planner.format_duration(summary["wallTime"]),
+                            **summary),
+            "Throughput: {0:.1f} brackets/minute".format(
+                summary["bracketsPerMinute"]),
+            "Core utilization: {0:.0%} of {1} cores ({2:.0f} CPU seconds)".format(
+                summary["coreUtilization"], summary["cores"],
+                summary["cpuTime"]),
+            "Worker utilization: {0:.0%} of {1} workers".format(
+                summary["workerUtilization"], summary["workers"]),
+            "Read: {0:.1f} MB ({1:.1f} MB/s), written: {2:.1f} MB".format(
+                summary["readBytes"] / megabyte,
+                summary["readBytesPerSecond"] / megabyte,
+                summary["writeBytes"] / megabyte),
+        ]
+        if summary["maxPeakRss"]:
+            lines.append("Largest peak memory: {0:.0f} MB".format(
+                summary["maxPeakRss"] / megabyte))
+
+        if summary["cacheHitRatio"] is not None:
+            line = "Page cache hits: {0:.0%} of reads".format(
+                summary["cacheHitRatio"])
+            if summary["prefetchedCacheHitRatio"] is not None:
+                line += " ({0:.0%} for prefetched merges".format(
+                    summary["prefetchedCacheHitRatio"])
+                if summary["otherCacheHitRatio"] is not None:
+                    line += ", {0:.0%} for the others".format(
+                        summary["otherCacheHitRatio"])
+                line += ")"
+            lines.append(line)
+
+        lines.append("Slowest merges:")
+        for stats in self.slowest():
+            cpuTime = (stats["userTime"] or 0.0) + (stats["sysTime"] or 0.0)
+            lines.append("    {time}  cpu {cpu:.0f}s  {brackets} brackets  "
+                         "{status}  {output}".format(
+                             time=planner.format_duration(stats["wallTime"]),
+                             cpu=cpuTime, **stats))
+        return "\n".join(lines)
+    # end format_text
+
+    def write(self, folder, name=REPORT_NAME):
+        """Writes the JSON and the text report.
+
+        Args:
+            folder (str): The folder to write into. It is created if needed
+            name (str): The file name of both reports, without extension
+
+        Raises:
+            IOError or OSError: If the folder or the files can't be written
+
+        Returns:
+            tuple of strs: The paths of the JSON and the text report
+
+        """
+        try:
+            os.makedirs(folder)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        jsonPath = os.path.join(folder, name + ".json")
+        textPath = os.path.join(folder, name + ".txt")
+        with io.open(jsonPath, "w", encoding="utf-8") as f:
+            f.write(u"{}\n".format(json.dumps(self.to_dict(), indent=4)))
+        with io.open(textPath, "w", encoding="utf-8") as f:
+            f.write(u"{}\n".format(self.format_text()))
+        return (jsonPath, textPath)
+    # end write
+# end BatchReport
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,165 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Decides which failed merges are tried again, and saves the ones that still
+failed so that they can be re-run later.
+
+Only failures that are likely to go away on their own are retried: a merge
+that hit its timeout, that was killed by a signal (ex: the OOM killer) or
+that couldn't be launched because the machine was out of processes or
+memory. A merge that exits with an error code (ex: -130 for missing
+exposures) fails the same way every time and is not retried unless its code
+is listed in retryCodes.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+RetryPolicy: Decides if/when a failed job is tried again.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+read_rerun_manifest: Reads the jobs saved by write_rerun_manifest.
+write_rerun_manifest: Saves the failed jobs of a batch so they can be re-run.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+retry.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import io
+import json
+import errno
+
+# IMPORT LOCAL LIBRARIES
+import engine
+
+
+RERUN_MANIFEST_NAME = "failed_hdrs.json"
+TRANSIENT_ERRNOS = (errno.EAGAIN, errno.ENOMEM, errno.EMFILE, errno.ENFILE)
+
+
+class RetryPolicy(object):
+
+    """Decides if/when a failed job is tried again.
+
+    The delay before each retry grows exponentially (backoff * factor **
+    (attempt - 1)), up to maxDelay, so that a machine that is short on
+    memory has time to recover.
+
+    """
+
+    def __init__(self, maxRetries=2, backoff=5.0, factor=2.0, maxDelay=300.0,
+                 retryCodes=()):
+        """Sets the limits of the policy.
+
+        Args:
+            maxRetries (int): The number of times a job may be retried
+            backoff (float): The seconds to wait before the first retry
+            factor (float): The multiplier of the delay after every retry
+            maxDelay (float): The longest delay between two attempts
+            retryCodes (iterable of ints): Exit codes that also count as
+                                           transient
+
+        """
+        super(RetryPolicy, self).__init__()
+        self.maxRetries = maxRetries
+        self.backoff = backoff
+        self.factor = factor
+        self.maxDelay = maxDelay
+        self.retryCodes = set(retryCodes)
+    # end __init__
+
+    def is_transient(self, result):
+        """Checks if a failure is likely to go away on a retry.
+
+        Args:
+            result (<scheduler.JobResult>): The failed attempt
+
+        Returns:
+            bool: True if the job should be tried again
+
+        """
+        if result.cancelled:
+            return False
+        if result.timedOut:
+            return True
+        if result.error is not None:
+            return getattr(result.error, "errno", None) in TRANSIENT_ERRNOS
+        if result.returncode is not None and result.returncode < 0:
+            return True  # killed by a signal
+        return result.returncode in self.retryCodes
+    # end is_transient
+
+    def should_retry(self, result, attempt):
+        """Checks if a failed attempt is retried.
+
+        Args:
+            result (<scheduler.JobResult>): The failed attempt
+            attempt (int): The number of attempts made so far (1 or more)
+
+        Returns:
+            bool: True if the job should run again
+
+        """
+        return attempt <= self.maxRetries and self.is_transient(result)
+    # end should_retry
+
+    def delay(self, attempt):
+        """Gets the seconds to wait before the next attempt.
+
+        Args:
+            attempt (int): The number of attempts made so far (1 or more)
+
+        Returns:
+            float: The delay, in seconds
+
+        """
+        return min(self.maxDelay, self.backoff * self.factor ** (attempt - 1))
+    # end delay
+# end RetryPolicy
+
+
+def write_rerun_manifest(path, results):
+    """Saves the failed jobs of a batch so they can be re-run.
+
+    Args:
+        path (str): The JSON file to write
+        results (list of <scheduler.JobResult>): The failed jobs
+
+    """
+    entries = []
+    for result in results:
+        entry = result.job.to_dict()
+        entry["returncode"] = result.returncode
+        entry["timedOut"] = result.timedOut
+        entry["attempts"] = result.attempts
+        if result.error is not None:
+            entry["error"] = str(result.error)
+        entries.append(entry)
+
+    with io.open(path, "w", encoding="utf-8") as f:
+        f.write(u"{}\n".format(json.dumps({"jobs": entries}, indent=4)))
+# end write_rerun_manifest
+
+
+def read_rerun_manifest(path):
+    """Reads the jobs saved by write_rerun_manifest.
+
+    Args:
+        path (str): The JSON file to read
+
+    Returns:
+        list of <engine.MergeJob>: The jobs, ready to be run again
+
+    """
+    with io.open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [engine.MergeJob.from_dict(entry) for entry in data["jobs"]]
+# end read_rerun_manifest
+
+
+if __name__ == "__main__":
+    print(__doc__)
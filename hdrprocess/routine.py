@@ -6,10 +6,6 @@
 Deals with processing/filtering/sorting existing information, from the GUI
 or simply from other modules
 
-Classes
-+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
-Capturing: A python file object wrapper to use in a "with" statement.
-
 Methods
 +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 get_sequences: Sorts sequences of files by name/type or by a given interval.
@@ -29,7 +25,6 @@ import sys
 import re
 import json
 import math
-from cStringIO import StringIO
 
 # IMPORT THIRD-PARTY LIBRARIES
 import natsort
@@ -38,25 +33,6 @@ import natsort
 import paths
 
 
-class Capturing(list):
-
-    """Class to get relevant output info from mkhdri.exe as it executes."""
-
-    def __enter__(self):
-        """Ran when Capturing's with context is first created."""
-        self._stdout = sys.stdout
-        sys.stdout = self._stringio = StringIO()
-        return self
-    # end __enter__
-
-    def __exit__(self, *args):
-        """Ran when Capturing's with context is exitted."""
-        self.extend(self._stringio.getvalue().splitlines())
-        sys.stdout = self._stdout
-    # end __exit__
-# end Capturing
-
-
 def get_sequences(filesH, seqInterval):
     """Sorts a sequence of files first by name/type and then by seqInterval.
 
@@ -0,0 +1,815 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Runs the merge jobs built by engine.hdr_batch_process, keeping a fixed
+number of them busy at once. Jobs are exec'd directly from their argv list,
+without a shell in between.
+
+Every launched process gets a small watcher thread that blocks until the
+process exits (os.wait4 on POSIX, Popen.wait elsewhere) and posts the exit
+onto an event queue. The scheduler sleeps on that queue, so no CPU time is
+spent watching children while the merges run.
+
+The stdout/stderr of each process is streamed into a joboutput.JobOutput, so
+the latest lines of every job are available while it runs.
+
+Admission policies (like memorybudget.MemoryBudget) can hold the next job
+back even when a worker slot is free. A policy is any object with these
+methods:
+
+    can_start(job) -> bool: If the job may start right now
+    job_started(job): Called after the job's process is launched
+    job_finished(result): Called with the JobResult once the job exits
+
+A policy that holds state for jobs before they start (like
+staging.StagingCache) can also have a job_discarded(result) method. It is
+called instead of job_finished for a job that is done without its process
+having run: it couldn't be launched, or the batch was cancelled first.
+
+If nothing is running, the next job is always started so a batch can never
+stall on a policy. Jobs normally start in order, but a policy with a true
+"reorderable" attribute (like devices.DeviceLimit) lets the scheduler look
+past the job that it holds back and start a later one that fits.
+
+Observers (like journal.JobJournal) have the same job_started/job_finished
+methods but never hold a job back.
+
+Preparers (like staging.StagingCache) have a prepare(job) method that
+returns the job to launch in the job's place, ex: with other input paths.
+Results, policies and observers still see the original job.
+
+Each job runs in its own process group, so a timeout or a cancel stops the
+merge and anything that it started. A retry.RetryPolicy can put a failed job
+back in the queue after a delay; policies and observers are told about every
+attempt, but onFinish/onProgress only see a job's last one (which keeps the
+others in its earlierAttempts).
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+JobResult: The outcome of a single job that the scheduler ran.
+Scheduler: Runs a collection of jobs with at most N of them running at once.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+next_upcoming: Finds the next job of a lookahead window that needs work.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+scheduler.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import sys
+import time
+import heapq
+import errno
+import signal
+import logging
+import threading
+import subprocess
+import collections
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+# IMPORT LOCAL LIBRARIES
+import sysinfo
+import joboutput
+
+
+LOGGER = logging.getLogger(__name__)
+LOST_RETURNCODE = 255  # for a process whose exit code couldn't be read
+
+
+def next_upcoming(jobs, cursor, started, done, lookahead):
+    """Finds the next job of a lookahead window that needs work.
+
+    Background helpers (like staging.StagingCache and readahead.ReadAhead)
+    work on the next few jobs that the scheduler hasn't started yet.
+
+    Args:
+        jobs (list): Every job, in the order that the scheduler starts them
+        cursor (int): The position in jobs before which every job started
+        started (container): The id() of every job that has started
+        done (container): The id() of every job that needs no more work
+        lookahead (int): The number of unstarted jobs in the window
+
+    Returns:
+        tuple: The job (or None if the whole window is done) and the new
+               cursor
+
+    """
+    while cursor < len(jobs) and id(jobs[cursor]) in started:
+        cursor += 1
+
+    upcoming = 0
+    for job in jobs[cursor:]:
+        if upcoming >= lookahead:
+            break
+        if id(job) in started:
+            continue
+        upcoming += 1
+        if id(job) not in done:
+            return (job, cursor)
+    return (None, cursor)
+# end next_upcoming
+
+
+class JobResult(object):
+
+    """The outcome of a single job that the scheduler ran."""
+
+    def __init__(self, job, returncode, startTime, endTime,
+                 rusage=None, error=None, output=None, timedOut=False,
+                 cancelled=False, attempts=1, io=None, earlierAttempts=None):
+        """Stores the information about a finished job.
+
+        Args:
+            job (any): The job that was run
+            returncode (int or NoneType): The exit code of the job's process.
+                                          None if the process never started
+            startTime (float): The time.time() that the job was launched
+            endTime (float): The time.time() that the job's exit was noticed
+            rusage (<resource.struct_rusage> or NoneType): The resource usage
+                                                           of the process, if
+                                                           the OS reports it
+            error (Exception or NoneType): The error raised while launching
+                                           the job, if any
+            output (<joboutput.JobOutput> or NoneType): The captured output
+                                                        of the job
+            timedOut (bool): If the job was killed for running too long
+            cancelled (bool): If the job was stopped (or never started)
+                              because the batch was cancelled
+            attempts (int): The number of times the job was run
+            io (dict or NoneType): The I/O counters of the process (see
+                                   sysinfo.process_io), if the OS reports them
+            earlierAttempts (list of <JobResult>): The failed attempts that
+                                                   were retried before this
+                                                   one, oldest first
+
+        """
+        super(JobResult, self).__init__()
+        self.job = job
+        self.returncode = returncode
+        self.startTime = startTime
+        self.endTime = endTime
+        self.rusage = rusage
+        self.error = error
+        self.output = output
+        self.timedOut = timedOut
+        self.cancelled = cancelled
+        self.attempts = attempts
+        self.io = io
+        self.earlierAttempts = list(earlierAttempts or [])
+    # end __init__
+
+    @property
+    def duration(self):
+        """float: The wall-clock time that the job took, in seconds."""
+        return self.endTime - self.startTime
+    # end duration
+
+    @property
+    def succeeded(self):
+        """bool: If the job's process started and exited with code 0."""
+        return self.error is None and self.returncode == 0
+    # end succeeded
+
+    @property
+    def status(self):
+        """str: "finished", "failed", "timed out" or "cancelled"."""
+        if self.succeeded:
+            return "finished"
+        elif self.cancelled:
+            return "cancelled"
+        elif self.timedOut:
+            return "timed out"
+        return "failed"
+    # end status
+
+    def __repr__(self):
+        """Object statement of current class."""
+        return '<{name}(job={job!r}, returncode={code!r}) object at '\
+               '{hexI}>'.format(name=self.__class__.__name__,
+                                job=self.job,
+                                code=self.returncode,
+                                hexI=hex(id(self)))
+    # end __repr__
+# end JobResult
+
+
+class Scheduler(object):
+
+    """Runs a collection of jobs with at most N of them running at once."""
+
+    def __init__(self, maxWorkers=1, onStart=None, onFinish=None,
+                 onProgress=None, onOutput=None, logFolder=None,
+                 maxOutputLines=200, policies=(), observers=(), timeout=None,
+                 retryPolicy=None, killGrace=5.0, lookahead=64,
+                 preparers=()):
+        """Creates the scheduler and its (empty) event queue.
+
+        Args:
+            maxWorkers (int): The number of jobs allowed to run at once
+            onStart (callable): Called with each job as it is launched
+            onFinish (callable): Called with each JobResult as jobs exit
+            onProgress (callable): Called with (finishedCount, totalCount)
+                                   every time a job exits
+            onOutput (callable): Called with (job, streamName, line) for
+                                 every line that a job prints. It is called
+                                 from the job's reader threads
+            logFolder (str): If given, every job's output is also written to
+                             "job_<index>.log" inside of this folder
+            maxOutputLines (int): The number of recent lines of output kept
+                                  in memory for each job
+            policies (list): Admission policies which must all agree before
+                             a job is started
+            observers (list): Objects that are told when each job starts and
+                              finishes
+            timeout (float): The seconds that a job may run before it is
+                             killed. None means no limit
+            retryPolicy (<retry.RetryPolicy>): Decides which failed jobs are
+                                               run again. None means never
+            killGrace (float): The seconds between asking a process group to
+                               stop (SIGTERM) and killing it (SIGKILL)
+            lookahead (int): How many jobs past a job that a reorderable
+                             policy holds back are checked
+            preparers (list): Objects that may swap each job for another one
+                              right before it is launched
+
+        """
+        super(Scheduler, self).__init__()
+        self.maxWorkers = max(1, int(maxWorkers))
+        self.onStart = onStart
+        self.onFinish = onFinish
+        self.onProgress = onProgress
+        self.onOutput = onOutput
+        self.logFolder = logFolder
+        self.maxOutputLines = maxOutputLines
+        self.policies = list(policies)
+        self.observers = list(observers)
+        self.timeout = timeout
+        self.retryPolicy = retryPolicy
+        self.killGrace = killGrace
+        self.lookahead = lookahead
+        self.preparers = list(preparers)
+        self._events = queue.Queue()
+        self._cancelEvent = threading.Event()
+        self._killTimers = {}
+        self._submitted = collections.deque()
+        self._cancelledJobs = set()
+        self._earlierAttempts = {}  # id(job): the results of retried attempts
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._following = False
+        self._finishedCount = 0
+    # end __init__
+
+    @property
+    def cancelled(self):
+        """bool: If cancel was called."""
+        return self._cancelEvent.is_set()
+    # end cancelled
+
+    def cancel(self):
+        """Stops the batch: running jobs are killed and no new job starts.
+
+        Safe to call from any thread. run returns once the killed processes
+        have exited.
+
+        """
+        self._cancelEvent.set()
+        self._events.put(None)  # wake up the scheduler
+    # end cancel
+
+    def submit(self, job):
+        """Adds a job to a running batch. See run's follow argument.
+
+        Safe to call from any thread.
+
+        Args:
+            job (<engine.MergeJob>): The job to run
+
+        """
+        self._submitted.append(job)
+        self._events.put(None)
+    # end submit
+
+    def cancel_job(self, job):
+        """Stops a single job, or keeps it from starting.
+
+        Safe to call from any thread. The job gets a cancelled result (unless
+        it had already finished).
+
+        Args:
+            job (<engine.MergeJob>): A job given to run or submit
+
+        """
+        with self._lock:
+            self._cancelledJobs.add(id(job))
+        self._events.put(None)
+    # end cancel_job
+
+    def close(self):
+        """Lets run(follow=True) return once its jobs are done.
+
+        Safe to call from any thread.
+
+        """
+        self._closed.set()
+        self._events.put(None)
+    # end close
+
+    def wake(self):
+        """Makes the scheduler check its policies again.
+
+        Policies that can change their mind without a job exiting (ex: when
+        a job's inputs finish staging) should have this called. Safe to call
+        from any thread.
+
+        """
+        self._events.put(None)
+    # end wake
+
+    def launch(self, job):
+        """Starts the process for a job, with its output piped back to us.
+
+        Args:
+            job (<engine.MergeJob>): The job to run. Any object with an
+                                     "argv" list works
+
+        Returns:
+            <subprocess.Popen>: The started process
+
+        """
+        kwargs = {}
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        elif sys.version_info[0] >= 3:
+            kwargs["start_new_session"] = True
+        else:
+            kwargs["preexec_fn"] = os.setsid
+        return subprocess.Popen(job.argv, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, **kwargs)
+    # end launch
+
+    def terminate(self, process):
+        """Stops a process and every process that it started.
+
+        On POSIX the process group gets SIGTERM, then SIGKILL if it is still
+        running after self.killGrace seconds.
+
+        Args:
+            process (<subprocess.Popen>): A process started by self.launch
+
+        """
+        if os.name == "nt":
+            with open(os.devnull, "w") as devnull:
+                subprocess.call(["taskkill", "/F", "/T", "/PID",
+                                 str(process.pid)],
+                                stdout=devnull, stderr=devnull)
+            return
+
+        self._signal_group(process, signal.SIGTERM)
+        timer = threading.Timer(self.killGrace, self._signal_group,
+                                args=(process, signal.SIGKILL))
+        timer.daemon = True
+        timer.start()
+        self._killTimers[process.pid] = timer
+    # end terminate
+
+    def _kill_after_grace(self, processes):
+        """Waits self.killGrace seconds for processes to exit, then kills them.
+
+        The SIGKILL timers of terminate are daemon threads, which don't
+        outlive the interpreter, so this is used when run is interrupted.
+
+        Args:
+            processes (list of <subprocess.Popen>): Processes that were sent
+                                                    terminate
+
+        """
+        if os.name == "nt":
+            return  # taskkill /F already killed them
+        deadline = time.time() + self.killGrace
+        # the watcher threads set returncode once a process is reaped
+        while time.time() < deadline and \
+                any(x.returncode is None for x in processes):
+            time.sleep(0.05)
+        for process in processes:
+            timer = self._killTimers.pop(process.pid, None)
+            if timer is not None:
+                timer.cancel()
+            self._signal_group(process, signal.SIGKILL)
+    # end _kill_after_grace
+
+    @staticmethod
+    def _signal_group(process, signalNumber):
+        """Sends a signal to a process's group, if the process still runs."""
+        if process.returncode is not None:
+            return
+        try:
+            os.killpg(process.pid, signalNumber)
+        except OSError:
+            pass  # it exited in the meantime
+    # end _signal_group
+
+    def make_output(self, job, index):
+        """Creates the object that a job's output lines are streamed into.
+
+        Args:
+            job (any): The job to capture the output of
+            index (int): The position of the job in the batch
+
+        Returns:
+            <joboutput.JobOutput>: The (empty) output of the job
+
+        """
+        logPath = None
+        if self.logFolder is not None:
+            logPath = os.path.join(self.logFolder,
+                                   "job_{i:05d}.log".format(i=index))
+        return joboutput.JobOutput(job, logPath=logPath,
+                                   maxLines=self.maxOutputLines,
+                                   onLine=self.onOutput)
+    # end make_output
+
+    def run(self, jobs=(), follow=False):
+        """Runs every job, keeping self.maxWorkers of them busy at once.
+
+        Args:
+            jobs (iterable): The jobs to run, in the order to start them
+            follow (bool): If True, keep running jobs given to self.submit
+                           until self.close (or self.cancel) is called. The
+                           results aren't kept, so that a long-lived
+                           scheduler doesn't grow; use onFinish instead
+
+        Returns:
+            list of <JobResult>: One result per job, in the order they exited.
+                                 If the batch is cancelled, the jobs that
+                                 never started get a cancelled result too.
+                                 Empty if follow is True
+
+        """
+        pending = collections.deque((index, job, 1)
+                                    for index, job in enumerate(jobs))
+        total = len(pending)
+        self._following = follow
+        self._finishedCount = 0
+        self._earlierAttempts = {}
+        delayed = []  # a heap of (readyTime, index, job, attempt) retries
+        running = {}
+        deadlines = {}
+        timedOut = set()
+        killed = set()
+        results = []
+
+        try:
+            while pending or running or delayed or self._submitted or \
+                    (follow and not self._closed.is_set() and
+                     not self.cancelled):
+                while self._submitted:
+                    pending.append((total, self._submitted.popleft(), 1))
+                    total += 1
+                if self._cancelledJobs:
+                    self._cancel_jobs(pending, delayed, running, killed,
+                                      results, total)
+                if self.cancelled and (pending or delayed or
+                                       set(running) - killed):
+                    self._cancel_all(pending, delayed, running, killed,
+                                     results, total)
+
+                while delayed and delayed[0][0] <= time.time():
+                    _, index, job, attempt = heapq.heappop(delayed)
+                    pending.appendleft((index, job, attempt))
+
+                while pending and len(running) < self.maxWorkers:
+                    position = self._next_position(pending, running)
+                    if position is None:
+                        break  # wait for a running job to free its resources
+
+                    index, job, attempt = pending[position]
+                    del pending[position]
+                    startTime = time.time()
+                    output = self.make_output(job, index)
+                    try:
+                        launchJob = job
+                        for preparer in self.preparers:
+                            launchJob = preparer.prepare(launchJob)
+                        process = self.launch(launchJob)
+                    except (OSError, ValueError) as err:
+                        LOGGER.error("Job: %r could not be started. %s", job,
+                                     err)
+                        output.close()
+                        self._handle_result(
+                            JobResult(job, None, startTime, time.time(),
+                                      error=err, output=output,
+                                      attempts=attempt),
+                            index, delayed, results, total)
+                        continue
+
+                    running[process.pid] = (index, job, attempt, process,
+                                            startTime, output)
+                    if self.timeout is not None:
+                        deadlines[process.pid] = startTime + self.timeout
+                    self._watch(process, output)
+                    for policy in self.policies:
+                        policy.job_started(job)
+                    for observer in self.observers:
+                        observer.job_started(job)
+                    if self.onStart is not None:
+                        self.onStart(job)
+
+                if not running and not delayed:
+                    if follow and not pending:
+                        self._events.get()  # until a submit, close or cancel
+                    continue
+
+                # blocks (without spinning) until a watcher thread reports an
+                # exit, a submit, a cancel, or the next timeout/retry is due
+                try:
+                    event = self._events.get(
+                        timeout=self._next_wakeup(deadlines, delayed))
+                except queue.Empty:
+                    self._kill_expired(running, deadlines, timedOut)
+                    continue
+                if event is None:
+                    continue  # woken up by cancel or wake
+
+                pid, returncode, rusage, ioCounters = event
+                index, job, attempt, process, startTime, output = \
+                    running.pop(pid)
+                deadlines.pop(pid, None)
+                timer = self._killTimers.pop(pid, None)
+                if timer is not None:
+                    timer.cancel()  # it exited within the grace period
+                output.close()
+                result = JobResult(job, returncode, startTime, time.time(),
+                                   rusage=rusage, output=output,
+                                   timedOut=pid in timedOut,
+                                   cancelled=pid in killed, attempts=attempt,
+                                   io=ioCounters)
+                timedOut.discard(pid)
+                killed.discard(pid)
+                self._handle_result(result, index, delayed, results, total)
+        except BaseException:
+            # ex: KeyboardInterrupt. Don't leave orphaned merges behind
+            processes = [x[3] for x in running.values()]
+            for process in processes:
+                self.terminate(process)
+            self._kill_after_grace(processes)
+            raise
+
+        return results
+    # end run
+
+    def _next_position(self, pending, running):
+        """Gets the position of the next job to start in pending.
+
+        Args:
+            pending (deque): The (index, job, attempt) of the waiting jobs
+            running (dict): The running jobs
+
+        Returns:
+            int or NoneType: The position or None if no job may start now
+
+        """
+        if not running:
+            return 0
+        head = pending[0][1]
+        blocking = [x for x in self.policies if not x.can_start(head)]
+        if not blocking:
+            return 0
+        if not all(getattr(x, "reorderable", False) for x in blocking):
+            return None
+
+        for position in range(1, min(len(pending), self.lookahead + 1)):
+            if self.can_start(pending[position][1]):
+                return position
+        return None
+    # end _next_position
+
+    def _cancel_all(self, pending, delayed, running, killed, results, total):
+        """Kills every running job and gives every unstarted job a result."""
+        unstarted = [(index, job, attempt) for index, job, attempt in pending]
+        unstarted.extend((index, job, attempt)
+                         for _, index, job, attempt in delayed)
+        pending.clear()
+        del delayed[:]
+
+        now = time.time()
+        for _, job, attempt in unstarted:
+            self._finish(JobResult(job, None, now, now, cancelled=True,
+                                   attempts=attempt - 1),
+                         results, total, started=False)
+
+        for pid, (_, _, _, process, _, _) in running.items():
+            if pid not in killed:
+                killed.add(pid)
+                self.terminate(process)
+    # end _cancel_all
+
+    def _cancel_jobs(self, pending, delayed, running, killed, results,
+                     total):
+        """Handles the jobs given to self.cancel_job."""
+        with self._lock:
+            ids = self._cancelledJobs
+            self._cancelledJobs = set()
+
+        now = time.time()
+        for entries in (pending, delayed):
+            for entry in list(entries):
+                index, job, attempt = entry[-3:]
+                if id(job) not in ids:
+                    continue
+                entries.remove(entry)
+                self._finish(JobResult(job, None, now, now, cancelled=True,
+                                       attempts=attempt - 1),
+                             results, total, started=False)
+        heapq.heapify(delayed)
+
+        for pid, (_, job, _, process, _, _) in running.items():
+            if id(job) in ids and pid not in killed:
+                killed.add(pid)
+                self.terminate(process)
+    # end _cancel_jobs
+
+    def _next_wakeup(self, deadlines, delayed):
+        """Gets the seconds until the next timeout or retry, or None."""
+        times = list(deadlines.values())
+        if delayed:
+            times.append(delayed[0][0])
+        if not times:
+            return None
+        return max(0.0, min(times) - time.time())
+    # end _next_wakeup
+
+    def _kill_expired(self, running, deadlines, timedOut):
+        """Terminates every job that ran past its deadline."""
+        now = time.time()
+        for pid, deadline in list(deadlines.items()):
+            if deadline <= now:
+                job = running[pid][1]
+                LOGGER.warning("Job: %r ran for more than %ss. Killing it",
+                               job, self.timeout)
+                timedOut.add(pid)
+                del deadlines[pid]
+                self.terminate(running[pid][3])
+    # end _kill_expired
+
+    def _handle_result(self, result, index, delayed, results, total):
+        """Finishes a job or, if the retry policy allows, queues it again."""
+        if result.succeeded or result.cancelled or self.cancelled or \
+                self.retryPolicy is None or \
+                not self.retryPolicy.should_retry(result, result.attempts):
+            self._finish(result, results, total)
+            return
+
+        delay = self.retryPolicy.delay(result.attempts)
+        LOGGER.warning("Job: %r failed (exit code %r). Retrying in %ss",
+                       result.job, result.returncode, delay)
+        if result.error is None:
+            for policy in self.policies:
+                policy.job_finished(result)
+        for observer in self.observers:
+            observer.job_finished(result)
+        self._earlierAttempts.setdefault(id(result.job), []).append(result)
+        heapq.heappush(delayed, (time.time() + delay, index, result.job,
+                                 result.attempts + 1))
+    # end _handle_result
+
+    def can_start(self, job):
+        """Checks if every admission policy allows job to start now.
+
+        Args:
+            job (any): The next job to start
+
+        Returns:
+            bool: True if the job may start
+
+        """
+        return all(policy.can_start(job) for policy in self.policies)
+    # end can_start
+
+    def _finish(self, result, results, total, started=True):
+        """Records a finished job and reports it to the callbacks."""
+        earlier = self._earlierAttempts.pop(id(result.job), None)
+        if earlier:
+            result.earlierAttempts = earlier
+        if started and result.error is None:
+            for policy in self.policies:
+                policy.job_finished(result)
+        else:
+            for policy in self.policies:
+                if hasattr(policy, "job_discarded"):
+                    policy.job_discarded(result)
+        for observer in self.observers:
+            observer.job_finished(result)
+        self._finishedCount += 1
+        if not self._following:
+            results.append(result)
+        if self.onFinish is not None:
+            self.onFinish(result)
+        if self.onProgress is not None:
+            self.onProgress(self._finishedCount, total)
+    # end _finish
+
+    def _watch(self, process, output):
+        """Starts daemon threads that read process's output and wait for it."""
+        readers = joboutput.start_readers(process, output)
+        thread = threading.Thread(target=self._wait_for_exit,
+                                  args=(process, readers))
+        thread.daemon = True
+        thread.start()
+    # end _watch
+
+    def _wait_for_exit(self, process, readers=()):
+        """Blocks until process exits and then posts it on the event queue.
+
+        The exit is always posted, even if it couldn't be read (it gets
+        LOST_RETURNCODE then), so that run never waits for it forever.
+
+        Args:
+            process (<subprocess.Popen>): The process to wait for
+            readers (list of <threading.Thread>): The threads reading the
+                                                  process's output. They are
+                                                  joined before the exit is
+                                                  posted so no line is lost
+
+        """
+        returncode = LOST_RETURNCODE
+        rusage = None
+        ioCounters = None
+        try:
+            if hasattr(os, "waitid") and hasattr(os, "WNOWAIT"):
+                # wait for the exit without reaping, while /proc/<pid> exists
+                while True:
+                    try:
+                        os.waitid(os.P_PID, process.pid,
+                                  os.WEXITED | os.WNOWAIT)
+                        ioCounters = sysinfo.process_io(process.pid)
+                        break
+                    except OSError as err:
+                        if err.errno != errno.EINTR:
+                            break  # _reap reports it
+            returncode, rusage = self._reap(process)
+        except Exception as err:
+            LOGGER.error("Could not wait for process: %s. %s", process.pid,
+                         err)
+        finally:
+            for reader in readers:
+                reader.join()
+            self._events.put((process.pid, returncode, rusage, ioCounters))
+    # end _wait_for_exit
+
+    @staticmethod
+    def _reap(process):
+        """Reaps an exited process.
+
+        Args:
+            process (<subprocess.Popen>): The process to reap
+
+        Returns:
+            tuple of int and <resource.struct_rusage>: The exit code and the
+                                                       resource usage (None
+                                                       if the OS doesn't
+                                                       report it)
+
+        """
+        if not hasattr(os, "wait4"):
+            return (process.wait(), None)
+
+        while True:
+            try:
+                _, status, rusage = os.wait4(process.pid, 0)
+                break
+            except OSError as err:
+                if err.errno == errno.EINTR:
+                    continue
+                LOGGER.warning("Could not wait for process: %s. %s",
+                               process.pid, err)
+                if err.errno != errno.ECHILD:
+                    return (process.wait(), None)
+                # reaped by someone else. Popen.wait would make up a 0
+                if process.returncode is None:
+                    process.returncode = LOST_RETURNCODE
+                return (process.returncode, None)
+
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+        process.returncode = returncode  # the pid is reaped, tell Popen
+        return (returncode, rusage)
+    # end _reap
+# end Scheduler
+
+
+if __name__ == "__main__":
+    print(__doc__)
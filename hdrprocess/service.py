@@ -0,0 +1,413 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+A per-machine merge service. "hdrprocess serve" runs it, and GUIs and
+scripts submit batches to it instead of each running their own merges, so
+the machine's cores are shared out by one scheduler instead of being
+oversubscribed.
+
+Batches are kept in a farm.JobQueue file, so they survive a restart of the
+service. The service never has more jobs in hand than it has worker slots,
+so the highest-priority queued job is always the next to start, and a
+priority change takes effect as soon as a slot frees up.
+
+The API is JSON over HTTP, on 127.0.0.1 only:
+
+    GET  /status                   the service's slots and every batch
+    POST /batches                  submit a batch (see below)
+    GET  /batches/<name>           the state of each job of a batch
+    POST /batches/<name>/cancel    cancel the batch's unfinished jobs
+    POST /batches/<name>/priority  {"priority": N}, for its queued jobs
+
+A batch is submitted either as planned jobs:
+
+    {"jobs": [<engine.MergeJob.to_dict()>, ...], "priority": 0, "name": ""}
+
+or as inputs and the options of engine.plan_batch:
+
+    {"inputs": [...], "seqInt": 3, "options": {"defcurve": true, ...}}
+
+Jobs must run one of the bundled merge backends (see engine.BACKENDS). Any
+local user can reach the port, so the service won't run other programs for
+them.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+MergeService: Runs the jobs of a JobQueue on one shared scheduler.
+ServiceClient: Talks to a running service.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+make_server: Creates the HTTP server of a MergeService.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+service.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import json
+import socket
+import logging
+import threading
+
+try:
+    import BaseHTTPServer as httpserver
+    import SocketServer as socketserver
+    import urllib2 as urlrequest
+    from urllib2 import HTTPError
+except ImportError:
+    import http.server as httpserver
+    import socketserver
+    import urllib.request as urlrequest
+    from urllib.error import HTTPError
+
+# IMPORT LOCAL LIBRARIES
+import farm
+import engine
+import planner
+import scheduler
+
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE = os.path.join(os.path.expanduser("~"), ".hdrprocess",
+                             "service.db")
+
+
+class MergeService(object):
+
+    """Runs the jobs of a JobQueue on one shared scheduler."""
+
+    def __init__(self, jobQueue, maxWorkers, pollSeconds=2.0,
+                 **schedulerOptions):
+        """Sets up the service. Nothing runs until self.start.
+
+        Args:
+            jobQueue (<farm.JobQueue>): The persistent queue of batches
+            maxWorkers (int): The number of merges that run at once
+            pollSeconds (float): How often to check the queue when it was
+                                 empty (submissions through self.submit
+                                 are seen right away)
+            **schedulerOptions: Passed to scheduler.Scheduler (ex: policies,
+                                retryPolicy, timeout, logFolder)
+
+        """
+        super(MergeService, self).__init__()
+        self.jobQueue = jobQueue
+        self.maxWorkers = max(1, maxWorkers)
+        self.pollSeconds = pollSeconds
+        self.name = "{host}-{pid}-service".format(host=socket.gethostname(),
+                                                  pid=os.getpid())
+        self.scheduler = scheduler.Scheduler(maxWorkers=self.maxWorkers,
+                                             onFinish=self._job_finished,
+                                             **schedulerOptions)
+        self._inFlight = {}  # id(job): (queue id, job)
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._stopEvent = threading.Event()
+        self._threads = []
+    # end __init__
+
+    def start(self):
+        """Starts the scheduler, the dispatcher and the heartbeat threads."""
+        for target, kwargs in ((self.scheduler.run, {"follow": True}),
+                               (self._dispatch_loop, {}),
+                               (self._heartbeat_loop, {})):
+            thread = threading.Thread(target=target, kwargs=kwargs)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+    # end start
+
+    def stop(self):
+        """Kills the running merges and stops every thread.
+
+        The killed merges keep their leases until they run out, so they are
+        queued again once the service is restarted.
+
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._stopEvent.set()
+        self.scheduler.cancel()
+        self.scheduler.close()
+        for thread in self._threads:
+            thread.join()
+    # end stop
+
+    def submit(self, jobs, priority=0, batch=None):
+        """Queues a batch.
+
+        Args:
+            jobs (list of <engine.MergeJob>): The batch's jobs
+            priority (int): Higher priorities start first
+            batch (str): The batch's name. A random one is made if None
+
+        Raises:
+            ValueError: If a job doesn't run a bundled merge backend
+
+        Returns:
+            str: The batch's name
+
+        """
+        batch = self.jobQueue.submit(jobs, batch=batch, priority=priority)
+        with self._condition:
+            self._condition.notify_all()
+        return batch
+    # end submit
+
+    def status(self):
+        """dict: The service's worker slots, running jobs and every batch."""
+        with self._condition:
+            running = [job.output for _, job in self._inFlight.values()]
+        return {"workers": self.maxWorkers,
+                "running": running,
+                "batches": self.jobQueue.batches()}
+    # end status
+
+    def _dispatch_loop(self):
+        """Hands the next queued job to the scheduler whenever a slot frees."""
+        while True:
+            with self._condition:
+                while not self._stopped and \
+                        len(self._inFlight) >= self.maxWorkers:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+
+            lease = self.jobQueue.lease(self.name)
+            with self._condition:
+                if lease is None:
+                    self._condition.wait(self.pollSeconds)
+                    continue
+                jobId, job = lease
+                self._inFlight[id(job)] = (jobId, job)
+            self.scheduler.submit(job)
+    # end _dispatch_loop
+
+    def _heartbeat_loop(self):
+        """Renews the leases of the jobs in hand and stops cancelled ones."""
+        while not self._stopEvent.wait(self.jobQueue.leaseSeconds / 3.0):
+            with self._condition:
+                inFlight = list(self._inFlight.values())
+            for jobId, job in inFlight:
+                if not self.jobQueue.heartbeat(jobId, self.name):
+                    LOGGER.info("Job: %s was cancelled. Stopping it",
+                                job.output)
+                    self.scheduler.cancel_job(job)
+    # end _heartbeat_loop
+
+    def _job_finished(self, result):
+        """Records a finished job in the queue and frees its slot."""
+        with self._condition:
+            jobId, job = self._inFlight.pop(id(result.job))
+            self._condition.notify_all()
+        if result.cancelled and self._stopped:
+            return  # keep its lease, so that it's queued again on restart
+        self.jobQueue.complete(jobId, self.name, result.returncode)
+        LOGGER.info("%s: %s", result.status.capitalize(), job.output)
+    # end _job_finished
+# end MergeService
+
+
+def _batch_jobs(request):
+    """Gets the jobs of a submission request. See the module docstring."""
+    if "jobs" in request:
+        return [engine.MergeJob.from_dict(x) for x in request["jobs"]]
+
+    inputs = request.get("inputs")
+    sequences = inputs
+    if not inputs or not all(isinstance(x, list) for x in inputs):
+        sequences = [inputs]
+    options = dict((str(key), value)
+                   for key, value in request.get("options", {}).items())
+    jobs = engine.plan_batch(sequences, request.get("seqInt"), **options)
+    # the queue is first in, first out within a priority, so the most
+    # expensive merges are queued first (see planner)
+    return planner.make_plan(jobs, 1).jobs
+# end _batch_jobs
+
+
+class _RequestHandler(httpserver.BaseHTTPRequestHandler):
+
+    """Serves the JSON API of the MergeService in self.server.service."""
+
+    def log_message(self, format, *args):
+        """Sends the access log to the logger instead of stderr."""
+        LOGGER.debug(format, *args)
+    # end log_message
+
+    def _reply(self, code, data):
+        """Sends a JSON response."""
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    # end _reply
+
+    def _read_request(self):
+        """Gets the JSON body of the request ({} if there is none)."""
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length).decode("utf-8"))
+    # end _read_request
+
+    def do_GET(self):
+        """Serves /status and /batches/<name>."""
+        service = self.server.service
+        parts = [x for x in self.path.split("/") if x]
+        if parts == ["status"]:
+            self._reply(200, service.status())
+        elif len(parts) == 2 and parts[0] == "batches":
+            jobs = service.jobQueue.jobs(parts[1])
+            if not jobs:
+                self._reply(404, {"error": "No batch: " + parts[1]})
+                return
+            self._reply(200, {"batch": parts[1],
+                              "counts": service.jobQueue.counts(parts[1]),
+                              "jobs": jobs})
+        else:
+            self._reply(404, {"error": "Unknown path: " + self.path})
+    # end do_GET
+
+    def do_POST(self):
+        """Serves /batches, /batches/<name>/cancel and .../priority."""
+        service = self.server.service
+        parts = [x for x in self.path.split("/") if x]
+        try:
+            request = self._read_request()
+            if parts == ["batches"]:
+                jobs = _batch_jobs(request)
+                batch = service.submit(jobs,
+                                       priority=int(request.get("priority", 0)),
+                                       batch=request.get("name") or None)
+                self._reply(200, {"batch": batch, "jobs": len(jobs)})
+            elif len(parts) == 3 and parts[0] == "batches" and \
+                    parts[2] == "cancel":
+                count = service.jobQueue.cancel(parts[1])
+                self._reply(200, {"batch": parts[1], "cancelled": count})
+            elif len(parts) == 3 and parts[0] == "batches" and \
+                    parts[2] == "priority":
+                count = service.jobQueue.set_priority(
+                    parts[1], int(request["priority"]))
+                self._reply(200, {"batch": parts[1], "changed": count})
+            else:
+                self._reply(404, {"error": "Unknown path: " + self.path})
+        except (ValueError, KeyError, TypeError) as err:
+            self._reply(400, {"error": str(err)})
+    # end do_POST
+# end _RequestHandler
+
+
+class _ThreadingServer(socketserver.ThreadingMixIn, httpserver.HTTPServer):
+
+    """An HTTP server that answers every request on its own thread."""
+
+    daemon_threads = True
+# end _ThreadingServer
+
+
+def make_server(service, port=DEFAULT_PORT):
+    """Creates the HTTP server of a MergeService.
+
+    Args:
+        service (<MergeService>): The service to expose
+        port (int): The port to listen on, on 127.0.0.1
+
+    Returns:
+        <HTTPServer>: The server. Call its serve_forever method
+
+    """
+    server = _ThreadingServer(("127.0.0.1", port), _RequestHandler)
+    server.service = service
+    return server
+# end make_server
+
+
+class ServiceClient(object):
+
+    """Talks to a running service."""
+
+    def __init__(self, url="http://127.0.0.1:{0}".format(DEFAULT_PORT)):
+        """Sets the service's address.
+
+        Args:
+            url (str): The service's address
+
+        """
+        super(ServiceClient, self).__init__()
+        self.url = url.rstrip("/")
+    # end __init__
+
+    def _call(self, path, data=None):
+        """Sends a request and gets its JSON response.
+
+        Raises:
+            ValueError: If the service refused the request
+
+        """
+        body = None if data is None else json.dumps(data).encode("utf-8")
+        request = urlrequest.Request(self.url + path, data=body,
+                                     headers={"Content-Type":
+                                              "application/json"})
+        try:
+            response = urlrequest.urlopen(request)
+        except HTTPError as err:
+            raise ValueError(json.loads(err.read().decode("utf-8"))["error"])
+        try:
+            return json.loads(response.read().decode("utf-8"))
+        finally:
+            response.close()
+    # end _call
+
+    def submit(self, jobs, priority=0, name=None):
+        """Submits planned jobs.
+
+        Args:
+            jobs (list of <engine.MergeJob>): The batch's jobs
+            priority (int): Higher priorities start first
+            name (str): The batch's name. A random one is made if None
+
+        Returns:
+            str: The batch's name
+
+        """
+        return self._call("/batches", {"jobs": [x.to_dict() for x in jobs],
+                                       "priority": priority,
+                                       "name": name})["batch"]
+    # end submit
+
+    def batch(self, name):
+        """dict: The counts and the state of each job of a batch."""
+        return self._call("/batches/" + name)
+    # end batch
+
+    def status(self):
+        """dict: The service's slots, running jobs and every batch."""
+        return self._call("/status")
+    # end status
+
+    def cancel(self, name):
+        """int: Cancels a batch's unfinished jobs and gets their number."""
+        return self._call("/batches/{0}/cancel".format(name), {})["cancelled"]
+    # end cancel
+
+    def set_priority(self, name, priority):
+        """int: Changes the priority of a batch's queued jobs."""
+        return self._call("/batches/{0}/priority".format(name),
+                          {"priority": priority})["changed"]
+    # end set_priority
+# end ServiceClient
+
+
+if __name__ == "__main__":
+    print(__doc__)
@@ -0,0 +1,313 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Copies the brackets of upcoming merges from slow (ex: network) storage to a
+local scratch folder, so that mkhdri reads local files.
+
+A background thread stays a few jobs ahead of the workers, copying each
+job's brackets in one sequential pass. The copies are kept within a byte
+budget: when it's full, the least recently used copies are deleted, except
+for the ones that a running or an upcoming job still needs.
+
+StagingCache plugs into the scheduler three ways:
+
+    - as an admission policy, it holds a job back until its brackets are
+      copied (a job still starts straight from the source if nothing else
+      is running)
+    - as a preparer, it swaps the job's brackets for the local copies just
+      before launch
+    - it calls onStaged (ex: Scheduler.wake) when a job becomes ready
+
+Brackets that are already on the scratch folder's device are never copied.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+StagingCache: An LRU cache of local bracket copies, filled ahead of time.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+staging.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import errno
+import shutil
+import hashlib
+import logging
+import threading
+import collections
+
+# IMPORT LOCAL LIBRARIES
+import engine
+import devices
+import scheduler
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StagingCache(object):
+
+    """An LRU cache of local bracket copies, filled ahead of time."""
+
+    # a job that waits on its copies doesn't stop other jobs from starting
+    reorderable = True
+
+    def __init__(self, scratchFolder, budgetBytes, lookahead=4,
+                 onStaged=None):
+        """Sets up the (empty) cache. Nothing is copied until self.start.
+
+        Args:
+            scratchFolder (str): The local folder to copy brackets into
+            budgetBytes (int): The most bytes that the copies may use
+            lookahead (int): The number of unstarted jobs to stage ahead
+            onStaged (callable): Called with no arguments from the staging
+                                 thread every time a job becomes ready
+
+        """
+        super(StagingCache, self).__init__()
+        self.scratchFolder = scratchFolder
+        self.budgetBytes = budgetBytes
+        self.lookahead = lookahead
+        self.onStaged = onStaged
+        self.copiedBytes = 0
+        self._scratchDevice = None
+        self._condition = threading.Condition()
+        self._cached = collections.OrderedDict()  # source: (copy, size)
+        self._usedBytes = 0
+        self._pins = collections.Counter()
+        self._jobPins = {}
+        self._ready = set()
+        self._started = set()
+        self._jobs = []
+        self._cursor = 0
+        self._stopped = False
+        self._thread = None
+    # end __init__
+
+    def start(self, jobs):
+        """Starts staging the jobs' brackets in the background.
+
+        Args:
+            jobs (list of <engine.MergeJob>): The jobs, in the order that the
+                                              scheduler will start them
+
+        """
+        try:
+            os.makedirs(self.scratchFolder)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        self._scratchDevice = devices.device_id(self.scratchFolder)
+        self._jobs = list(jobs)
+        self._thread = threading.Thread(target=self._stage_loop)
+        self._thread.daemon = True
+        self._thread.start()
+    # end start
+
+    def close(self):
+        """Stops the staging thread and deletes every copy."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        for copy, _ in self._cached.values():
+            self._remove(copy)
+        self._cached.clear()
+        self._usedBytes = 0
+    # end close
+
+    def _needs_copy(self, path):
+        """Checks if a bracket is on another device than the scratch folder."""
+        return devices.device_id(path) != self._scratchDevice
+    # end _needs_copy
+
+    def _copy_path(self, path):
+        """Gets the scratch path of a bracket. The file name is kept."""
+        folder = hashlib.sha1(os.path.abspath(path).encode("utf-8"))
+        return os.path.join(self.scratchFolder, folder.hexdigest()[:16],
+                            os.path.basename(path))
+    # end _copy_path
+
+    @staticmethod
+    def _remove(copy):
+        """Deletes a copy and its folder."""
+        try:
+            os.remove(copy)
+            os.rmdir(os.path.dirname(copy))
+        except OSError:
+            pass
+    # end _remove
+
+    def _next_job(self):
+        """Gets the first upcoming job that isn't staged yet, or None.
+
+        Must be called with self._condition held.
+
+        """
+        job, self._cursor = scheduler.next_upcoming(
+            self._jobs, self._cursor, self._started, self._ready,
+            self.lookahead)
+        return job
+    # end _next_job
+
+    def _make_room(self, size):
+        """Evicts unpinned copies, oldest first, until size bytes fit.
+
+        Must be called with self._condition held.
+
+        Returns:
+            bool: True if the bytes fit now
+
+        """
+        for source in list(self._cached):
+            if self._usedBytes + size <= self.budgetBytes:
+                break
+            if self._pins[source]:
+                continue
+            copy, copySize = self._cached.pop(source)
+            self._usedBytes -= copySize
+            self._remove(copy)
+        return self._usedBytes + size <= self.budgetBytes
+    # end _make_room
+
+    def _stage_loop(self):
+        """Stages upcoming jobs until self.close is called."""
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None and not self._stopped:
+                    self._condition.wait()
+                    job = self._next_job()
+                if self._stopped:
+                    return
+            try:
+                self._stage(job)
+            except (IOError, OSError) as err:
+                LOGGER.warning("Brackets of: %r could not be staged. They "
+                               "will be read from the source. %s", job, err)
+                with self._condition:
+                    self._ready.add(id(job))
+
+            if self.onStaged is not None:
+                self.onStaged()
+    # end _stage_loop
+
+    def _stage(self, job):
+        """Copies the missing brackets of a job and pins all of them."""
+        # the sources are on slow storage, so they are stat'd without the
+        # lock that the scheduler's thread waits on. Only this thread adds
+        # or evicts copies, so the missing ones stay missing meanwhile
+        sources = [x for x in job.inputs if self._needs_copy(x)]
+        with self._condition:
+            missing = [x for x in sources if x not in self._cached]
+        size = sum(os.path.getsize(x) for x in missing)
+
+        with self._condition:
+            if id(job) in self._started:
+                return  # the scheduler didn't wait for it
+            for source in sources:
+                self._pins[source] += 1
+            self._jobPins[id(job)] = sources
+
+            while not self._make_room(size):
+                if size > self.budgetBytes or id(job) in self._started or \
+                        self._stopped:
+                    self._ready.add(id(job))  # read it from the source
+                    return
+                self._condition.wait(1.0)  # until a running job unpins
+
+        for source in missing:
+            copy = self._copy_path(source)
+            try:
+                os.makedirs(os.path.dirname(copy))
+            except OSError as err:
+                if err.errno != errno.EEXIST:
+                    raise
+            partial = copy + ".part"
+            shutil.copyfile(source, partial)
+            os.rename(partial, copy)
+
+            copySize = os.path.getsize(copy)
+            with self._condition:
+                self._cached[source] = (copy, copySize)
+                self._usedBytes += copySize
+                self.copiedBytes += copySize
+
+        with self._condition:
+            self._ready.add(id(job))
+    # end _stage
+
+    def prepare(self, job):
+        """Gets the job to launch, with its brackets swapped for copies.
+
+        Args:
+            job (<engine.MergeJob>): The job that is about to start
+
+        Returns:
+            <engine.MergeJob>: A job that reads the local copies (the same
+                               job if none of its brackets are staged)
+
+        """
+        with self._condition:
+            inputs = []
+            for source in job.inputs:
+                if source in self._cached:
+                    copy, size = self._cached.pop(source)
+                    self._cached[source] = (copy, size)  # most recently used
+                    inputs.append(copy)
+                else:
+                    inputs.append(source)
+        if inputs == job.inputs:
+            return job
+        return engine.MergeJob(job.executable, job.arguments, job.output,
+                               inputs)
+    # end prepare
+
+    def can_start(self, job):
+        """Checks if a job's brackets are staged (or don't need to be)."""
+        with self._condition:
+            if id(job) in self._ready:
+                return True
+        return not any(self._needs_copy(x) for x in job.inputs)
+    # end can_start
+
+    def job_started(self, job):
+        """Moves the staging window past the job."""
+        with self._condition:
+            self._started.add(id(job))
+            self._condition.notify_all()
+    # end job_started
+
+    def job_finished(self, result):
+        """Unpins the job's copies, so that they may be evicted.
+
+        Args:
+            result (<scheduler.JobResult>): The finished job
+
+        """
+        with self._condition:
+            for source in self._jobPins.pop(id(result.job), []):
+                self._pins[source] -= 1
+            self._condition.notify_all()
+    # end job_finished
+
+    def job_discarded(self, result):
+        """Unpins the copies of a job that couldn't start or never did.
+
+        Args:
+            result (<scheduler.JobResult>): The job's last result
+
+        """
+        self.job_finished(result)
+    # end job_discarded
+# end StagingCache
+
+
+if __name__ == "__main__":
+    print(__doc__)
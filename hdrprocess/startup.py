@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Checks that the command-line starts fast and without Qt.
+
+Render nodes run hdrprocess.py from the command-line many times a day, often
+without a display or a Qt install. This script imports hdrprocess in fresh
+interpreters and fails (exit code 1) if:
+
+    - a GUI module (Qt, gui, mainWindow, guiwidgets, guiworker) was imported
+    - the median time to import hdrprocess is above the budget (the time is
+      taken inside the interpreter, so Python's own start isn't counted)
+
+Run it from this folder, before a release or on every CI build:
+
+    python startup.py [budget seconds] [runs]
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+measure_import: Times the import of a module in a fresh interpreter.
+check_startup: Checks the command-line's import time and modules.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+startup.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import sys
+import json
+import subprocess
+
+
+CURRENT_DIR = os.path.dirname(os.path.realpath(__file__))
+STARTUP_BUDGET = 0.25  # seconds
+GUI_MODULES = ("PyQt4", "PySide", "gui", "mainWindow", "guiwidgets",
+               "guiworker")
+
+_MEASURE = """
+import sys, time, json
+start = time.time()
+{statement}
+print(json.dumps({{"seconds": time.time() - start,
+                  "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure_import(module):
+    """Times the import of a module in a fresh interpreter.
+
+    Args:
+        module (str): The module to import
+
+    Returns:
+        tuple of float and list: The seconds that the import took and the
+                                 names of every module that was loaded
+
+    """
+    output = subprocess.check_output(
+        [sys.executable, "-c", _MEASURE.format(statement="import " + module)],
+        cwd=CURRENT_DIR)
+    data = json.loads(output.decode("utf-8").strip().splitlines()[-1])
+    return (data["seconds"], data["modules"])
+# end measure_import
+
+
+def check_startup(budget=STARTUP_BUDGET, runs=5):
+    """Checks the command-line's import time and modules.
+
+    Args:
+        budget (float): The most seconds that importing hdrprocess may take
+        runs (int): The number of imports to take the median of
+
+    Returns:
+        list of strs: The problems that were found (empty if none)
+
+    """
+    measure_import("hdrprocess")  # writes the .pyc files
+    times = []
+    modules = []
+    for _ in range(max(1, runs)):
+        seconds, modules = measure_import("hdrprocess")
+        times.append(seconds)
+    median = sorted(times)[len(times) // 2]
+
+    problems = []
+    loaded = [x for x in modules if x.split(".")[0] in GUI_MODULES]
+    if loaded:
+        problems.append("The command-line imported GUI modules: " +
+                        ", ".join(loaded))
+    if median > budget:
+        problems.append("Importing hdrprocess took {0:.3f}s, over the "
+                        "{1:.3f}s budget".format(median, budget))
+    print("Importing hdrprocess took {0:.3f}s (median of {1}, budget "
+          "{2:.3f}s)".format(median, len(times), budget))
+    return problems
+# end check_startup
+
+
+if __name__ == "__main__":
+    problems = check_startup(*[float(x) for x in sys.argv[1:2]] +
+                             [int(x) for x in sys.argv[2:3]])
+    for problem in problems:
+        print(problem)
+    sys.exit(int(bool(problems)))
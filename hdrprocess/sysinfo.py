@@ -0,0 +1,155 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Small, OS-independent queries about the machine that the batch runs on
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+total_memory: Gets the amount of physical memory on the machine, in bytes.
+peak_rss_bytes: Gets the peak resident memory of a reaped child, in bytes.
+process_io: Gets the bytes that a running (or unreaped) process read/wrote.
+cpu_times: Gets the machine's total and iowait CPU time, in clock ticks.
+available_memory: Gets the memory that new processes can use, in bytes.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+sysinfo.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import io
+import sys
+
+
+def total_memory():
+    """Gets the amount of physical memory on the machine, in bytes.
+
+    Returns:
+        int or NoneType: The number of bytes or None, if it can't be found
+
+    """
+    if hasattr(os, "sysconf"):
+        try:
+            return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (ValueError, OSError):
+            pass
+
+    if sys.platform.startswith("win"):
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong),
+                        ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong),
+                        ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong),
+                        ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong),
+                        ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("sullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return int(status.ullTotalPhys)
+
+    return None
+# end total_memory
+
+
+def peak_rss_bytes(rusage):
+    """Gets the peak resident memory of a reaped child, in bytes.
+
+    Args:
+        rusage (<resource.struct_rusage> or NoneType): The resource usage
+                                                       returned by os.wait4
+
+    Returns:
+        int or NoneType: The peak RSS or None, if it isn't known
+
+    """
+    if rusage is None or not rusage.ru_maxrss:
+        return None
+    if sys.platform == "darwin":
+        return int(rusage.ru_maxrss)  # macOS reports bytes
+    return int(rusage.ru_maxrss) * 1024  # everything else reports KiB
+# end peak_rss_bytes
+
+
+def process_io(pid):
+    """Gets the bytes that a running (or unreaped) process read/wrote.
+
+    Only Linux reports this (in /proc/<pid>/io). "readBytes"/"writeBytes"
+    count every read/write call, including the ones served by the page
+    cache, while "storageReadBytes"/"storageWriteBytes" only count what
+    went to the disk.
+
+    Args:
+        pid (int): The process to query
+
+    Returns:
+        dict or NoneType: The counters or None, if they aren't available
+
+    """
+    names = {"rchar": "readBytes", "wchar": "writeBytes",
+             "read_bytes": "storageReadBytes",
+             "write_bytes": "storageWriteBytes"}
+    counters = {}
+    try:
+        with io.open("/proc/{pid}/io".format(pid=pid), "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in names:
+                    counters[names[key]] = int(value)
+    except (IOError, OSError, ValueError):
+        return None
+    return counters or None
+# end process_io
+
+
+def cpu_times():
+    """Gets the machine's total and iowait CPU time, in clock ticks.
+
+    Only Linux reports iowait. The difference of two calls gives the share of
+    the time that the CPUs sat idle waiting on the disk or the network.
+
+    Returns:
+        tuple of ints or NoneType: (total, iowait) or None if unavailable
+
+    """
+    try:
+        with io.open("/proc/stat", "r") as f:
+            fields = [int(x) for x in f.readline().split()[1:]]
+    except (IOError, OSError, ValueError):
+        return None
+    if len(fields) < 5:
+        return None
+    return (sum(fields), fields[4])  # user nice system idle iowait ...
+# end cpu_times
+
+
+def available_memory():
+    """Gets the memory that new processes can use, in bytes.
+
+    Returns:
+        int or NoneType: MemAvailable from /proc/meminfo or None if
+                         unavailable
+
+    """
+    try:
+        with io.open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    return None
+# end available_memory
+
+
+if __name__ == "__main__":
+    print(__doc__)
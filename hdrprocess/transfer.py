@@ -0,0 +1,343 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Lets merges write their HDR to a fast local folder and moves it to the real
+output folder in the background.
+
+mkhdri writes its -out: file in many small writes, which is slow on a network
+share and keeps the worker slot busy. OutputStager points -out: at a local
+scratch folder instead. Once the merge exits its slot is free, and a pool
+of transfer threads copies the file to the output folder:
+
+    1. the file is copied to "<output>.part" (appending to a .part left by
+       an interrupted transfer), hashing the local file on the way
+    2. the .part is fsync'd and read back, and its SHA-1 must match
+    3. the .part is renamed to the output (and the folder fsync'd), so the
+       output never exists half-written
+    4. the local file is deleted
+
+Every local file has a "<file>.transfer.json" next to it that names its
+destination, so transfers that were interrupted by a crash are picked up by
+OutputStager.recover on the next run.
+
+Observers that need the final output (like journal.JobJournal) are given to
+OutputStager as downstream observers. They hear about a job's finish once
+its output is committed.
+
+Classes
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+OutputStager: Redirects merge outputs to scratch and commits them later.
+
+Methods
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+commit_file: Copies a file to its destination, verified and atomically.
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+transfer.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import io
+import copy
+import json
+import glob
+import errno
+import hashlib
+import logging
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+# IMPORT LOCAL LIBRARIES
+import engine
+import devices
+
+
+LOGGER = logging.getLogger(__name__)
+COPY_CHUNK_SIZE = 4 * 1024 ** 2
+SIDECAR_SUFFIX = ".transfer.json"
+
+
+def _hash_file(path, digest=None):
+    """Adds the contents of a file to a SHA-1 digest."""
+    digest = digest or hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+# end _hash_file
+
+
+def _fsync_folder(folder):
+    """Flushes a folder's entries (ex: a rename) to disk, where possible."""
+    if os.name == "nt":
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+# end _fsync_folder
+
+
+def commit_file(source, destination):
+    """Copies a file to its destination, verified and atomically.
+
+    Args:
+        source (str): The local file
+        destination (str): The final path. It only appears once the copy is
+                           complete and verified
+
+    Raises:
+        IOError: If the copy doesn't match the source
+
+    """
+    partial = destination + ".part"
+    offset = 0
+    if os.path.isfile(partial):
+        offset = os.path.getsize(partial)
+        if offset > os.path.getsize(source):
+            os.remove(partial)
+            offset = 0
+
+    # copy (or finish copying) the source, hashing all of it on the way
+    digest = hashlib.sha1()
+    with open(source, "rb") as src:
+        if offset:
+            remaining = offset
+            while remaining:
+                chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+                digest.update(chunk)
+                remaining -= len(chunk)
+        with open(partial, "ab" if offset else "wb") as dst:
+            for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+    if _hash_file(partial).hexdigest() != digest.hexdigest():
+        os.remove(partial)  # start over next time
+        raise IOError("The copy of: {src!r} doesn't match it".format(
+            src=source))
+
+    if os.name == "nt" and os.path.exists(destination):
+        os.remove(destination)  # Windows can't rename over a file
+    os.rename(partial, destination)
+    _fsync_folder(os.path.dirname(os.path.abspath(destination)))
+# end commit_file
+
+
+class OutputStager(object):
+
+    """Redirects merge outputs to scratch and commits them later.
+
+    It is a scheduler preparer (for the redirect) and a scheduler observer
+    (to queue the transfer when a merge exits).
+
+    """
+
+    def __init__(self, scratchFolder, workers=2, attempts=3, downstream=()):
+        """Starts the transfer threads.
+
+        Args:
+            scratchFolder (str): The local folder that merges write into
+            workers (int): The number of transfers that run at once
+            attempts (int): The number of times a transfer is tried
+            downstream (list): Observers that are told about each job once
+                               its output is committed (or failed)
+
+        """
+        super(OutputStager, self).__init__()
+        self.scratchFolder = scratchFolder
+        self.attempts = attempts
+        self.downstream = list(downstream)
+        self.failed = []
+        self._local = {}  # final output: local output
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+
+        try:
+            os.makedirs(scratchFolder)
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        self._scratchDevice = devices.device_id(scratchFolder)
+
+        self._threads = []
+        for _ in range(max(1, workers)):
+            thread = threading.Thread(target=self._transfer_loop)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+    # end __init__
+
+    def _local_path(self, output):
+        """Gets the scratch path of an output. The file name is kept."""
+        folder = hashlib.sha1(os.path.abspath(output).encode("utf-8"))
+        return os.path.join(self.scratchFolder, folder.hexdigest()[:16],
+                            os.path.basename(output))
+    # end _local_path
+
+    def recover(self):
+        """Queues the transfers that a previous run didn't finish.
+
+        Returns:
+            int: The number of transfers that were queued
+
+        """
+        pattern = os.path.join(self.scratchFolder, "*", "*" + SIDECAR_SUFFIX)
+        count = 0
+        for sidecar in glob.glob(pattern):
+            local = sidecar[:-len(SIDECAR_SUFFIX)]
+            if not os.path.isfile(local):
+                os.remove(sidecar)
+                continue
+            with io.open(sidecar, "r", encoding="utf-8") as f:
+                destination = json.load(f)["destination"]
+            self._queue.put((local, destination, None))
+            count += 1
+        return count
+    # end recover
+
+    def prepare(self, job):
+        """Gets the job to launch, writing to scratch instead of its output.
+
+        Outputs that are already on the scratch folder's device are left
+        alone.
+
+        Args:
+            job (<engine.MergeJob>): The job that is about to start
+
+        Returns:
+            <engine.MergeJob>: The redirected job
+
+        """
+        destinationFolder = os.path.dirname(os.path.abspath(job.output))
+        if devices.device_id(destinationFolder) == self._scratchDevice:
+            return job
+
+        local = self._local_path(job.output)
+        try:
+            os.makedirs(os.path.dirname(local))
+        except OSError as err:
+            if err.errno != errno.EEXIST:
+                raise
+        if os.path.exists(local):
+            os.remove(local)  # left by a failed attempt
+        with self._lock:
+            self._local[job.output] = local
+        return engine.MergeJob(job.executable, job.arguments, local,
+                               job.inputs)
+    # end prepare
+
+    def job_started(self, job):
+        """Passes the start on to the downstream observers."""
+        for observer in self.downstream:
+            observer.job_started(job)
+    # end job_started
+
+    def job_finished(self, result):
+        """Queues the transfer of a finished job's output.
+
+        Args:
+            result (<scheduler.JobResult>): The finished job
+
+        """
+        with self._lock:
+            local = self._local.pop(result.job.output, None)
+        if local is None or not result.succeeded or not os.path.isfile(local):
+            self._notify(result)
+            return
+
+        with io.open(local + SIDECAR_SUFFIX, "w", encoding="utf-8") as f:
+            f.write(u"{}".format(json.dumps({"destination": result.job.output})))
+        self._queue.put((local, result.job.output, result))
+    # end job_finished
+
+    def _notify(self, result):
+        """Tells the downstream observers that a job is done."""
+        if result is None:
+            return  # a recovered transfer, from an earlier run
+        for observer in self.downstream:
+            observer.job_finished(result)
+    # end _notify
+
+    def _transfer_loop(self):
+        """Commits queued outputs until a None is queued.
+
+        A job whose output couldn't be committed is passed downstream as
+        failed, so that it is run again on the next resume.
+
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            local, destination, result = item
+            committed = False
+            try:
+                committed = self._transfer(local, destination)
+            finally:
+                if not committed and result is not None:
+                    result = copy.copy(result)
+                    result.error = IOError("The output could not be moved "
+                                           "to: {0}".format(destination))
+                self._notify(result)
+                self._queue.task_done()
+    # end _transfer_loop
+
+    def _transfer(self, local, destination):
+        """Commits one output, trying up to self.attempts times.
+
+        Returns:
+            bool: True if the output was committed
+
+        """
+        for attempt in range(1, self.attempts + 1):
+            try:
+                commit_file(local, destination)
+                break
+            except (IOError, OSError) as err:
+                LOGGER.warning("Transfer %s/%s of: %s failed. %s", attempt,
+                               self.attempts, destination, err)
+        else:
+            with self._lock:
+                self.failed.append(destination)
+            return False  # the local file and its sidecar stay for recover
+
+        os.remove(local)
+        os.remove(local + SIDECAR_SUFFIX)
+        try:
+            os.rmdir(os.path.dirname(local))
+        except OSError:
+            pass
+        return True
+    # end _transfer
+
+    def pending(self):
+        """int: The number of outputs waiting to be (or being) committed."""
+        return self._queue.unfinished_tasks
+    # end pending
+
+    def close(self):
+        """Waits for every queued transfer and stops the threads."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+    # end close
+# end OutputStager
+
+
+if __name__ == "__main__":
+    print(__doc__)
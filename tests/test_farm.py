@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Runs several worker processes against one local farm.JobQueue.
+
+The workers don't run mkhdri. Each one points engine.MAIN_CMD at a small
+script that writes the -out: file, and the submitter points it somewhere
+that doesn't exist, so the test also checks that the workers find the
+backend on their own instead of running the submitter's command.
+
+    python -m unittest discover tests
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+test_farm.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import sys
+import time
+import errno
+import shutil
+import signal
+import tempfile
+import unittest
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "hdrprocess"))
+
+# IMPORT LOCAL LIBRARIES
+import farm
+import engine
+
+
+FAKE_MERGE = """#!{python}
+import os, sys, time
+output = [x[5:] for x in sys.argv if x.startswith("-out:")][0]
+if "-slow" in sys.argv:
+    with open(output + ".pid", "w") as f:
+        f.write(str(os.getpid()))
+    time.sleep(60)
+time.sleep(0.1)
+with open(output, "w") as f:
+    f.write(str(os.getppid()))
+"""
+
+
+def _work(queueFile, mergeScript):
+    """Runs one worker process until the queue is empty (or Ctrl+C)."""
+    engine.MAIN_CMD = mergeScript
+    jobQueue = farm.JobQueue(queueFile, leaseSeconds=5.0)
+    try:
+        farm.FarmWorker(jobQueue, slots=2, pollSeconds=0.1,
+                        exitWhenEmpty=True).run()
+    except KeyboardInterrupt:
+        pass
+# end _work
+
+
+def _is_running(pid):
+    """Checks if a process exists."""
+    try:
+        os.kill(pid, 0)
+    except OSError as err:
+        return err.errno != errno.ESRCH
+    return True
+# end _is_running
+
+
+class FarmTestCase(unittest.TestCase):
+
+    """Submits a batch and runs it with several worker processes."""
+
+    def setUp(self):
+        """Makes the queue file and the fake merge script."""
+        self.folder = tempfile.mkdtemp(prefix="hdrfarm_")
+        self.queueFile = os.path.join(self.folder, "queue.db")
+        self.mergeScript = os.path.join(self.folder, "mkhdri")
+        with open(self.mergeScript, "w") as f:
+            f.write(FAKE_MERGE.format(python=sys.executable))
+        os.chmod(self.mergeScript, 0o755)
+        self.mainCmd = engine.MAIN_CMD
+        engine.MAIN_CMD = os.path.join(self.folder, "missing", "mkhdri.exe")
+    # end setUp
+
+    def tearDown(self):
+        """Removes the files of the test."""
+        engine.MAIN_CMD = self.mainCmd
+        shutil.rmtree(self.folder, ignore_errors=True)
+    # end tearDown
+
+    def test_workers(self):
+        """Every job runs once, on the workers' backend."""
+        outputs = [os.path.join(self.folder, "out{0}.hdr".format(index))
+                   for index in range(12)]
+        jobs = [engine.MergeJob(engine.MAIN_CMD, ["-defcurve"], output,
+                                ["a.jpg", "b.jpg", "c.jpg"])
+                for output in outputs]
+        jobQueue = farm.JobQueue(self.queueFile)
+        batch = jobQueue.submit(jobs)
+
+        workers = [multiprocessing.Process(target=_work,
+                                           args=(self.queueFile,
+                                                 self.mergeScript))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            self.assertEqual(worker.exitcode, 0)
+
+        self.assertEqual(jobQueue.counts(batch)["done"], len(jobs))
+        for job in jobQueue.jobs(batch):
+            self.assertEqual(job["attempts"], 1)
+            self.assertEqual(job["returncode"], 0)
+        for output in outputs:
+            self.assertTrue(os.path.isfile(output))
+    # end test_workers
+
+    def test_expired_lease(self):
+        """A job whose worker stopped sending heartbeats is leased again."""
+        jobQueue = farm.JobQueue(self.queueFile, leaseSeconds=0.2)
+        job = engine.MergeJob(engine.MAIN_CMD, ["-defcurve"], "out.hdr",
+                              ["a.jpg"])
+        batch = jobQueue.submit([job])
+        jobId, _ = jobQueue.lease("dead")
+        self.assertIsNone(jobQueue.lease("other"))
+        time.sleep(0.3)
+
+        lease = jobQueue.lease("other")
+        self.assertIsNotNone(lease)
+        self.assertEqual(lease[0], jobId)
+        self.assertFalse(jobQueue.heartbeat(jobId, "dead"))
+        status = jobQueue.jobs(batch)[0]
+        self.assertEqual(status["worker"], "other")
+        self.assertEqual(status["attempts"], 2)
+    # end test_expired_lease
+
+    def test_max_attempts(self):
+        """A job that keeps losing its lease is marked failed."""
+        jobQueue = farm.JobQueue(self.queueFile, leaseSeconds=0.1,
+                                 maxAttempts=2)
+        job = engine.MergeJob(engine.MAIN_CMD, ["-defcurve"], "out.hdr",
+                              ["a.jpg"])
+        batch = jobQueue.submit([job])
+        for _ in range(2):
+            self.assertIsNotNone(jobQueue.lease("crashing"))
+            time.sleep(0.2)
+        self.assertIsNone(jobQueue.lease("crashing"))
+        self.assertEqual(jobQueue.jobs(batch)[0]["state"], "failed")
+    # end test_max_attempts
+
+    def test_interrupt(self):
+        """Ctrl+C on a worker kills its merge and queues the job again."""
+        output = os.path.join(self.folder, "slow.hdr")
+        job = engine.MergeJob(engine.MAIN_CMD, ["-slow"], output, ["a.jpg"])
+        jobQueue = farm.JobQueue(self.queueFile)
+        batch = jobQueue.submit([job])
+        worker = multiprocessing.Process(target=_work,
+                                         args=(self.queueFile,
+                                               self.mergeScript))
+        worker.start()
+        for _ in range(200):
+            if os.path.isfile(output + ".pid"):
+                break
+            time.sleep(0.05)
+        time.sleep(0.1)
+        with open(output + ".pid") as f:
+            mergePid = int(f.read())
+
+        os.kill(worker.pid, signal.SIGINT)
+        worker.join(30)
+        self.assertEqual(worker.exitcode, 0)
+        self.assertFalse(_is_running(mergePid))
+        status = jobQueue.jobs(batch)[0]
+        self.assertEqual((status["state"], status["worker"]),
+                         ("queued", None))
+    # end test_interrupt
+
+    def test_submit_other_program(self):
+        """Only jobs that run a merge backend can be queued."""
+        jobQueue = farm.JobQueue(self.queueFile)
+        job = engine.MergeJob("/bin/rm", [], "out.hdr", ["a.jpg"])
+        self.assertRaises(ValueError, jobQueue.submit, [job])
+        self.assertEqual(sum(jobQueue.counts().values()), 0)
+    # end test_submit_other_program
+# end FarmTestCase
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Merges synthetic brackets with numpymerge and compares the HDR to the
+radiance that the brackets were made from.
+
+The brackets are uncompressed 8-bit RGB TIFFs of a random radiance map,
+each exposed for a different time (in its EXIF) and encoded with the sRGB
+curve, like a camera that -defcurve describes. Tiled merges must write the
+same bytes as whole-image ones and stay near their memory budget (measured
+with ru_maxrss, where the resource module exists). Needs numpy and Pillow.
+
+    python -m unittest discover tests
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+test_numpymerge.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "hdrprocess"))
+
+# IMPORT LOCAL LIBRARIES
+import numpymerge
+
+np = numpymerge.np
+Image = numpymerge.Image
+
+EXPOSURE_TIMES = ((1, 16), (1, 4), (1, 1), (4, 1))  # EXIF rationals
+MEDIAN_ERROR = 0.004  # relative to the true radiance, for 8-bit brackets
+
+# Prints how many more bytes of memory a merge (with the flags of argv) peaked
+# at than a process that only imported numpymerge. Both run as children of
+# this small process, since Linux counts the memory of the process that
+# forked a child in the child's ru_maxrss
+MEASURE_MERGE = """
+import sys, resource, subprocess
+def peak(args):
+    subprocess.check_call([sys.executable] + args)
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+imported = peak(["-c", "import sys; sys.path.insert(0, {folder!r}); "
+                 "import numpymerge; numpymerge.read_exposure(sys.argv[-1])",
+                 sys.argv[-1]])
+merged = peak([{folder!r} + "/numpymerge.py"] + sys.argv[1:])
+print((merged - imported) * (1 if sys.platform == "darwin" else 1024))
+"""
+
+
+def _srgb(linear):
+    """Encodes linear values (clipped to 0-1) with the sRGB curve."""
+    linear = np.clip(linear, 0.0, 1.0)
+    return np.where(linear <= 0.0031308, linear * 12.92,
+                    1.055 * linear ** (1.0 / 2.4) - 0.055)
+# end _srgb
+
+
+def _read_pfm(path):
+    """Reads a .pfm written by numpymerge, top row first."""
+    with open(path, "rb") as f:
+        f.readline()
+        width, height = [int(x) for x in f.readline().split()]
+        f.readline()
+        pixels = np.fromfile(f, dtype="<f4")
+    return pixels.reshape(height, width, 3)[::-1]
+# end _read_pfm
+
+
+@unittest.skipIf(np is None or Image is None, "needs numpy and Pillow")
+class NumpyMergeTestCase(unittest.TestCase):
+
+    """Merges brackets of a known radiance map."""
+
+    def setUp(self):
+        """Writes the brackets."""
+        self.folder = tempfile.mkdtemp(prefix="hdrmerge_")
+        random = np.random.RandomState(0)
+        self.radiance = np.exp(random.uniform(np.log(0.05), np.log(10.0),
+                                              (48, 64, 3)))
+        self.brackets = self._write_brackets(self.radiance, ".tif")
+    # end setUp
+
+    def _write_brackets(self, radiance, extension):
+        """Writes a bracket of the radiance for each of EXPOSURE_TIMES."""
+        brackets = []
+        for index, seconds in enumerate(EXPOSURE_TIMES):
+            pixels = _srgb(radiance * seconds[0] / float(seconds[1]))
+            exif = Image.Exif()
+            exif[numpymerge.EXPOSURE_TIME] = seconds
+            path = os.path.join(self.folder, "b{0}{1}".format(index,
+                                                              extension))
+            Image.fromarray(np.round(pixels * 255).astype(np.uint8)).save(
+                path, exif=exif)
+            brackets.append(path)
+        return brackets
+    # end _write_brackets
+
+    def tearDown(self):
+        """Removes the files of the test."""
+        shutil.rmtree(self.folder, ignore_errors=True)
+    # end tearDown
+
+    def test_radiance(self):
+        """The HDR is within MEDIAN_ERROR of the true radiance."""
+        output = os.path.join(self.folder, "out.pfm")
+        numpymerge.merge_files(self.brackets[::-1], output)
+        error = np.abs(_read_pfm(output) - self.radiance) / self.radiance
+        self.assertLess(np.median(error), MEDIAN_ERROR)
+        self.assertFalse(os.path.exists(output + ".part"))
+    # end test_radiance
+
+    def test_tiled(self):
+        """Merging in strips writes the same bytes as merging at once."""
+        rowBytes = 64 * 3 * (len(self.brackets) +
+                             numpymerge.FLOAT_ROW_BUFFERS * 4)
+        tileBytes = 2 * rowBytes  # strips of two rows
+        for extension in (".hdr", ".tif"):
+            whole = os.path.join(self.folder, "whole" + extension)
+            tiled = os.path.join(self.folder, "tiled" + extension)
+            numpymerge.merge_files(self.brackets, whole, ec=True, cb=True)
+            numpymerge.merge_files(self.brackets, tiled, ec=True, cb=True,
+                                   tileBytes=tileBytes)
+            with open(whole, "rb") as f:
+                expected = f.read()
+            with open(tiled, "rb") as f:
+                self.assertEqual(f.read(), expected)
+    # end test_tiled
+
+    def test_tiled_decoded(self):
+        """Brackets that are decoded to temporary files merge the same."""
+        brackets = self._write_brackets(self.radiance, ".png")
+        whole = os.path.join(self.folder, "whole.hdr")
+        tiled = os.path.join(self.folder, "tiled.hdr")
+        numpymerge.merge_files(brackets, whole)
+        temporaries = set(os.listdir(tempfile.gettempdir()))
+        numpymerge.merge_files(brackets, tiled, tileBytes=1)
+        with open(whole, "rb") as f:
+            expected = f.read()
+        with open(tiled, "rb") as f:
+            self.assertEqual(f.read(), expected)
+        self.assertEqual(set(os.listdir(tempfile.gettempdir())) -
+                         temporaries, set())
+    # end test_tiled_decoded
+
+    @unittest.skipIf(resource is None, "needs the resource module")
+    def test_tile_memory(self):
+        """A tiled merge's peak memory grows by about its budget, while a
+        whole-image merge of the same brackets grows by many times it."""
+        radiance = np.exp(np.random.RandomState(1).uniform(
+            np.log(0.05), np.log(10.0), (800, 1200, 3)))
+        brackets = self._write_brackets(radiance, ".tif")
+        radiance = None
+        tileBytes = 4 * 1024 * 1024
+        script = MEASURE_MERGE.format(folder=os.path.dirname(
+            os.path.abspath(numpymerge.__file__)))
+
+        def peak(*flags):
+            output = subprocess.check_output(
+                [sys.executable, "-c", script, "-defcurve"] + list(flags) +
+                ["-out:" + os.path.join(self.folder, "out.hdr")] + brackets)
+            return int(output.split()[-1])
+        # end peak
+
+        self.assertLess(peak("-tile:{0}".format(tileBytes)), 2 * tileBytes)
+        self.assertGreater(peak(), 8 * tileBytes)
+    # end test_tile_memory
+
+    def test_failed_merge(self):
+        """A merge that fails leaves neither the output nor its .part."""
+        output = os.path.join(self.folder, "out.hdr")
+        mergeImages = numpymerge.merge_images
+
+        def fail(*args):
+            raise MemoryError()
+        # end fail
+
+        numpymerge.merge_images = fail
+        try:
+            self.assertRaises(MemoryError, numpymerge.merge_files,
+                              self.brackets, output, tileBytes=1)
+        finally:
+            numpymerge.merge_images = mergeImages
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         sorted(os.path.basename(x) for x in self.brackets))
+    # end test_failed_merge
+# end NumpyMergeTestCase
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""Description
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+Fails if the command-line loads Qt or starts slower than its budget.
+
+Runs the checks of startup.py, which import hdrprocess in fresh
+interpreters.
+
+    python -m unittest discover tests
+
+Filename
++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
+test_startup.py
+
+"""
+
+# IMPORT STANDARD LIBRARIES
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "hdrprocess"))
+
+# IMPORT LOCAL LIBRARIES
+import startup
+
+
+class StartupTestCase(unittest.TestCase):
+
+    """Imports hdrprocess the way the command-line does."""
+
+    def test_no_gui_modules(self):
+        """No GUI module is imported by the command-line."""
+        _, modules = startup.measure_import("hdrprocess")
+        loaded = [x for x in modules
+                  if x.split(".")[0] in startup.GUI_MODULES]
+        self.assertEqual(loaded, [])
+    # end test_no_gui_modules
+
+    def test_import_budget(self):
+        """Importing hdrprocess takes less than startup.STARTUP_BUDGET."""
+        self.assertEqual(startup.check_startup(), [])
+    # end test_import_budget
+# end StartupTestCase
+
+
+if __name__ == "__main__":
+    unittest.main()